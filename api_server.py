@@ -0,0 +1,569 @@
+"""
+Headless HTTP-API voor de converters (naast de Streamlit-UI).
+
+Endpoints
+  POST /convert/html       body: .docx          → text/html  (?compact=1: compacte HTML,
+                                                   ?paginate=1: ZIP met een pagina per kop 1,
+                                                   beide kan ook)
+  POST /convert/pptx       body: .docx          → .pptx
+  POST /convert/workbook   body: JSON           → .docx
+       {"meta": {..., "logo": b64?, "cover_bytes": b64?},
+        "steps": [{"title": "...", "text_blocks": ["..."], "images": [b64, ...]}]}
+  GET  /jobs/<id>          status van een async job
+  GET  /jobs/<id>/result   resultaat van een async job
+  GET  /healthz
+  GET  /metrics            Prometheus-tekstformaat
+
+Modus: ?mode=sync (standaard) of ?mode=async (202 + job-id).
+Resultaten krijgen een ETag op basis van converter + input-hash; een
+If-None-Match met dezelfde ETag geeft 304 zonder opnieuw te converteren.
+Als alle workers bezet zijn en de wachtrij vol is: 429 + Retry-After.
+HTML wordt één keer voorgecomprimeerd (gzip, brotli indien beschikbaar) en
+volgens Accept-Encoding uitgeleverd.
+
+Async jobs leven in het geheugen van deze instantie; zet bij meerdere
+instanties achter een load balancer sticky routing aan op /jobs/.
+
+Start:  python api_server.py --host 0.0.0.0 --port 8080
+"""
+import os
+import json
+import time
+import uuid
+import base64
+import shutil
+import weakref
+import zipfile
+import hashlib
+import tempfile
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit, parse_qs
+
+
+API_WORKERS = int(os.getenv("API_WORKERS", "2"))
+API_QUEUE = int(os.getenv("API_QUEUE", "4"))                  # extra wachtende jobs naast de workers
+API_MAX_BODY_MB = int(os.getenv("API_MAX_BODY_MB", "100"))
+API_SPOOL_MB = int(os.getenv("API_SPOOL_MB", "8"))             # groter → naar tijdelijk bestand
+API_SYNC_TIMEOUT = float(os.getenv("API_SYNC_TIMEOUT", "300"))
+API_RESULT_CACHE = int(os.getenv("API_RESULT_CACHE", "32"))
+API_JOB_TTL = float(os.getenv("API_JOB_TTL", "3600"))
+
+CHUNK = 64 * 1024
+
+MIME_DOCX = "application/vnd.openxmlformats-officedocument.wordprocessingml.document"
+MIME_PPTX = "application/vnd.openxmlformats-officedocument.presentationml.presentation"
+
+
+# ---------- Converters ----------
+def _convert_html(body) -> bytes:
+    from html_converter import docx_to_html
+    return docx_to_html(body).encode("utf-8")
+
+
+def _convert_html_compact(body) -> bytes:
+    from html_converter import docx_to_html
+    return docx_to_html(body, compact=True).encode("utf-8")
+
+
+def _convert_html_pages(body) -> bytes:
+    from html_converter import docx_to_html_pages, pages_to_zip
+    return pages_to_zip(docx_to_html_pages(body))
+
+
+def _convert_html_pages_compact(body) -> bytes:
+    from html_converter import docx_to_html_pages, pages_to_zip
+    return pages_to_zip(docx_to_html_pages(body, compact=True))
+
+
+def _convert_pptx(body) -> bytes:
+    from pptx_converter_hybrid import docx_to_pptx_hybrid
+    return docx_to_pptx_hybrid(body).getvalue()
+
+
+class BadRequest(ValueError):
+    """Ongeldige invoer van de client → 400."""
+
+
+def _b64(value):
+    if not value:
+        return None
+    try:
+        return base64.b64decode("".join(value.split()), validate=True)   # regelafbrekingen mogen
+    except (AttributeError, TypeError, ValueError) as e:
+        raise BadRequest(f"ongeldige base64: {e}") from None
+
+
+def _image(value, where: str) -> bytes:
+    """base64 → bytes van een afbeelding die python-docx kan plaatsen."""
+    from docx.image.image import Image as DocxImage
+
+    data = _b64(value)
+    try:
+        DocxImage.from_blob(data)
+    except Exception:
+        raise BadRequest(f"{where}: geen bruikbare afbeelding") from None
+    return data
+
+
+META_TEXT = ("opdracht_titel", "vak", "profieldeel", "docent", "duur")
+
+
+def _workbook_spec(body) -> tuple[dict, list[dict]]:
+    """JSON-body → (meta, steps) met gedecodeerde afbeeldingen; fouten → BadRequest."""
+    try:
+        spec = json.loads(body.read())
+    except (UnicodeDecodeError, ValueError) as e:
+        raise BadRequest(f"ongeldige JSON: {e}") from None
+    if not isinstance(spec, dict) or not isinstance(spec.get("meta") or {}, dict) \
+            or not isinstance(spec.get("steps") or [], list):
+        raise BadRequest('verwacht {"meta": {...}, "steps": [...]}')
+
+    meta = dict(spec.get("meta") or {})
+    for key in META_TEXT:
+        if not isinstance(meta.get(key, ""), str):
+            raise BadRequest(f'meta.{key} moet tekst zijn')
+    materialen = meta.get("materialen") or []
+    if not isinstance(materialen, list) or not all(isinstance(m, dict) for m in materialen):
+        raise BadRequest('meta.materialen moet een lijst van objecten zijn')
+    for key in ("logo", "cover_bytes"):
+        if meta.get(key):
+            meta[key] = _image(meta[key], f"meta.{key}")
+
+    steps = []
+    for n, step in enumerate(spec.get("steps") or [], 1):
+        if not isinstance(step, dict):
+            raise BadRequest(f"stap {n}: moet een object zijn")
+        if not isinstance(step.get("title") or "", str):
+            raise BadRequest(f'stap {n}: "title" moet tekst zijn')
+        blocks = step.get("text_blocks") or []
+        if not isinstance(blocks, list) or not all(isinstance(t, str) for t in blocks):
+            raise BadRequest(f'stap {n}: "text_blocks" moet een lijst met tekst zijn')
+        images = step.get("images") or []
+        if not isinstance(images, list):
+            raise BadRequest(f'stap {n}: "images" moet een lijst zijn')
+        steps.append({**step, "text_blocks": blocks,
+                      "images": [_image(img, f"stap {n}, afbeelding {i}") for i, img in enumerate(images, 1) if img]})
+    return meta, steps
+
+
+def _docx_body(body):
+    """Converters met een .docx als body: geen zip of geen Word-document → BadRequest."""
+    if not zipfile.is_zipfile(body):
+        raise BadRequest("body is geen .docx (geen zip-bestand)")
+    body.seek(0)
+    with zipfile.ZipFile(body) as zf:
+        if "word/document.xml" not in zf.namelist():
+            raise BadRequest("body is geen .docx (word/document.xml ontbreekt)")
+
+
+def _remove_file(path: str):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+class FileResult:
+    """
+    Resultaat op schijf (gestreamd werkboekje), in stukken uitgeleverd.
+    Het bestand verdwijnt zodra de cache en lopende responses het loslaten.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.size = os.path.getsize(path)
+        self._cleanup = weakref.finalize(self, _remove_file, path)
+
+
+def _convert_workbook(body):
+    import workbook_stream
+    from workbook_builder import build_workbook_docx_front_and_steps
+
+    meta, steps = _workbook_spec(body)
+    if workbook_stream.count_images(meta, steps) >= workbook_stream.WORKBOOK_STREAM_MIN_IMAGES:
+        fd, path = tempfile.mkstemp(prefix="triade-workbook-", suffix=".docx")
+        try:
+            with os.fdopen(fd, "wb") as out:
+                workbook_stream.write_workbook_docx(meta, steps, out)
+        except BaseException:
+            _remove_file(path)
+            raise
+        return FileResult(path)
+    return build_workbook_docx_front_and_steps(meta, steps).getvalue()
+
+
+CONVERTERS = {
+    "html": (_convert_html, "text/html; charset=utf-8"),
+    "html_compact": (_convert_html_compact, "text/html; charset=utf-8"),
+    "html_pages": (_convert_html_pages, "application/zip"),
+    "html_pages_compact": (_convert_html_pages_compact, "application/zip"),
+    "pptx": (_convert_pptx, MIME_PPTX),
+    "workbook": (_convert_workbook, MIME_DOCX),
+}
+
+# invoer die we al in de request-thread controleren, zodat fouten een 400 worden
+VALIDATORS = {
+    "html": _docx_body,
+    "html_compact": _docx_body,
+    "html_pages": _docx_body,
+    "html_pages_compact": _docx_body,
+    "pptx": _docx_body,
+    "workbook": _workbook_spec,
+}
+
+# resultaten die we voorcomprimeren (tekst; docx/pptx zijn al zip)
+PRECOMPRESS = {"html", "html_compact"}
+ENCODING_PREFERENCE = ("br", "gzip")
+
+
+def _client_error(exc: Exception) -> bool:
+    """Fouten die door de invoer komen (kapotte .docx e.d.) → 400 i.p.v. 500."""
+    from docx.opc.exceptions import PackageNotFoundError
+    return isinstance(exc, (BadRequest, zipfile.BadZipFile, PackageNotFoundError))
+
+
+# ---------- Worker pool met backpressure ----------
+class Saturated(Exception):
+    pass
+
+
+class JobManager:
+    def __init__(self, workers: int, queue: int):
+        self.pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="convert")
+        self.slots = threading.BoundedSemaphore(workers + queue)
+        self.jobs: dict = {}
+        self.results: "OrderedDict[str, tuple]" = OrderedDict()
+        self.lock = threading.Lock()
+
+    # -- resultaat-cache op ETag --
+    def cached(self, etag: str):
+        with self.lock:
+            hit = self.results.get(etag)
+            if hit is not None:
+                self.results.move_to_end(etag)
+            return hit
+
+    def _store(self, etag: str, result: tuple):
+        with self.lock:
+            self.results[etag] = result
+            while len(self.results) > API_RESULT_CACHE:
+                self.results.popitem(last=False)
+
+    # -- jobs --
+    def reserve(self):
+        if not self.slots.acquire(blocking=False):
+            raise Saturated()
+
+    def release(self):
+        self.slots.release()
+
+    def submit(self, kind: str, etag: str, body) -> dict:
+        """Slot moet al gereserveerd zijn; body wordt na afloop gesloten."""
+        convert, content_type = CONVERTERS[kind]
+        job = {"id": uuid.uuid4().hex, "kind": kind, "etag": etag, "status": "queued",
+               "created": time.time(), "error": None, "code": None}
+        with self.lock:
+            self._expire()
+            self.jobs[job["id"]] = job
+
+        def run():
+            job["status"] = "running"
+            try:
+                data = convert(body)
+                encoded = {}
+                if kind in PRECOMPRESS:
+                    from html_compact import precompress
+                    encoded = precompress(data)
+                result = (content_type, data, encoded)
+                self._store(etag, result)
+                job["status"] = "done"
+                return result
+            except Exception as e:
+                job["status"] = "failed"
+                job["error"] = str(e)
+                job["code"] = 400 if _client_error(e) else 500
+            finally:
+                body.close()
+                self.release()
+
+        job["future"] = self.pool.submit(run)
+        return job
+
+    def finished(self, kind: str, etag: str) -> dict:
+        """Afgeronde job voor een resultaat dat al in de cache staat (async cache-hit)."""
+        job = {"id": uuid.uuid4().hex, "kind": kind, "etag": etag, "status": "done",
+               "created": time.time(), "error": None, "code": None, "future": None}
+        with self.lock:
+            self._expire()
+            self.jobs[job["id"]] = job
+        return job
+
+    def get(self, job_id: str):
+        with self.lock:
+            return self.jobs.get(job_id)
+
+    def _expire(self):
+        cutoff = time.time() - API_JOB_TTL
+        for job_id in [j for j, job in self.jobs.items() if job["created"] < cutoff and job["status"] in ("done", "failed")]:
+            del self.jobs[job_id]
+
+
+MANAGER = JobManager(API_WORKERS, API_QUEUE)
+
+
+# ---------- HTTP ----------
+class BodyTooLarge(Exception):
+    pass
+
+
+class Handler(BaseHTTPRequestHandler):
+    server_version = "TriadeConvert/1.0"
+    protocol_version = "HTTP/1.1"
+
+    # -- helpers --
+    def _send(self, status: int, body=b"", content_type: str = "application/json", headers=None):
+        """body: bytes of een FileResult (dat in stukken van CHUNK gaat)."""
+        self.send_response(status)
+        for k, v in (headers or {}).items():
+            self.send_header(k, v)
+        if status != 304:
+            self.send_header("Content-Type", content_type)
+        if self.close_connection:   # body (deels) ongelezen: client moet opnieuw verbinden
+            self.send_header("Connection", "close")
+        size = body.size if isinstance(body, FileResult) else len(body)
+        self.send_header("Content-Length", str(size))
+        self.end_headers()
+        if not size or self.command == "HEAD":
+            return
+        if isinstance(body, FileResult):
+            with open(body.path, "rb") as f:
+                shutil.copyfileobj(f, self.wfile, CHUNK)
+        else:
+            self.wfile.write(body)
+
+    def _json(self, status: int, obj: dict, headers=None):
+        self._send(status, json.dumps(obj).encode("utf-8"), headers=headers)
+
+    def _iter_body(self):
+        """Streamt de request-body in chunks (Content-Length of chunked)."""
+        if "chunked" in (self.headers.get("Transfer-Encoding") or "").lower():
+            while True:
+                line = self.rfile.readline(1024)
+                try:
+                    size = int(line.split(b";")[0].strip() or b"0", 16)
+                except ValueError:
+                    raise BadRequest("ongeldige chunk-grootte") from None
+                if size == 0:
+                    # trailers overslaan
+                    while self.rfile.readline() not in (b"\r\n", b"\n", b""):
+                        pass
+                    return
+                remaining = size
+                while remaining:
+                    chunk = self.rfile.read(min(CHUNK, remaining))
+                    if not chunk:
+                        return
+                    remaining -= len(chunk)
+                    yield chunk
+                self.rfile.readline()
+        else:
+            remaining = int(self.headers.get("Content-Length") or 0)
+            while remaining > 0:
+                chunk = self.rfile.read(min(CHUNK, remaining))
+                if not chunk:
+                    return
+                remaining -= len(chunk)
+                yield chunk
+
+    def _spool_body(self, kind: str):
+        """Body → SpooledTemporaryFile + sha256, zonder alles in het geheugen te houden."""
+        spool = tempfile.SpooledTemporaryFile(max_size=API_SPOOL_MB * 1024 * 1024)
+        digest = hashlib.sha256(kind.encode("ascii") + b"\0")
+        size, limit = 0, API_MAX_BODY_MB * 1024 * 1024
+        try:
+            for chunk in self._iter_body():
+                size += len(chunk)
+                if size > limit:
+                    raise BodyTooLarge()
+                digest.update(chunk)
+                spool.write(chunk)
+        except BaseException:
+            spool.close()
+            raise
+        spool.seek(0)
+        return spool, f'"{kind}-{digest.hexdigest()[:32]}"', size
+
+    def _accepted_encoding(self, available) -> str | None:
+        accepted = {}
+        for part in (self.headers.get("Accept-Encoding") or "").split(","):
+            name, _, params = part.strip().partition(";")
+            q = 1.0
+            if params.strip().startswith("q="):
+                try:
+                    q = float(params.strip()[2:])
+                except ValueError:
+                    q = 0.0
+            if name:
+                accepted[name.lower()] = q
+        for enc in ENCODING_PREFERENCE:
+            if enc in available and accepted.get(enc, accepted.get("*", 0)) > 0:
+                return enc
+        return None
+
+    def _not_modified(self, etag: str) -> bool:
+        """If-None-Match: `*`, de ETag zelf of die van een gecomprimeerde variant (zwakke vergelijking)."""
+        header = self.headers.get("If-None-Match")
+        if not header:
+            return False
+        variants = {etag} | {f'{etag[:-1]}-{enc}"' for enc in ENCODING_PREFERENCE}
+        for tag in header.split(","):
+            tag = tag.strip()
+            if tag.removeprefix("W/") in variants:
+                return True
+            if tag == "*":   # elke bestaande representatie
+                return MANAGER.cached(etag) is not None
+        return False
+
+    def _send_result(self, etag: str, result: tuple):
+        content_type, data, encoded = result
+        headers = {"ETag": etag}
+        if encoded:
+            headers["Vary"] = "Accept-Encoding"
+            enc = self._accepted_encoding(encoded)
+            if enc:
+                data = encoded[enc]
+                headers["Content-Encoding"] = enc
+                headers["ETag"] = f'{etag[:-1]}-{enc}"'
+        self._send(200, data, content_type, headers=headers)
+
+    def _accepted(self, job: dict):
+        status_url = f"/jobs/{job['id']}"
+        return self._json(202, {"job": job["id"], "status_url": status_url}, headers={"Location": status_url})
+
+    # -- routes --
+    def do_GET(self):
+        path = urlsplit(self.path).path.rstrip("/")
+        if path == "/healthz":
+            return self._json(200, {"ok": True})
+        if path == "/metrics":
+            import metrics
+            return self._send(200, metrics.render().encode("utf-8"), metrics.CONTENT_TYPE)
+
+        parts = path.split("/")
+        if len(parts) in (3, 4) and parts[1] == "jobs":
+            job = MANAGER.get(parts[2])
+            if job is None:
+                return self._json(404, {"error": "onbekende job"})
+            if len(parts) == 3:
+                return self._json(200, {k: job[k] for k in ("id", "kind", "status", "etag", "error")})
+            if parts[3] == "result":
+                if job["status"] != "done":
+                    return self._json(409, {"error": f"job is {job['status']}"})
+                if self._not_modified(job["etag"]):
+                    return self._send(304, headers={"ETag": job["etag"]})
+                result = MANAGER.cached(job["etag"])
+                if result is None:
+                    return self._json(410, {"error": "resultaat niet meer beschikbaar"})
+                return self._send_result(job["etag"], result)
+
+        self._json(404, {"error": "niet gevonden"})
+
+    def do_POST(self):
+        url = urlsplit(self.path)
+        parts = url.path.rstrip("/").split("/")
+        if len(parts) != 3 or parts[1] != "convert" or parts[2] not in CONVERTERS:
+            self.close_connection = True   # body niet gelezen: verbinding niet hergebruiken
+            return self._json(404, {"error": "niet gevonden"})
+        kind = parts[2]
+        query = parse_qs(url.query)
+        mode = (query.get("mode") or ["sync"])[0]
+        if kind == "html":
+            paginate = (query.get("paginate") or ["0"])[0] in ("1", "true")
+            compact = (query.get("compact") or ["0"])[0] in ("1", "true")
+            kind = ("html_pages" if paginate else "html") + ("_compact" if compact else "")
+
+        # backpressure: slot reserveren vóór we de upload lezen
+        try:
+            MANAGER.reserve()
+        except Saturated:
+            self.close_connection = True
+            return self._json(429, {"error": "alle workers bezet"}, headers={"Retry-After": "5"})
+
+        submitted = False
+        try:
+            try:
+                body, etag, size = self._spool_body(kind)
+            except BodyTooLarge:
+                self.close_connection = True
+                return self._json(413, {"error": f"body groter dan {API_MAX_BODY_MB} MB"})
+            except BadRequest as e:
+                self.close_connection = True
+                return self._json(400, {"error": str(e)})
+            if size == 0:
+                body.close()
+                return self._json(400, {"error": "lege body"})
+
+            if self._not_modified(etag):
+                body.close()
+                return self._send(304, headers={"ETag": etag})
+
+            cached = MANAGER.cached(etag)
+            if cached is not None:
+                body.close()
+                if mode == "async":
+                    return self._accepted(MANAGER.finished(kind, etag))
+                return self._send_result(etag, cached)
+
+            if kind in VALIDATORS:
+                try:
+                    VALIDATORS[kind](body)
+                except BadRequest as e:
+                    body.close()
+                    return self._json(400, {"error": str(e)})
+                except zipfile.BadZipFile as e:
+                    body.close()
+                    return self._json(400, {"error": f"ongeldig zip-bestand: {e}"})
+                body.seek(0)
+
+            job = MANAGER.submit(kind, etag, body)
+            submitted = True
+        finally:
+            if not submitted:
+                MANAGER.release()
+
+        if mode == "async":
+            return self._accepted(job)
+
+        try:
+            result = job["future"].result(timeout=API_SYNC_TIMEOUT)
+        except FutureTimeout:
+            return self._accepted(job)
+
+        if result is None:
+            return self._json(job["code"] or 500, {"error": job["error"] or "conversie mislukt"})
+        return self._send_result(etag, result)
+
+
+def serve(host: str = "127.0.0.1", port: int = 8080):
+    server = ThreadingHTTPServer((host, port), Handler)
+    server.daemon_threads = True
+    print(f"Converter-API op http://{host}:{port} ({API_WORKERS} workers, wachtrij {API_QUEUE})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="HTTP-API voor de DOCX-converters.")
+    parser.add_argument("--host", default=os.getenv("API_HOST", "127.0.0.1"))
+    parser.add_argument("--port", type=int, default=int(os.getenv("API_PORT", "8080")))
+    args = parser.parse_args()
+    serve(args.host, args.port)
@@ -1,11 +1,44 @@
 import os
+import threading
+import importlib
 import streamlit as st
-from html_converter import docx_to_html
-from pptx_converter_hybrid import docx_to_pptx_hybrid
-from workbook_builder import build_workbook_docx_front_and_steps
+from upload_store import UploadStore
+from workbook_fields import MATERIAAL_COLS
+import metrics
+
+# De converters (python-docx, python-pptx, lxml, Pillow, cloudinary, requests)
+# worden pas geïmporteerd bij de actie die ze nodig heeft, niet bij het laden
+# van de pagina. Meten: python bench_startup.py
+CONVERTER_MODULES = ("html_converter", "pptx_converter_hybrid", "workbook_builder")
 
 st.set_page_config(page_title="Triade DOCX Tools", page_icon="📘", layout="wide")
 
+# /metrics op METRICS_PORT (1x per proces)
+metrics.start_from_env()
+
+
+@st.cache_resource
+def start_llm_warmup():
+    """
+    LLM_WARMUP=1: modellen uit de pool laden + vaste prompt-prefix cachen bij
+    de start, daarna keep-alive pings. Standaard uit: het laadt llm_router en
+    requests al bij de eerste render en pingt een server die er misschien niet is.
+    """
+    from llm_router import get_router
+    return get_router().start_warmup_and_keepalive()
+
+
+@st.cache_resource
+def start_prewarm():
+    """TRIADE_PREWARM=1: converters op de achtergrond laden na de eerste render."""
+    def warm():
+        for name in CONVERTER_MODULES:
+            importlib.import_module(name)
+
+    thread = threading.Thread(target=warm, name="prewarm", daemon=True)
+    thread.start()
+    return thread
+
 # ---------- CSS: alleen een smalle topbar ----------
 st.markdown(
     """
@@ -90,57 +123,314 @@ with top4:
 # ⚠️ géén hero-blok meer hier!
 
 
+# ---------- Per-sessie memo ----------
+# Streamlit draait het script opnieuw bij elke widget-actie. Dure stappen
+# (DOCX parsen, uploaden naar Cloudinary, AI) bewaren we per sessie, gekoppeld
+# aan het file_id van de upload: ze lopen alleen opnieuw als de invoer wijzigt.
+def session_memo(name: str, key, compute):
+    memo = st.session_state.setdefault("_memo", {})
+    hit = memo.get(name)
+    if hit is not None and hit[0] == key:
+        return hit[1]
+    value = compute()
+    memo[name] = (key, value)
+    return value
+
+
+def memo_get(name: str, key):
+    hit = st.session_state.get("_memo", {}).get(name)
+    return hit[1] if hit is not None and hit[0] == key else None
+
+
+# ---------- Uploads per sessie ----------
+# Uploads gaan één keer naar een UploadStore (groot → tijdelijk bestand, met
+# geheugenbudget per sessie). Converters krijgen de handle, geen bytes-kopie.
+# Een lege uploader (None) laat de vorige upload los; het bestand verdwijnt
+# zodra ook lopend werk de handle niet meer vasthoudt.
+def stored_upload(key: str, uploaded):
+    if "_uploads" not in st.session_state:
+        st.session_state["_uploads"] = UploadStore()
+    store = st.session_state["_uploads"]
+    if uploaded is None:
+        store.discard(key)
+        return None
+    return store.put(key, uploaded)
+
+
+def discard_stale_uploads(prefix: str, keep: set):
+    """Uploads onder `prefix` die niet meer in de uploader staan, vergeten."""
+    store = st.session_state.get("_uploads")
+    if store is None:
+        return
+    for key in store.keys():
+        if key.startswith(prefix) and key not in keep:
+            store.discard(key)
+
+
+# ---------- LLM-wachtrij ----------
+# Alle sessies delen één modelserver; llm_scheduler verdeelt de beurten eerlijk
+# per sessie. De job draait in een thread, de pagina toont intussen de plek in de rij.
+def session_id() -> str | None:
+    from streamlit.runtime.scriptrunner import get_script_run_ctx
+
+    ctx = get_script_run_ctx()
+    return ctx.session_id if ctx else None
+
+
+def run_llm_job(compute, poll: float = 0.5):
+    from llm_scheduler import get_scheduler, tenant
+
+    session = session_id()
+    result = {}
+
+    def work():
+        with tenant(session):
+            try:
+                result["value"] = compute()
+            except Exception as e:
+                result["error"] = e
+
+    thread = threading.Thread(target=work, name="llm-job", daemon=True)
+    thread.start()
+    box = st.empty()
+    scheduler = get_scheduler()
+    while thread.is_alive():
+        status = scheduler.status(session)
+        if status["position"] is not None and not status["running"]:
+            box.info(f"⏳ In de wachtrij: plek {status['position']} van {status['total_queued']} "
+                     f"({status['busy']} verzoek(en) in behandeling)")
+        elif status["running"]:
+            box.info("🤖 Het taalmodel is bezig met jouw document…")
+        thread.join(poll)
+    box.empty()
+    if "error" in result:
+        raise result["error"]
+    return result["value"]
+
+
 # ---------- TABS ----------
 tab1, tab2, tab3 = st.tabs(
     ["💚 HTML (Stermonitor/ Elodigitaal)", "🤖 PowerPoint", "📘 Werkboekjes-generator"]
 )
 
 # ---------------- TAB 1 ----------------
-with tab1:
+# ---------- HTML-voorvertoning ----------
+# Nooit de volledige uitvoer naar de browser: een iframe (met placeholders bij
+# grote bestanden) en de broncode per pagina, data-URI's ingekort.
+@st.fragment
+def html_preview_panel(preview):
+    view, source = st.tabs(["👀 Voorbeeld", "🧾 Broncode"])
+    with view:
+        if preview.images_replaced:
+            st.caption("Ingesloten afbeeldingen zijn in dit voorbeeld vervangen door een placeholder.")
+        if preview.truncated:
+            st.caption("Het voorbeeld is ingekort; de download bevat de volledige les.")
+        st.iframe(preview.src, height=600)
+    with source:
+        pages = preview.source_pages
+        page = 1
+        if len(pages) > 1:
+            page = st.number_input(f"Deel (van {len(pages)})", 1, len(pages), 1, key="html_source_page")
+        if preview.data_uris:
+            st.caption(f"{preview.data_uris} ingesloten afbeelding(en) ingekort "
+                       f"({preview.data_uri_bytes / 1024:.0f} KB base64).")
+        st.code(pages[page - 1], language="html")
+
+
+@st.fragment
+def html_tab():
     st.subheader("DOCX → HTML Converter")
     uploaded_html = st.file_uploader("Upload Word-bestand (.docx)", type=["docx"], key="html_upload")
+    handle = stored_upload("html_upload", uploaded_html)   # None → vorige upload vergeten
+
+    compact = st.toggle(
+        "Compacte HTML", key="html_compact",
+        help="Herhaalde stijlen als CSS-klassen, zonder extra witruimte. Met gzip/brotli-varianten.",
+    )
+    paginate = st.toggle(
+        "Per hoofdstuk opsplitsen", key="html_paginate",
+        help="Eén pagina per kop 1, met een inhoudsopgave (index.html). Handig voor lange handleidingen.",
+    )
+
+    if uploaded_html and paginate:
+        with st.spinner("Word-bestand wordt per hoofdstuk omgezet..."):
+            from html_converter import docx_to_html_pages, pages_to_zip
 
-    if uploaded_html:
+            def build_pages():
+                pages = docx_to_html_pages(handle, compact=compact)
+                return pages, pages_to_zip(pages)
+
+            pages, zip_bytes = session_memo("html_pages", (uploaded_html.file_id, compact), build_pages)
+        st.success(f"✅ Klaar! {len(pages) - 1} hoofdstukken + inhoudsopgave.")
+        st.dataframe(
+            [{"pagina": name, "KB": round(len(html.encode("utf-8")) / 1024, 1)} for name, html in pages.items()],
+            hide_index=True,
+        )
+        st.download_button(
+            "⬇️ Download alle pagina's (ZIP)",
+            data=zip_bytes,
+            file_name="les_stermonitor_paginas.zip",
+            mime="application/zip",
+            key="html_pages_dl",
+        )
+    elif uploaded_html:
         with st.spinner("Word-bestand wordt omgezet..."):
-            html_out = docx_to_html(uploaded_html)
+            from html_converter import docx_to_html
+            from html_preview import build_preview
+            html_out = session_memo("html", uploaded_html.file_id, lambda: docx_to_html(handle))
+            output = None
+            if compact:
+                from html_compact import build_output
+                output = session_memo(
+                    "html_compact", uploaded_html.file_id, lambda: build_output(html_out)
+                )
         st.success("✅ Klaar! HTML gegenereerd.")
-        st.code(html_out, language="html")
+
+        if output is not None:
+            report = output.report()
+            cols = st.columns(len(report))
+            for col, (name, row) in zip(cols, report.items()):
+                delta = f"-{row['besparing_pct']}%" if name != "origineel" else None
+                col.metric(name, f"{row['bytes'] / 1024:.1f} KB", delta, delta_color="inverse")
+            html_out = output.html
+
+        preview = session_memo(
+            "html_preview", (uploaded_html.file_id, compact), lambda: build_preview(html_out)
+        )
+        html_preview_panel(preview)
         st.download_button(
             "⬇️ Download HTML-bestand",
             data=html_out,
             file_name="les_stermonitor.html",
             mime="text/html",
         )
+        if output is not None:
+            suffixes = {"gzip": "gz", "br": "br"}
+            for enc, blob in output.encoded.items():
+                st.download_button(
+                    f"⬇️ Download voorgecomprimeerd (.{suffixes[enc]})",
+                    data=blob,
+                    file_name=f"les_stermonitor.html.{suffixes[enc]}",
+                    mime="application/octet-stream",
+                    key=f"html_dl_{enc}",
+                )
     else:
         st.info("Upload een .docx-bestand om te converteren naar HTML.")
 
+    st.divider()
+    st.markdown("**Bulk: een hele module in één keer**")
+    bulk_files = st.file_uploader(
+        "Upload een ZIP met lessen of meerdere .docx-bestanden",
+        type=["zip", "docx"], accept_multiple_files=True, key="html_bulk_upload",
+    )
+    discard_stale_uploads("html_bulk:", {f"html_bulk:{f.file_id}" for f in bulk_files or []})
+    if bulk_files:
+        bulk_key = (tuple(f.file_id for f in bulk_files), compact)
+        result = memo_get("html_bulk", bulk_key)
+        # al omgezet voor deze bestanden + instelling: alleen de download tonen
+        if result is None and st.button("⚙️ Converteer alles", key="html_bulk_go"):
+            import zipfile
+            import html_bulk
+
+            sources = [(f.name, stored_upload(f"html_bulk:{f.file_id}", f)) for f in bulk_files]
+            try:
+                items = html_bulk.collect_items(sources)
+            except (ValueError, zipfile.BadZipFile) as e:
+                st.error(f"❌ Kon de upload niet lezen: {e}")
+                items = None
+
+            if items:
+                progress = st.progress(0.0, text=f"0 / {len(items)} lessen")
+                table = st.empty()
+                for done in html_bulk.convert_all(items, compact=compact):
+                    progress.progress(done / len(items), text=f"{done} / {len(items)} lessen")
+                    table.dataframe([i.row() for i in items], hide_index=True)
+                result = session_memo("html_bulk", bulk_key, lambda: (
+                    html_bulk.build_zip(items), [i.row() for i in items]
+                ))
+            elif items is not None:
+                st.warning("Geen .docx-bestanden gevonden in de upload.")
+
+        if result is not None:
+            zip_bytes, rows = result
+            failed = [r for r in rows if r["status"] == "fout"]
+            if failed:
+                st.warning(f"{len(failed)} van {len(rows)} lessen mislukt (zie manifest.json in de ZIP).")
+            else:
+                st.success(f"✅ {len(rows)} lessen omgezet.")
+            st.download_button(
+                "⬇️ Download alle HTML (ZIP)",
+                data=zip_bytes,
+                file_name="lessen_html.zip",
+                mime="application/zip",
+                key="html_bulk_dl",
+            )
+
+
+with tab1:
+    html_tab()
+
 
 # ---------------- TAB 2 ----------------
-with tab2:
+def speculate_pptx(uploaded):
+    """Na een upload alvast blokken + dia's voorbereiden (zie speculative); oude upload → annuleren."""
+    import speculative
+
+    spec = st.session_state.get("_pptx_spec")
+    if spec is not None and uploaded is not None and spec.file_id == uploaded.file_id:
+        return spec
+    if spec is not None:
+        spec.cancel()
+        del st.session_state["_pptx_spec"]
+    if uploaded is None:
+        stored_upload("hybrid_upload", None)
+    if uploaded is None or not speculative.PPTX_SPECULATE or memo_get("pptx", uploaded.file_id) is not None:
+        return None
+    spec = speculative.Speculation(uploaded.file_id, stored_upload("hybrid_upload", uploaded), session_id())
+    st.session_state["_pptx_spec"] = spec
+    return spec
+
+
+@st.fragment
+def pptx_tab():
     st.subheader("DOCX → PowerPoint (AI-hybride)")
     uploaded_ai = st.file_uploader("Upload Word-bestand (.docx)", type=["docx"], key="hybrid_upload")
+    spec = speculate_pptx(uploaded_ai)
 
     if uploaded_ai:
+        if spec is not None and spec.running:
+            st.caption("⚙️ Dia's worden alvast op de achtergrond voorbereid.")
         if st.button("📽️ Maak PowerPoint", type="primary"):
             with st.spinner("PowerPoint wordt opgebouwd met AI..."):
                 try:
-                    pptx_bytes = docx_to_pptx_hybrid(uploaded_ai)
+                    handle = stored_upload("hybrid_upload", uploaded_ai)
+                    from pptx_converter_hybrid import docx_to_pptx_hybrid
+                    session_memo("pptx", uploaded_ai.file_id, lambda: run_llm_job(
+                        lambda: docx_to_pptx_hybrid(handle).getvalue()
+                    ))
                 except Exception as e:
                     st.error(f"❌ Kon geen PowerPoint maken: {e}")
-                else:
-                    st.success("✅ Klaar! PowerPoint gegenereerd.")
-                    st.download_button(
-                        "⬇️ Download PowerPoint (AI-hybride)",
-                        data=pptx_bytes,
-                        file_name="les_ai_hybride.pptx",
-                        mime="application/vnd.openxmlformats-officedocument.presentationml.presentation",
-                    )
+
+        pptx_bytes = memo_get("pptx", uploaded_ai.file_id)
+        if pptx_bytes is not None:
+            st.success("✅ Klaar! PowerPoint gegenereerd.")
+            st.download_button(
+                "⬇️ Download PowerPoint (AI-hybride)",
+                data=pptx_bytes,
+                file_name="les_ai_hybride.pptx",
+                mime="application/vnd.openxmlformats-officedocument.presentationml.presentation",
+            )
     else:
         st.info("Upload een .docx-bestand om een AI-dia te genereren.")
 
 
+with tab2:
+    pptx_tab()
+
+
 # ---------------- TAB 3 ----------------
-with tab3:
+@st.fragment
+def workbook_tab():
     st.subheader("📘 Werkboekjes-generator")
     st.caption("Voorblad → (optioneel) materiaalstaat → daarna pagina’s die je zelf kiest.")
 
@@ -153,7 +443,9 @@ with tab3:
     with col2:
         wb_docent = st.text_input("Docent")
         wb_duur = st.text_input("Duur van de opdracht", value="11 x 45 minuten")
-        wb_cover = st.file_uploader("📸 Omslagfoto (optioneel)", type=["png", "jpg", "jpeg"])
+        wb_cover = stored_upload(
+            "wb_cover", st.file_uploader("📸 Omslagfoto (optioneel)", type=["png", "jpg", "jpeg"])
+        )
 
     st.markdown("---")
 
@@ -169,23 +461,39 @@ with tab3:
     materialen = []
     if include_materiaalstaat:
         st.markdown("#### Materiaalstaat invullen")
-        st.caption("Vul hieronder de materialen in.")
-        headers = ["Nummer", "Aantal", "Benaming", "Lengte", "Breedte", "Dikte", "Materiaal"]
-        header_cols = st.columns([1, 1, 2, 1, 1, 1, 1])
-        for i, h in enumerate(headers):
-            header_cols[i].markdown(f"**{h}**")
-
-        for row_idx in range(st.session_state.num_material_rows):
-            cols = st.columns([1, 1, 2, 1, 1, 1, 1])
-            values = []
-            for col_idx, h in enumerate(headers):
-                values.append(
-                    cols[col_idx].text_input(
-                        label="", key=f"mat_{h}_{row_idx}", placeholder=h
+        mat_file = st.file_uploader(
+            "📄 Materiaalstaat importeren (CSV of Excel, optioneel)",
+            type=["csv", "xlsx"],
+            key="mat_import",
+        )
+
+        if mat_file is not None:
+            try:
+                from workbook_builder import read_materiaalstaat
+                materialen = read_materiaalstaat(mat_file.name, mat_file.getvalue())
+            except Exception as e:
+                st.error(f"❌ Kon materiaalstaat niet lezen: {e}")
+            else:
+                st.caption(f"{len(materialen)} materialen geïmporteerd.")
+                st.dataframe(materialen, use_container_width=True, hide_index=True)
+        else:
+            st.caption("Vul hieronder de materialen in.")
+            headers = MATERIAAL_COLS
+            header_cols = st.columns([1, 1, 2, 1, 1, 1, 1])
+            for i, h in enumerate(headers):
+                header_cols[i].markdown(f"**{h}**")
+
+            for row_idx in range(st.session_state.num_material_rows):
+                cols = st.columns([1, 1, 2, 1, 1, 1, 1])
+                values = []
+                for col_idx, h in enumerate(headers):
+                    values.append(
+                        cols[col_idx].text_input(
+                            label="", key=f"mat_{h}_{row_idx}", placeholder=h
+                        )
                     )
-                )
-            materialen.append(dict(zip(headers, values)))
-        st.button("➕ Voeg materiaal toe", on_click=add_material_row)
+                materialen.append(dict(zip(headers, values)))
+            st.button("➕ Voeg materiaal toe", on_click=add_material_row)
 
     st.markdown("---")
 
@@ -214,29 +522,29 @@ with tab3:
         page_data = {"layout": layout}
 
         if layout == "Werktekening (1 grote afbeelding)":
-            img = st.file_uploader(
+            img = stored_upload(f"page_img_{idx}_0", st.file_uploader(
                 f"Afbeelding voor pagina {idx+1}", type=["png", "jpg", "jpeg"], key=f"page_img_{idx}_0"
-            )
-            page_data["images"] = [img.read()] if img else []
+            ))
+            page_data["images"] = [img] if img else []
             page_data["steps"] = []
         elif layout == "1 stap: korte tekst + grote afbeelding":
             title = st.text_input(f"Titel voor pagina {idx+1}", key=f"page_title_{idx}_0")
             text = st.text_area(f"Tekst (max 4 regels)", key=f"page_text_{idx}_0", height=80)
-            img = st.file_uploader(
+            img = stored_upload(f"page_img_{idx}_0", st.file_uploader(
                 f"Afbeelding voor pagina {idx+1}", type=["png", "jpg", "jpeg"], key=f"page_img_{idx}_0"
-            )
+            ))
             page_data["steps"] = [{"title": title, "text": text}]
-            page_data["images"] = [img.read()] if img else []
+            page_data["images"] = [img] if img else []
         elif layout == "2 stappen: tekst + afbeelding (past op 1 pagina)":
             steps_list, images_list = [], []
             for s in range(2):
                 title = st.text_input(f"Titel stap {s+1} (pagina {idx+1})", key=f"page_title_{idx}_{s}")
                 text = st.text_area(f"Tekst stap {s+1}", key=f"page_text_{idx}_{s}", height=80)
-                img = st.file_uploader(
+                img = stored_upload(f"page_img_{idx}_{s}", st.file_uploader(
                     f"Afbeelding stap {s+1}", type=["png", "jpg", "jpeg"], key=f"page_img_{idx}_{s}"
-                )
+                ))
                 steps_list.append({"title": title, "text": text})
-                images_list.append(img.read() if img else None)
+                images_list.append(img)
             page_data["steps"] = steps_list
             page_data["images"] = images_list
         elif layout == "3 stappen: tekst + afbeelding (past op 1 pagina)":
@@ -244,11 +552,11 @@ with tab3:
             for s in range(3):
                 title = st.text_input(f"Titel stap {s+1} (pagina {idx+1})", key=f"page_title_{idx}_{s}")
                 text = st.text_area(f"Tekst stap {s+1}", key=f"page_text_{idx}_{s}", height=80)
-                img = st.file_uploader(
+                img = stored_upload(f"page_img_{idx}_{s}", st.file_uploader(
                     f"Afbeelding stap {s+1}", type=["png", "jpg", "jpeg"], key=f"page_img_{idx}_{s}"
-                )
+                ))
                 steps_list.append({"title": title, "text": text})
-                images_list.append(img.read() if img else None)
+                images_list.append(img)
             page_data["steps"] = steps_list
             page_data["images"] = images_list
 
@@ -256,9 +564,11 @@ with tab3:
         st.markdown("---")
 
     # knop onderaan
-    if st.button("➕ Nieuwe pagina"):
+    def add_page():
         st.session_state.wb_pages.append({"layout": "Werktekening (1 grote afbeelding)"})
 
+    st.button("➕ Nieuwe pagina", on_click=add_page)
+
     st.markdown("---")
 
     # genereren
@@ -280,7 +590,7 @@ with tab3:
                 meta["logo"] = f.read()
 
         if wb_cover is not None:
-            meta["cover_bytes"] = wb_cover.read()
+            meta["cover_bytes"] = wb_cover
 
         steps = []
         for page in pages_data:
@@ -315,7 +625,21 @@ with tab3:
 
         with st.spinner("Werkboekje wordt gemaakt..."):
             try:
-                docx_bytes = build_workbook_docx_front_and_steps(meta, steps)
+                import tempfile
+                import workbook_stream
+                if workbook_stream.count_images(meta, steps) >= workbook_stream.WORKBOOK_STREAM_MIN_IMAGES:
+                    # veel foto's: gestreamd opbouwen naar schijf, begrensd geheugen; de
+                    # bytes worden pas bij het downloaden gelezen (het bestand verdwijnt
+                    # als Streamlit de callback loslaat)
+                    out = tempfile.NamedTemporaryFile(prefix="triade-workbook-", suffix=".docx")
+                    workbook_stream.write_workbook_docx(meta, steps, out)
+
+                    def docx_bytes(out=out):
+                        out.seek(0)
+                        return out.read()
+                else:
+                    from workbook_builder import build_workbook_docx_front_and_steps
+                    docx_bytes = build_workbook_docx_front_and_steps(meta, steps)
             except Exception as e:
                 st.error(f"❌ Kon werkboekje niet maken: {e}")
             else:
@@ -327,3 +651,13 @@ with tab3:
                     mime="application/vnd.openxmlformats-officedocument.wordprocessingml.document",
                 )
 
+
+with tab3:
+    workbook_tab()
+
+
+if os.getenv("LLM_WARMUP", "0") == "1":
+    start_llm_warmup()
+
+if os.getenv("TRIADE_PREWARM") == "1":
+    start_prewarm()
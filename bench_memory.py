@@ -0,0 +1,328 @@
+"""
+Geheugen-benchmark: piek-RSS en allocaties per converter, met budgetten.
+
+Elke converter draait op oplopende invoer (klein | middel | groot) in een
+vers Python-proces, twee keer:
+- RSS-run: /proc/self/statm wordt tijdens de conversie bemonsterd (fallback:
+  ru_maxrss); de piek wordt vergeleken met het budget
+- trace-run: tracemalloc voor piek, wat er na afloop vastgehouden blijft
+  (caches) en de grootste allocatieplekken
+Zo telt de overhead van tracemalloc niet mee in de RSS-meting.
+
+De invoer wordt gegenereerd (ruisfoto's, dus niet te comprimeren en niet te
+dedupliceren); de PowerPoint-converter draait met LLM_PROVIDER=OFF zodat
+alleen de deterministische fallback wordt gemeten.
+
+Budgetten (piek-RSS in MB) per converter, overschrijfbaar met
+MEM_BUDGET_<CONVERTER>_MB of --budgets budget.json ({"html": 300} of
+{"html": {"groot": 300}}). Exitcode 1 als een budget wordt overschreden.
+
+workbook_stream is de gestreamde schrijver (workbook_stream) op dezelfde
+invoer, met afbeeldingen als paden en uitvoer naar een tijdelijk bestand.
+
+Gebruik:  python bench_memory.py [--converters html pptx workbook workbook_stream] [--grades klein middel groot] [--top 8]
+"""
+import os
+import sys
+import gc
+import json
+import time
+import tempfile
+import threading
+import subprocess
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+CONVERTERS = ("html", "pptx", "workbook", "workbook_stream")
+
+# (paragrafen, afbeeldingen, fotomaat in px)
+GRADES = {
+    "klein": (20, 2, (1200, 900)),
+    "middel": (100, 10, (2400, 1800)),
+    "groot": (400, 30, (3000, 2000)),
+}
+
+DEFAULT_BUDGETS_MB = {"html": 600, "pptx": 400, "workbook": 300, "workbook_stream": 150}
+
+SAMPLE_INTERVAL = 0.005
+
+
+# ---------- Budgetten ----------
+def load_budgets(path: str | None = None) -> dict:
+    budgets = dict(DEFAULT_BUDGETS_MB)
+    for conv in CONVERTERS:
+        env = os.getenv(f"MEM_BUDGET_{conv.upper()}_MB")
+        if env:
+            budgets[conv] = float(env)
+    if path:
+        with open(path, "r", encoding="utf-8") as f:
+            budgets.update(json.load(f))
+    return budgets
+
+
+def budget_for(budgets: dict, converter: str, grade: str):
+    value = budgets.get(converter)
+    if isinstance(value, dict):
+        return value.get(grade)
+    return value
+
+
+# ---------- Invoer genereren ----------
+def _photo(size) -> bytes:
+    """Ruisfoto als JPEG (realistisch groot, uniek per aanroep)."""
+    import io
+    from PIL import Image
+
+    w, h = size
+    im = Image.merge("RGB", [Image.effect_noise((w, h), 60) for _ in range(3)])
+    buf = io.BytesIO()
+    im.save(buf, "JPEG", quality=85)
+    return buf.getvalue()
+
+
+def make_inputs(grade: str, workdir: str) -> dict:
+    """Schrijft <grade>.docx en <grade>_workbook.json (met foto's) in workdir."""
+    from docx import Document
+    from docx.shared import Inches
+
+    n_paras, n_images, size = GRADES[grade]
+    photos = []
+    for i in range(n_images):
+        path = os.path.join(workdir, f"{grade}_foto{i}.jpg")
+        with open(path, "wb") as f:
+            f.write(_photo(size))
+        photos.append(path)
+
+    doc = Document()
+    every = max(1, n_paras // max(1, n_images))
+    img_iter = iter(photos)
+    for i in range(n_paras):
+        if i % 10 == 0:
+            doc.add_heading(f"Onderdeel {i // 10 + 1}", level=1)
+        doc.add_paragraph(f"Je sluit de leiding aan en controleert de verbinding ({i}). " * 3)
+        if i % every == 0:
+            path = next(img_iter, None)
+            if path:
+                doc.add_picture(path, width=Inches(4))
+    docx_path = os.path.join(workdir, f"{grade}.docx")
+    doc.save(docx_path)
+
+    per_step = 2
+    steps = [
+        {"title": f"Stap {i + 1}", "text_blocks": ["Zaag de plank op lengte."] * 3,
+         "images": photos[j:j + per_step]}
+        for i, j in enumerate(range(0, len(photos), per_step))
+    ]
+    spec = {"meta": {"opdracht_titel": f"Benchmark {grade}", "cover": photos[0] if photos else None},
+            "steps": steps}
+    spec_path = os.path.join(workdir, f"{grade}_workbook.json")
+    with open(spec_path, "w", encoding="utf-8") as f:
+        json.dump(spec, f)
+    return {"docx": docx_path, "workbook": spec_path}
+
+
+# ---------- Meten (in het kind-proces) ----------
+def _rss_bytes() -> int:
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+
+
+class RssSampler:
+    """Bemonstert RSS in een thread; piek = hoogste waarde tijdens de meting."""
+
+    def __init__(self, interval: float = SAMPLE_INTERVAL):
+        self.interval = interval
+        self.peak = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.peak = max(self.peak, _rss_bytes())
+            self._stop.wait(self.interval)
+
+    def __enter__(self):
+        self.peak = _rss_bytes()
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self.peak = max(self.peak, _rss_bytes())
+
+
+def _peak_rss_fallback() -> int:
+    import resource
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def _prepare(converter: str, path: str):
+    """Converter importeren en de aanroep klaarzetten (imports tellen niet mee)."""
+    if converter == "html":
+        from html_converter import docx_to_html
+        return lambda: docx_to_html(path)
+    if converter == "pptx":
+        from pptx_converter_hybrid import docx_to_pptx_hybrid
+        return lambda: docx_to_pptx_hybrid(path)
+    if converter == "workbook":
+        from workbook_builder import build_workbook_docx_front_and_steps
+
+        def run():
+            with open(path, "r", encoding="utf-8") as f:
+                spec = json.load(f)
+
+            def read(p):
+                with open(p, "rb") as f:
+                    return f.read()
+
+            meta = dict(spec["meta"])
+            meta["cover_bytes"] = read(meta.pop("cover")) if meta.get("cover") else None
+            steps = [{**s, "images": [read(p) for p in s["images"]]} for s in spec["steps"]]
+            return build_workbook_docx_front_and_steps(meta, steps)
+        return run
+    if converter == "workbook_stream":
+        from workbook_stream import write_workbook_docx
+
+        def run():
+            with open(path, "r", encoding="utf-8") as f:
+                spec = json.load(f)
+            meta = dict(spec["meta"])
+            meta["cover_bytes"] = meta.pop("cover", None)
+            with tempfile.TemporaryFile() as out:
+                write_workbook_docx(meta, spec["steps"], out)
+                return out.tell()
+        return run
+    raise ValueError(f"Onbekende converter: {converter}")
+
+
+def _site(stat) -> str:
+    frame = stat.traceback[0]
+    filename = os.path.relpath(frame.filename, BASE_DIR) if frame.filename.startswith(BASE_DIR) else frame.filename
+    return f"{filename}:{frame.lineno}"
+
+
+def child(converter: str, path: str, trace: bool, top: int) -> dict:
+    run = _prepare(converter, path)
+    gc.collect()
+    result = {"converter": converter}
+
+    if not trace:
+        base = _rss_bytes() if os.path.exists("/proc/self/statm") else None
+        start = time.perf_counter()
+        if base is None:
+            out = run()
+            result["rss_peak"] = _peak_rss_fallback()
+        else:
+            with RssSampler() as sampler:
+                out = run()
+            result["rss_peak"] = sampler.peak
+        result["rss_base"] = base
+        result["seconds"] = time.perf_counter() - start
+        del out
+        return result
+
+    import tracemalloc
+
+    tracemalloc.start(1)
+    before = tracemalloc.take_snapshot()
+    tracemalloc.reset_peak()
+    out = run()
+    held = tracemalloc.take_snapshot()
+    _, peak = tracemalloc.get_traced_memory()
+    del out
+    gc.collect()
+    retained_snapshot = tracemalloc.take_snapshot()
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    def top_sites(snapshot):
+        stats = snapshot.compare_to(before, "lineno")
+        return [
+            {"site": _site(s), "bytes": s.size_diff, "count": s.count_diff}
+            for s in stats[:top] if s.size_diff > 0
+        ]
+
+    result.update({
+        "trace_peak": peak,
+        "retained": current,
+        "held_sites": top_sites(held),          # tijdens/na conversie (incl. resultaat)
+        "retained_sites": top_sites(retained_snapshot),  # na vrijgeven resultaat
+    })
+    return result
+
+
+# ---------- Orkestratie ----------
+def _run_child(converter: str, path: str, trace: bool, top: int) -> dict:
+    env = dict(os.environ, LLM_PROVIDER="OFF", LLM_WARMUP="0")
+    cmd = [sys.executable, os.path.abspath(__file__), "--child", converter, path, "--top", str(top)]
+    if trace:
+        cmd.append("--trace")
+    out = subprocess.run(cmd, cwd=BASE_DIR, env=env, capture_output=True, text=True)
+    if out.returncode != 0:
+        raise RuntimeError(out.stderr.strip().splitlines()[-1] if out.stderr.strip() else "kind-proces faalde")
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def _mb(n) -> str:
+    return "-" if n is None else f"{n / (1024 * 1024):.1f}"
+
+
+def main(converters, grades, budgets: dict, top: int = 8) -> int:
+    failures = 0
+    reports = []
+    with tempfile.TemporaryDirectory(prefix="triade-membench-") as workdir:
+        print(f"{'converter':<16}{'invoer':<8}{'piek RSS':>10}{'Δ RSS':>9}{'tm-piek':>9}"
+              f"{'vast':>8}{'budget':>8}{'tijd':>8}  (MB, s)")
+        for grade in grades:
+            inputs = make_inputs(grade, workdir)
+            for conv in converters:
+                path = inputs["workbook" if conv.startswith("workbook") else "docx"]
+                try:
+                    rss = _run_child(conv, path, trace=False, top=top)
+                    tr = _run_child(conv, path, trace=True, top=top)
+                except RuntimeError as e:
+                    failures += 1
+                    print(f"{conv:<16}{grade:<8}  FOUT: {e}")
+                    continue
+
+                budget = budget_for(budgets, conv, grade)
+                over = budget is not None and rss["rss_peak"] > budget * 1024 * 1024
+                failures += over
+                delta = rss["rss_peak"] - rss["rss_base"] if rss["rss_base"] else None
+                verdict = "OVER BUDGET" if over else "ok"
+                print(f"{conv:<16}{grade:<8}{_mb(rss['rss_peak']):>10}{_mb(delta):>9}"
+                      f"{_mb(tr['trace_peak']):>9}{_mb(tr['retained']):>8}"
+                      f"{budget if budget is not None else '-':>8}{rss['seconds']:>8.2f}  {verdict}")
+                reports.append((conv, grade, tr))
+
+    if top:
+        for conv, grade, tr in reports:
+            if grade != grades[-1]:
+                continue
+            print(f"\n{conv} / {grade}: grootste allocaties (vastgehouden tijdens conversie)")
+            for s in tr["held_sites"]:
+                print(f"  {_mb(s['bytes']):>8} MB  {s['count']:>7}x  {s['site']}")
+            if tr["retained_sites"]:
+                print("  na vrijgeven resultaat nog vast (caches):")
+                for s in tr["retained_sites"]:
+                    print(f"  {_mb(s['bytes']):>8} MB  {s['count']:>7}x  {s['site']}")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Meet geheugengebruik per converter tegen budgetten.")
+    parser.add_argument("--converters", nargs="+", choices=CONVERTERS, default=list(CONVERTERS))
+    parser.add_argument("--grades", nargs="+", choices=list(GRADES), default=list(GRADES))
+    parser.add_argument("--budgets", help="JSON met budgetten in MB")
+    parser.add_argument("--top", type=int, default=8, help="aantal allocatieplekken in het rapport")
+    parser.add_argument("--child", nargs=2, metavar=("CONVERTER", "INPUT"), help=argparse.SUPPRESS)
+    parser.add_argument("--trace", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(child(args.child[0], args.child[1], args.trace, args.top)))
+        sys.exit(0)
+    sys.exit(main(args.converters, args.grades, load_budgets(args.budgets), args.top))
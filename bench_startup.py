@@ -0,0 +1,57 @@
+"""
+Startup-benchmark: importtijd per module in een vers Python-proces.
+
+Elke meting draait in een nieuw proces (koude module-cache), herhaald en
+als mediaan gerapporteerd. "app (eager)" is wat app.py laadt vóór de eerste
+render; de converters komen pas bij de eerste actie.
+
+Gebruik:  python bench_startup.py [--runs 5]
+"""
+import os
+import sys
+import statistics
+import subprocess
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+TARGETS = {
+    "streamlit": "import streamlit",
+    "app (eager)": "import streamlit, upload_store, workbook_fields, metrics",
+    "html_converter": "import html_converter",
+    "pptx_converter_hybrid": "import pptx_converter_hybrid",
+    "workbook_builder": "import workbook_builder",
+    "lesson_from_docx": "import lesson_from_docx",
+    "alle converters": "import html_converter, pptx_converter_hybrid, workbook_builder",
+}
+
+SNIPPET = "import time; t = time.perf_counter(); {stmt}; print(time.perf_counter() - t)"
+
+
+def measure(stmt: str, runs: int) -> list[float]:
+    times = []
+    for _ in range(runs):
+        out = subprocess.run(
+            [sys.executable, "-c", SNIPPET.format(stmt=stmt)],
+            cwd=BASE_DIR, capture_output=True, text=True, check=True,
+        )
+        times.append(float(out.stdout.strip().splitlines()[-1]))
+    return times
+
+
+def main(runs: int = 5):
+    print(f"{'module':<24}{'mediaan (ms)':>14}{'min (ms)':>12}")
+    for name, stmt in TARGETS.items():
+        try:
+            times = measure(stmt, runs)
+        except subprocess.CalledProcessError as e:
+            print(f"{name:<24}{'fout':>14}  {e.stderr.strip().splitlines()[-1]}")
+            continue
+        print(f"{name:<24}{statistics.median(times) * 1000:>14.0f}{min(times) * 1000:>12.0f}")
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Meet importtijden (koude start).")
+    parser.add_argument("--runs", type=int, default=5)
+    main(parser.parse_args().runs)
@@ -0,0 +1,205 @@
+"""
+Gedeelde tussenrepresentatie (IR) van een Word-document.
+
+Eén keer parsen per upload (cache op inhoud-hash), daarna gebruikt door
+de HTML-, PowerPoint- en les-converters. De IR is onveranderlijk en
+picklebaar, zodat hij goedkoop naar worker-processen kan.
+"""
+import io
+import os
+import pickle
+import hashlib
+import threading
+from types import MappingProxyType
+from collections import OrderedDict
+from dataclasses import dataclass, field, replace
+
+from docx import Document
+from docx.document import Document as _DocxDocument
+
+import metrics
+
+R_EMBED = "{http://schemas.openxmlformats.org/officeDocument/2006/relationships}embed"
+
+IR_CACHE_SIZE = int(os.getenv("DOCX_IR_CACHE_SIZE", "16"))
+
+
+# ---------- Datatypes ----------
+@dataclass(frozen=True)
+class ImageRef:
+    sha: str            # sha256 van de afbeelding (sleutel in DocumentIR.images)
+    content_type: str   # bv. image/png
+
+
+@dataclass(frozen=True)
+class ParagraphIR:
+    text: str                   # volledige paragraaftekst (niet gestript)
+    style: str                  # stijlnaam uit Word
+    heading_level: int          # 0 = geen kop, anders 1-3 (Heading/Kop-stijlen)
+    bold: bool                  # minstens één vette run
+    images: tuple = ()          # tuple[ImageRef, ...] in documentvolgorde
+
+
+@dataclass(frozen=True)
+class DocumentIR:
+    sha: str
+    paragraphs: tuple           # tuple[ParagraphIR, ...]
+    # sha -> bytes, alleen-lezen (de IR wordt tussen sessies gedeeld); telt niet mee in hash()
+    images: MappingProxyType = field(default_factory=lambda: MappingProxyType({}), hash=False)
+
+    def __post_init__(self):
+        if not isinstance(self.images, MappingProxyType):
+            object.__setattr__(self, "images", MappingProxyType(dict(self.images)))
+
+    def __reduce__(self):
+        # een mappingproxy is niet picklebaar: als gewone dict over, __post_init__ pakt hem weer in
+        return (type(self), (self.sha, self.paragraphs, dict(self.images)))
+
+    def to_bytes(self) -> bytes:
+        return pickle.dumps(self, protocol=pickle.HIGHEST_PROTOCOL)
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "DocumentIR":
+        ir = pickle.loads(data)
+        if not isinstance(ir, cls):
+            raise TypeError("Geen DocumentIR.")
+        return ir
+
+    def without_images(self) -> "DocumentIR":
+        """Kopie zonder afbeeldingsdata: voor tekst-only converters / workers."""
+        return replace(self, images={})
+
+
+# ---------- Parsen ----------
+def heading_level(style_name: str) -> int:
+    name = (style_name or "").lower()
+
+    if name.startswith("heading") or name.startswith("kop"):
+        for n in ("1", "2", "3"):
+            if n in name:
+                return int(n)
+        return 1
+
+    return 0
+
+
+def read_bytes(file_like) -> bytes:
+    """Bytes uit pad, bytes, UploadHandle, Streamlit-upload of ander file-object."""
+    if isinstance(file_like, (bytes, bytearray)):
+        return bytes(file_like)
+    if isinstance(file_like, (str, os.PathLike)):
+        with open(file_like, "rb") as f:
+            return f.read()
+    if hasattr(file_like, "read_bytes"):
+        return file_like.read_bytes()
+    if hasattr(file_like, "getvalue"):
+        return file_like.getvalue()
+    pos = file_like.tell()
+    file_like.seek(0)
+    data = file_like.read()
+    file_like.seek(pos)
+    return data
+
+
+def _paragraph_ir(para, doc, images: dict) -> ParagraphIR:
+    refs = []
+    for blip in para._p.xpath(".//a:blip"):
+        rId = blip.get(R_EMBED)
+        if not rId:
+            continue
+        try:
+            part = doc.part.related_parts[rId]
+            blob = part.blob
+        except Exception:
+            continue
+        sha = hashlib.sha256(blob).hexdigest()
+        images.setdefault(sha, blob)
+        refs.append(ImageRef(sha=sha, content_type=part.content_type))
+
+    style = (para.style.name if para.style is not None else "") or ""
+    return ParagraphIR(
+        text=para.text or "",
+        style=style,
+        heading_level=heading_level(style),
+        bold=any(r.bold for r in para.runs),
+        images=tuple(refs),
+    )
+
+
+def document_to_ir(doc, sha: str = "") -> DocumentIR:
+    images: dict = {}
+    paragraphs = tuple(_paragraph_ir(p, doc, images) for p in doc.paragraphs)
+    return DocumentIR(sha=sha, paragraphs=paragraphs, images=images)
+
+
+_cache: "OrderedDict[str, DocumentIR]" = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def parse_docx(file_like) -> DocumentIR:
+    """
+    DOCX → DocumentIR, gecachet op sha256 van de bestandsinhoud.
+    Accepteert ook een al geparste DocumentIR of een python-docx Document.
+    """
+    if isinstance(file_like, DocumentIR):
+        return file_like
+    if isinstance(file_like, _DocxDocument):
+        return document_to_ir(file_like)
+
+    data = read_bytes(file_like)
+    sha = hashlib.sha256(data).hexdigest()
+
+    with _cache_lock:
+        ir = _cache.get(sha)
+        if ir is not None:
+            _cache.move_to_end(sha)
+    if ir is not None:
+        metrics.CACHE_REQUESTS.inc(cache="docx_ir", result="hit")
+        return ir
+    metrics.CACHE_REQUESTS.inc(cache="docx_ir", result="miss")
+
+    ir = document_to_ir(Document(io.BytesIO(data)), sha=sha)
+
+    with _cache_lock:
+        _cache[sha] = ir
+        while len(_cache) > IR_CACHE_SIZE:
+            _cache.popitem(last=False)
+    return ir
+
+
+# ---------- Blokken (kop + tekst) ----------
+def is_block_heading(p: ParagraphIR, text: str) -> bool:
+    """Heading-stijl, vet of korte regel in CAPS = nieuw blok."""
+    return (
+        p.style.lower().startswith("heading")
+        or p.bold
+        or (len(text) <= 50 and text.upper() == text)
+    )
+
+
+def ir_to_blocks(ir: DocumentIR) -> list[dict]:
+    """
+    Deelt het document op in blokken: [{"title": str | None, "body": str}, ...]
+    Zelfde grenzen voor alle converters; lege lijst als er geen tekst is.
+    """
+    blocks = []
+    current_title = None
+    current_body: list[str] = []
+
+    for p in ir.paragraphs:
+        txt = p.text.strip()
+        if not txt:
+            continue
+
+        if is_block_heading(p, txt):
+            if current_title or current_body:
+                blocks.append({"title": current_title, "body": "\n".join(current_body).strip()})
+            current_title = txt
+            current_body = []
+        else:
+            current_body.append(txt)
+
+    if current_title or current_body:
+        blocks.append({"title": current_title, "body": "\n".join(current_body).strip()})
+
+    return blocks
@@ -0,0 +1,235 @@
+"""
+Lokale, extractieve samenvatting van lesblokken (zonder LLM).
+
+Voor het hele document tegelijk (NumPy, sparse als (zin, term, gewicht)-triplets):
+1. zinnen en woorden (zonder stopwoorden) per blok
+2. TF-IDF met de IDF over alle zinnen van het document
+3. centraliteit = cosinus van een zin met het zwaartepunt van zijn blok,
+   plus gelijkenis met de kop en een kleine bonus voor vroege zinnen
+4. per blok de beste zinnen via MMR (geen bijna-dubbele regels), in
+   oorspronkelijke volgorde
+5. controlevraag uit sjablonen op trefwoorden, ingevuld met het sterkste
+   onderwerp (term uit de kop, anders een woord na de/het/een)
+6. kwaliteitsscore 0-1: dekking van het blok x variatie x regellengte x genoeg regels
+
+Blokken met een score boven EXTRACTIVE_SKIP_SCORE hoeven niet naar het LLM
+(zie pptx_converter_hybrid).
+
+CLI:  python extractive.py les.docx   → scores en dia's per blok
+"""
+import re
+import argparse
+from dataclasses import dataclass, field
+
+import numpy as np
+
+MAX_LINES = 3
+MMR_LAMBDA = 0.7              # relevantie vs. variatie bij het kiezen van regels
+GOOD_WORDS = (4, 22)          # regel met zoveel woorden past goed op een dia
+
+SENTENCE_RE = re.compile(r"(?<=[.!?])\s+|\n+")
+WORD_RE = re.compile(r"[a-zà-ÿ0-9]+(?:-[a-zà-ÿ0-9]+)*")
+# ruwe schatting van zelfstandige naamwoorden: lidwoord (+ bijvoeglijk naamwoord op -e) + woord
+ARTICLE_NOUN_RE = re.compile(r"\b(de|het|een)\s+(?:[a-zà-ÿ]+e\s+)?([a-zà-ÿ]{3,})")
+
+STOPWORDS = frozenset("""
+de het een en of maar dus want als dan dat die dit deze daar hier er je jij jouw u uw we wij ons onze
+ze zij hun hem haar hij ik mij mijn men zich is zijn was waren wordt worden werd kan kunnen moet moeten
+mag mogen zal zullen wil willen heb hebt heeft hebben had niet geen wel ook nog al zo te om op in aan
+van voor met bij naar uit over onder tot door tegen tussen na per zonder dan wat wie waar hoe waarom
+welke welk veel meer minder heel erg eerst daarna goed gaat gaan komt komen doe doet doen even elke
+elk alle alles iets niets toe af mee
+""".split())
+
+# (trefwoorden in het blok, sjabloon); {kw} = onderwerp met lidwoord, bv. "de standleiding"
+CHECK_TEMPLATES = (
+    (("niet", "nooit", "verboden", "mag"), "Waarom mag je dit bij {kw} niet anders doen?"),
+    (("veilig", "veiligheid", "gevaar", "gevaarlijk", "risico"), "Welk gevaar hoort bij {kw}?"),
+    (("controleer", "controleren", "meet", "meten", "test", "testen"), "Hoe controleer je of {kw} goed is?"),
+    (("eerst", "daarna", "stap", "volgorde", "vervolgens"), "In welke volgorde werk je bij {kw}?"),
+    (("aansluiten", "aansluit", "leiding", "afvoer", "koppeling"), "Wat gebeurt er als je {kw} verkeerd aansluit?"),
+)
+DEFAULT_CHECK = "Kun je uitleggen waarom je dit zo doet?"
+DEFAULT_CHECK_KW = "Kun je in je eigen woorden uitleggen wat {kw} doet?"
+EMPTY_LINES = [
+    "Je leert hier hoe je dit onderdeel goed uitvoert.",
+    "Zo kan water en lucht goed weg.",
+    "Dan krijg je geen stank.",
+]
+
+
+@dataclass
+class BlockSummary:
+    title: str
+    lines: list[str]
+    check: str
+    score: float
+    keywords: list[str] = field(default_factory=list)
+
+    def slide(self) -> dict:
+        return {"title": self.title, "text": self.lines, "check": self.check}
+
+
+def split_sentences(text: str) -> list[str]:
+    return [s.strip(" .!?\t") for s in SENTENCE_RE.split(text or "") if s.strip(" .!?\t")]
+
+
+def terms(text: str) -> list[str]:
+    return [w for w in WORD_RE.findall(text.lower()) if w not in STOPWORDS and not w.isdigit()]
+
+
+def _rewrite(sentence: str) -> str:
+    return sentence.replace("Men ", "Je ").replace(" men ", " je ")
+
+
+def _subject(title: str, body: str, weights: np.ndarray, vocab: dict) -> str | None:
+    """
+    Onderwerp voor de controlevraag, met lidwoord ("de standleiding"): sterkste
+    term uit de kop, anders het sterkste zelfstandig naamwoord uit de tekst.
+    """
+    articles: dict = {}
+    for article, noun in ARTICLE_NOUN_RE.findall(body):
+        if noun not in STOPWORDS:
+            articles.setdefault(noun, "de" if article == "een" else article)
+    for pool in (terms(title), articles):
+        known = [w for w in pool if w in vocab and weights[vocab[w]] > 0]
+        if known:
+            best = max(known, key=lambda w: weights[vocab[w]])
+            return f"{articles.get(best, 'de')} {best}"
+    return None
+
+
+def _check_question(words: set, keyword: str | None) -> str:
+    for triggers, template in CHECK_TEMPLATES:
+        if keyword and words.intersection(triggers):
+            return template.format(kw=keyword)
+    return DEFAULT_CHECK_KW.format(kw=keyword) if keyword else DEFAULT_CHECK
+
+
+def _mmr(relevance: np.ndarray, sim: np.ndarray, k: int) -> list[int]:
+    chosen: list[int] = []
+    candidates = list(range(len(relevance)))
+    while candidates and len(chosen) < k:
+        if chosen:
+            redundancy = sim[np.ix_(candidates, chosen)].max(axis=1)
+        else:
+            redundancy = np.zeros(len(candidates))
+        gain = MMR_LAMBDA * relevance[candidates] - (1 - MMR_LAMBDA) * redundancy
+        best = candidates[int(np.argmax(gain))]
+        chosen.append(best)
+        candidates.remove(best)
+    return sorted(chosen)
+
+
+def summarize_blocks(blocks: list[dict], max_lines: int = MAX_LINES) -> list[BlockSummary]:
+    """Eén BlockSummary per blok, in dezelfde volgorde."""
+    sentences: list[str] = []
+    sent_block: list[int] = []
+    sent_pos: list[int] = []
+    for b, block in enumerate(blocks):
+        for pos, s in enumerate(split_sentences(block.get("body") or "")):
+            sentences.append(s)
+            sent_block.append(b)
+            sent_pos.append(pos)
+
+    # --- TF-IDF als triplets over het hele document ---
+    vocab: dict = {}
+    rows, cols = [], []
+    for i, s in enumerate(sentences):
+        for w in terms(s):
+            rows.append(i)
+            cols.append(vocab.setdefault(w, len(vocab)))
+    rows = np.asarray(rows, dtype=np.int64)
+    cols = np.asarray(cols, dtype=np.int64)
+    n_sent, n_terms, n_blocks = len(sentences), len(vocab), len(blocks)
+    sent_block_arr = np.asarray(sent_block, dtype=np.int64)
+
+    # tf per (zin, term) samenvoegen
+    pair = np.unique(rows * max(1, n_terms) + cols, return_counts=True)
+    rows, cols, tf = pair[0] // max(1, n_terms), pair[0] % max(1, n_terms), pair[1].astype(np.float32)
+    df = np.bincount(cols, minlength=n_terms)
+    idf = np.log((1 + n_sent) / (1 + df)).astype(np.float32) + 1
+    vals = tf * idf[cols]
+    norms = np.sqrt(np.bincount(rows, weights=vals ** 2, minlength=n_sent))
+    vals = vals / np.where(norms[rows] > 0, norms[rows], 1)
+
+    # zwaartepunt per blok en kopvector per blok (blokken x termen, klein)
+    row_block = sent_block_arr[rows] if n_sent else rows
+    centroid = np.zeros((n_blocks, n_terms), dtype=np.float32)
+    np.add.at(centroid, (row_block, cols), vals)
+    centroid /= np.maximum(np.linalg.norm(centroid, axis=1, keepdims=True), 1e-9)
+    title_vec = np.zeros((n_blocks, n_terms), dtype=np.float32)
+    for b, block in enumerate(blocks):
+        for w in terms(block.get("title") or ""):
+            if w in vocab:
+                title_vec[b, vocab[w]] += idf[vocab[w]]
+    title_vec /= np.maximum(np.linalg.norm(title_vec, axis=1, keepdims=True), 1e-9)
+
+    centrality = np.bincount(rows, weights=vals * centroid[row_block, cols], minlength=n_sent)
+    title_sim = np.bincount(rows, weights=vals * title_vec[row_block, cols], minlength=n_sent)
+    position = 1.0 / (1.0 + np.asarray(sent_pos, dtype=np.float32))
+    n_words = np.asarray([len(s.split()) for s in sentences], dtype=np.float32)
+    fits = (n_words >= GOOD_WORDS[0]) & (n_words <= GOOD_WORDS[1])
+    relevance = 0.65 * centrality + 0.25 * title_sim + 0.1 * position
+    relevance = relevance * np.where(fits, 1.0, 0.6)
+
+    term_names = np.empty(n_terms, dtype=object)
+    for w, j in vocab.items():
+        term_names[j] = w
+
+    # --- per blok kiezen (kleine dichte matrices) ---
+    summaries = []
+    for b, block in enumerate(blocks):
+        title = (block.get("title") or "Lesonderdeel").strip().capitalize()
+        idx = np.flatnonzero(sent_block_arr == b)
+        if not len(idx):
+            summaries.append(BlockSummary(title, list(EMPTY_LINES), DEFAULT_CHECK, 0.0))
+            continue
+
+        # triplets staan op zinvolgorde, dus een blok is één aaneengesloten stuk
+        lo, hi = np.searchsorted(rows, (idx[0], idx[-1] + 1))
+        local_cols, col_inv = np.unique(cols[lo:hi], return_inverse=True)
+        dense = np.zeros((len(idx), len(local_cols)), dtype=np.float32)
+        dense[rows[lo:hi] - idx[0], col_inv] = vals[lo:hi]
+        sim = dense @ dense.T
+
+        chosen = _mmr(relevance[idx], sim, max_lines)
+        lines = [_rewrite(sentences[idx[c]]) for c in chosen]
+
+        # score: dekking x variatie x regellengte x genoeg regels
+        picked = dense[chosen].sum(axis=0)
+        whole = dense.sum(axis=0)
+        coverage = float(picked @ whole / max(np.linalg.norm(picked) * np.linalg.norm(whole), 1e-9))
+        pairwise = sim[np.ix_(chosen, chosen)] - np.eye(len(chosen))
+        variety = 1.0 - float(max(0.0, pairwise.max())) if len(chosen) > 1 else 1.0
+        length_fit = float(fits[idx[chosen]].mean())
+        enough = min(1.0, len(chosen) / 2)
+        score = coverage * (0.5 + 0.5 * variety) * length_fit * enough
+
+        weights = centroid[b]
+        top = np.argsort(-weights)[:3]
+        keywords = [term_names[j] for j in top if weights[j] > 0]
+        body = (block.get("body") or "").lower()
+        words = set(WORD_RE.findall(body))
+        check = _check_question(words, _subject(block.get("title") or "", body, weights, vocab))
+
+        summaries.append(BlockSummary(title, lines, check, round(score, 3), keywords))
+    return summaries
+
+
+# ---------- CLI ----------
+if __name__ == "__main__":
+    from docx_ir import parse_docx, ir_to_blocks
+
+    parser = argparse.ArgumentParser(description="Extractieve dia's + kwaliteitsscore per blok.")
+    parser.add_argument("docx")
+    parser.add_argument("--lines", type=int, default=MAX_LINES)
+    args = parser.parse_args()
+
+    with open(args.docx, "rb") as f:
+        result = summarize_blocks(ir_to_blocks(parse_docx(f)), args.lines)
+    for i, s in enumerate(result, start=1):
+        print(f"[{i}] {s.title}  score={s.score:.2f}  trefwoorden={', '.join(s.keywords)}")
+        for line in s.lines:
+            print(f"    - {line}")
+        print(f"    ? {s.check}")
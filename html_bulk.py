@@ -0,0 +1,184 @@
+"""
+Een hele module lessen in één keer naar HTML (ZIP of meerdere .docx).
+
+- bronnen: losse .docx-bestanden en/of ZIP's met .docx-bestanden (mappen blijven behouden)
+- conversie parallel in een thread pool; afbeeldingen delen één cache
+  (html_converter), dus een logo in elke les wordt maar één keer geüpload
+- voortgang per bestand via BulkItem.status, voor een live tabel in de app
+- resultaat: één ZIP met alle .html-bestanden plus manifest.json
+
+Gebruik:  python html_bulk.py module.zip les1.docx -o html.zip [--compact] [--workers 4]
+"""
+import io
+import os
+import json
+import time
+import zipfile
+import posixpath
+from dataclasses import dataclass
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+from html_converter import docx_to_html
+
+DEFAULT_WORKERS = int(os.getenv("HTML_BULK_WORKERS", "4"))
+MAX_FILES = int(os.getenv("HTML_BULK_MAX_FILES", "200"))
+MAX_UNPACKED = int(float(os.getenv("HTML_BULK_MAX_MB", "500")) * 1024 * 1024)   # uitgepakt, alle ZIP's samen
+
+
+@dataclass
+class BulkItem:
+    name: str                   # pad van de .docx binnen de upload (uniek)
+    source: object              # bytes of UploadHandle
+    status: str = "wachten"     # wachten | bezig | klaar | fout
+    html: str | None = None
+    seconds: float = 0.0
+    error: str = ""
+
+    @property
+    def out_name(self) -> str:
+        return posixpath.splitext(self.name)[0] + ".html"
+
+    def row(self) -> dict:
+        return {
+            "bestand": self.name,
+            "status": self.status,
+            "KB": round(len(self.html.encode("utf-8")) / 1024, 1) if self.html else None,
+            "seconden": round(self.seconds, 2) if self.status in ("klaar", "fout") else None,
+            "melding": self.error,
+        }
+
+
+# ---------- Bronnen verzamelen ----------
+def _is_lesson(path: str) -> bool:
+    base = posixpath.basename(path)
+    return (
+        base.lower().endswith(".docx")
+        and not base.startswith(("~$", "._"))      # Word-lockbestanden, macOS-resten
+        and not path.startswith("__MACOSX/")
+    )
+
+
+def _open(source):
+    if isinstance(source, (bytes, bytearray)):
+        return io.BytesIO(source)
+    if hasattr(source, "open"):
+        return source.open()
+    return open(source, "rb")
+
+
+def _safe_path(name: str) -> str:
+    """Pad uit een ZIP → relatief pad zonder '/' vooraan of '..' (geen zip-slip in de uitvoer)."""
+    path = posixpath.normpath(name.replace("\\", "/"))
+    return "/".join(part for part in path.split("/") if part not in ("", ".", ".."))
+
+
+def _unique(name: str, taken: set) -> str:
+    stem, ext = posixpath.splitext(name)
+    n = 2
+    while name.lower() in taken:
+        name = f"{stem} ({n}){ext}"
+        n += 1
+    taken.add(name.lower())
+    return name
+
+
+def collect_items(sources) -> list[BulkItem]:
+    """
+    sources: [(naam, bytes | UploadHandle | pad), ...]
+    ZIP's worden uitgepakt tot hun .docx-bestanden (in het geheugen; lessen zijn klein).
+    Limieten (MAX_FILES, MAX_UNPACKED) worden gecontroleerd vóór er iets
+    uitgepakt wordt → ValueError.
+    """
+    items: list[BulkItem] = []
+    taken: set = set()
+    unpacked = 0
+
+    def check_count():
+        if len(items) >= MAX_FILES:
+            raise ValueError(f"Meer dan {MAX_FILES} lessen in één keer.")
+
+    for name, source in sources:
+        if name.lower().endswith(".zip"):
+            with _open(source) as f, zipfile.ZipFile(f) as zf:
+                for info in zf.infolist():
+                    if info.is_dir() or not _is_lesson(info.filename):
+                        continue
+                    check_count()
+                    unpacked += info.file_size
+                    if unpacked > MAX_UNPACKED:
+                        raise ValueError(f"Uitgepakt meer dan {MAX_UNPACKED // (1024 * 1024)} MB.")
+                    items.append(BulkItem(_unique(_safe_path(info.filename), taken), zf.read(info)))
+        elif _is_lesson(name):
+            check_count()
+            items.append(BulkItem(_unique(posixpath.basename(name), taken), source))
+    return items
+
+
+# ---------- Converteren ----------
+def _convert(item: BulkItem, compact: bool):
+    item.status = "bezig"
+    start = time.perf_counter()
+    try:
+        item.html = docx_to_html(item.source, compact=compact)
+        item.status = "klaar"
+    except Exception as e:
+        item.error = f"{type(e).__name__}: {e}"
+        item.status = "fout"
+    finally:
+        item.seconds = time.perf_counter() - start
+
+
+def convert_all(items: list[BulkItem], compact: bool = False,
+                workers: int = DEFAULT_WORKERS, poll: float = 0.25):
+    """
+    Converteert alle items parallel. Generator: geeft na elke afgeronde les
+    (en anders elke `poll` seconden) het aantal klare items terug, zodat de
+    aanroeper vanuit de eigen thread de voortgang kan tonen.
+    """
+    if not items:
+        return
+    with ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="html-bulk") as pool:
+        pending = {pool.submit(_convert, item, compact) for item in items}
+        while pending:
+            _, pending = wait(pending, timeout=poll, return_when=FIRST_COMPLETED)
+            yield len(items) - len(pending)
+
+
+def build_zip(items: list[BulkItem]) -> bytes:
+    """ZIP met alle gelukte .html-bestanden en manifest.json (ook met de fouten)."""
+    buf = io.BytesIO()
+    with zipfile.ZipFile(buf, "w", zipfile.ZIP_DEFLATED) as zf:
+        for item in items:
+            if item.html is not None:
+                zf.writestr(item.out_name, item.html)
+        manifest = {"lessen": [item.row() for item in items]}
+        zf.writestr("manifest.json", json.dumps(manifest, ensure_ascii=False, indent=2))
+    return buf.getvalue()
+
+
+def convert_to_zip(sources, compact: bool = False, workers: int = DEFAULT_WORKERS) -> tuple:
+    """Alles in één: (zip_bytes, items)."""
+    items = collect_items(sources)
+    for _ in convert_all(items, compact, workers):
+        pass
+    return build_zip(items), items
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Lessen (ZIP of .docx) in bulk naar HTML.")
+    parser.add_argument("inputs", nargs="+", help=".zip- en/of .docx-bestanden")
+    parser.add_argument("-o", "--output", default="lessen_html.zip")
+    parser.add_argument("--compact", action="store_true")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    data, items = convert_to_zip([(p, p) for p in args.inputs], args.compact, args.workers)
+    with open(args.output, "wb") as f:
+        f.write(data)
+    for item in items:
+        status = f"FOUT: {item.error}" if item.status == "fout" else f"{item.row()['KB']} KB"
+        print(f"{item.name}: {status} ({item.seconds:.2f} s)")
+    print(f"{len(items)} lessen in {time.perf_counter() - start:.1f} s → {args.output}")
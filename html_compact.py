@@ -0,0 +1,138 @@
+"""
+Compacte HTML-uitvoer + voorgecomprimeerde varianten.
+
+- herhaalde inline style="..." worden CSS-klassen in het <style>-blok
+- witruimte tussen tags en in CSS verdwijnt
+- optioneel gzip- en brotli-varianten (brotli alleen als het pakket er is)
+Per conversie komt een overzicht van de bespaarde bytes terug.
+"""
+import re
+import gzip
+from dataclasses import dataclass, field
+
+import metrics
+
+try:
+    import brotli
+except Exception:
+    brotli = None
+
+
+GZIP_LEVEL = 9
+BROTLI_QUALITY = 11
+
+_STYLE_ATTR = re.compile(r'\sstyle="([^"]*)"')
+_TAG_WITH_STYLE = re.compile(r'<([a-zA-Z][a-zA-Z0-9]*)([^<>]*?)\sstyle="([^"]*)"([^<>]*)>')
+_CLASS_ATTR = re.compile(r"""\sclass=(["'])(.*?)\1""")
+_STYLE_BLOCK = re.compile(r"(<style[^>]*>)(.*?)(</style>)", re.S | re.I)
+_BETWEEN_TAGS = re.compile(r">\s+<")
+
+
+# ---------- CSS ----------
+def _minify_css(css: str) -> str:
+    css = re.sub(r"/\*.*?\*/", "", css, flags=re.S)
+    css = re.sub(r"\s+", " ", css)
+    css = re.sub(r"\s*([{};:,>])\s*", r"\1", css)
+    return css.replace(";}", "}").strip()
+
+
+def _normalize_style(style: str) -> str:
+    """'max-width: 300px; ' → 'max-width:300px' (zodat gelijke stijlen samenvallen)."""
+    decls = [d.strip() for d in style.split(";") if d.strip()]
+    return ";".join(re.sub(r"\s*:\s*", ":", d, count=1) for d in decls)
+
+
+# ---------- Stijlen naar klassen ----------
+def hoist_inline_styles(html: str, min_count: int = 2, prefix: str = "s") -> str:
+    """
+    Inline stijlen die min_count keer of vaker voorkomen worden een klasse
+    (.s0, .s1, … in volgorde van eerste voorkomen). Unieke stijlen blijven
+    inline: een klasse kost dan meer dan hij oplevert.
+    """
+    counts: dict = {}
+    for m in _STYLE_ATTR.finditer(html):
+        style = _normalize_style(m.group(1))
+        if style:
+            counts[style] = counts.get(style, 0) + 1
+
+    classes = {}
+    for style, n in counts.items():
+        if n >= min_count:
+            classes[style] = f"{prefix}{len(classes)}"
+    if not classes:
+        return html
+
+    def repl(m):
+        tag, before, style, after = m.groups()
+        name = classes.get(_normalize_style(style))
+        if name is None:
+            return m.group(0)
+        attrs = before + after
+        existing = _CLASS_ATTR.search(attrs)
+        if existing:
+            merged = f' class="{existing.group(2)} {name}"'
+            attrs = attrs[: existing.start()] + merged + attrs[existing.end():]
+        else:
+            attrs = f' class="{name}"' + attrs
+        return f"<{tag}{attrs}>"
+
+    html = _TAG_WITH_STYLE.sub(repl, html)
+
+    rules = "".join(f".{name}{{{style}}}" for style, name in classes.items())
+    if _STYLE_BLOCK.search(html):
+        return _STYLE_BLOCK.sub(lambda m: m.group(1) + m.group(2) + rules + m.group(3), html, count=1)
+    return f"<style>{rules}</style>" + html
+
+
+def compact_html(html: str) -> str:
+    """Stijlen hoisten, CSS minificeren en witruimte tussen tags weghalen."""
+    html = hoist_inline_styles(html)
+    html = _STYLE_BLOCK.sub(lambda m: m.group(1) + _minify_css(m.group(2)) + m.group(3), html)
+    html = _BETWEEN_TAGS.sub("><", html)
+    return html.strip()
+
+
+# ---------- Voorcomprimeren ----------
+def precompress(data: bytes) -> dict:
+    """{'gzip': bytes, 'br': bytes?}; br ontbreekt als brotli niet geïnstalleerd is."""
+    out = {"gzip": gzip.compress(data, compresslevel=GZIP_LEVEL, mtime=0)}
+    if brotli is not None:
+        out["br"] = brotli.compress(data, quality=BROTLI_QUALITY, mode=brotli.MODE_TEXT)
+    return out
+
+
+@dataclass
+class HtmlOutput:
+    html: str
+    original_bytes: int
+    encoded: dict = field(default_factory=dict)   # {'gzip': bytes, 'br': bytes}
+
+    @property
+    def data(self) -> bytes:
+        return self.html.encode("utf-8")
+
+    def report(self) -> dict:
+        """Bytes per variant + besparing t.o.v. de oorspronkelijke (opgemaakte) HTML."""
+        sizes = {"origineel": self.original_bytes, "compact": len(self.data)}
+        sizes.update({enc: len(blob) for enc, blob in self.encoded.items()})
+        base = self.original_bytes or 1
+        return {
+            name: {"bytes": size, "besparing_pct": round(100 * (1 - size / base), 1)}
+            for name, size in sizes.items()
+        }
+
+
+def build_output(html: str, compact: bool = True, compress: bool = True) -> HtmlOutput:
+    original = len(html.encode("utf-8"))
+    if compact:
+        html = compact_html(html)
+    result = HtmlOutput(html, original)
+    if compress:
+        result.encoded = precompress(result.data)
+
+    metrics.HTML_OUTPUT_BYTES.inc(original, variant="origineel")
+    if compact:
+        metrics.HTML_OUTPUT_BYTES.inc(len(result.data), variant="compact")
+    for enc, blob in result.encoded.items():
+        metrics.HTML_OUTPUT_BYTES.inc(len(blob), variant=enc)
+    return result
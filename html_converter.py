@@ -1,8 +1,14 @@
 import os
+import re
 import base64
+import threading
+import unicodedata
+from collections import OrderedDict
 from html import escape
 from typing import Optional, List, Dict
-from docx import Document
+
+import metrics
+from docx_ir import DocumentIR, ParagraphIR, parse_docx
 
 # Pillow voor beeldmaten
 try:
@@ -55,21 +61,76 @@ def _cloudinary_ready() -> bool:
 def _upload_bytes(img_bytes: bytes, folder="triade-html") -> Optional[str]:
     """Upload naar Cloudinary, retourneer secure_url of None bij fout."""
     if not _cloudinary_ready():
+        metrics.CLOUDINARY_UPLOADS.inc(status="disabled")
         return None
 
     try:
-        res = cloudinary.uploader.upload(
-            img_bytes,
-            folder=folder,
-            overwrite=True,
-            use_filename=True,
-            unique_filename=True,
-            resource_type="image",
-        )
-        return res.get("secure_url") or res.get("url")
-    except:
+        with metrics.CLOUDINARY_SECONDS.time():
+            res = cloudinary.uploader.upload(
+                img_bytes,
+                folder=folder,
+                overwrite=True,
+                use_filename=True,
+                unique_filename=True,
+                resource_type="image",
+            )
+    except Exception:
+        metrics.CLOUDINARY_UPLOADS.inc(status="error")
         return None
 
+    url = res.get("secure_url") or res.get("url")
+    metrics.CLOUDINARY_UPLOADS.inc(status="ok" if url else "error")
+    return url
+
+
+# ---------- Gedeelde afbeeldingscache ----------
+# Per inhoud-hash: beeldmaat + Cloudinary-URL. Gedeeld door alle conversies in
+# dit proces (bv. een bulk-upload), zodat een logo dat in elke les staat maar
+# één keer wordt geüpload. Per hash een lock: gelijktijdige conversies wachten
+# op dezelfde upload in plaats van dubbel te uploaden.
+IMAGE_CACHE_SIZE = int(os.getenv("HTML_IMAGE_CACHE_SIZE", "1024"))
+
+_image_cache: "OrderedDict[str, dict]" = OrderedDict()
+_image_locks: Dict[str, threading.Lock] = {}
+_image_cache_lock = threading.Lock()
+
+
+def _image_meta(sha: str, blob: bytes) -> Dict:
+    """{'size': (w, h) | None, 'url': str | None} voor een afbeelding, gecachet."""
+    with _image_cache_lock:
+        meta = _image_cache.get(sha)
+        if meta is not None:
+            _image_cache.move_to_end(sha)
+        lock = _image_locks.setdefault(sha, threading.Lock())
+    if meta is not None:
+        metrics.CACHE_REQUESTS.inc(cache="html_images", result="hit")
+        return meta
+
+    with lock:
+        with _image_cache_lock:
+            meta = _image_cache.get(sha)
+        if meta is not None:
+            metrics.CACHE_REQUESTS.inc(cache="html_images", result="hit")
+            return meta
+
+        metrics.CACHE_REQUESTS.inc(cache="html_images", result="miss")
+        meta = {"size": _image_size(blob), "url": _upload_bytes(blob)}
+        if meta["url"] is None and _cloudinary_ready():
+            return meta  # uploadfout: niet cachen, volgende keer opnieuw proberen
+        with _image_cache_lock:
+            _image_cache[sha] = meta
+            while len(_image_cache) > IMAGE_CACHE_SIZE:
+                old, _ = _image_cache.popitem(last=False)
+                _image_locks.pop(old, None)
+        return meta
+
+
+# ---------- Afbeeldingsmarkup ----------
+IMG_BOX = 300                                                  # max weergavemaat grote afbeeldingen (px)
+SRCSET_FACTORS = (1, 2)                                        # 1x en 2x (retina)
+SRCSET_DPI = 96
+EAGER_IMAGES = int(os.getenv("HTML_EAGER_IMAGES", "1"))        # eerste n afbeeldingen niet lazy
+
 
 # ---------- Hulpfuncties ----------
 def _image_size(img_bytes: bytes) -> Optional[tuple]:
@@ -85,60 +146,101 @@ def _image_size(img_bytes: bytes) -> Optional[tuple]:
         return None
 
 
-def _img_infos_for_paragraph(para, doc: Document) -> List[Dict]:
-    """Zoek alle afbeeldingen in paragraaf en retourneer info."""
-    infos: List[Dict] = []
+def _fit(w: Optional[int], h: Optional[int], box: int) -> tuple:
+    """Weergavemaat binnen een vierkant van box px (nooit groter dan het origineel)."""
+    if not w or not h:
+        return None, None
+    scale = min(1.0, box / w, box / h)
+    return max(1, round(w * scale)), max(1, round(h * scale))
 
-    for run in para.runs:
-        blips = run._r.xpath(".//a:blip")
-        if not blips:
-            continue
 
-        for blip in blips:
-            rId = blip.get("{http://schemas.openxmlformats.org/officeDocument/2006/relationships}embed")
-            if not rId:
-                continue
+def _cloudinary_variant(url: str, width: int) -> str:
+    """Cloudinary-transformatie-URL: breedte begrensd, formaat/kwaliteit automatisch."""
+    return url.replace("/upload/", f"/upload/w_{width},c_limit,f_auto,q_auto/", 1)
 
-            try:
-                part = doc.part.related_parts[rId]
-                blob = part.blob
-            except:
-                continue
 
-            size = _image_size(blob)
-            w = size[0] if size else None
-            h = size[1] if size else None
-            small = (w and h and w < 100 and h < 100)
+def _sniff_type(data: bytes, fallback: str) -> str:
+    if data[:3] == b"\xff\xd8\xff":
+        return "image/jpeg"
+    if data[:8] == b"\x89PNG\r\n\x1a\n":
+        return "image/png"
+    return fallback
 
-            url = _upload_bytes(blob)
-            if not url:
-                b64 = base64.b64encode(blob).decode("ascii")
-                url = f"data:image/png;base64,{b64}"
 
-            infos.append({"url": url, "w": w, "h": h, "small": small})
+def _local_variant(blob: bytes, width: int) -> bytes:
+    """Verkleinde variant via image_prep (gecachet op hash); origineel als dat kleiner is."""
+    import image_prep
+    return image_prep.normalize_image(blob, width / SRCSET_DPI, dpi=SRCSET_DPI)
+
+
+def _img_infos_for_paragraph(para: ParagraphIR, ir: DocumentIR) -> List[Dict]:
+    """
+    Zoek alle afbeeldingen in paragraaf en retourneer info.
+    Grote afbeeldingen krijgen een weergavemaat (dw x dh) en varianten:
+    Cloudinary → srcset van transformatie-URL's (1x/2x), anders één lokaal
+    verkleinde data-URI op 2x (meerdere varianten inline zou de HTML opblazen).
+    """
+    infos: List[Dict] = []
+
+    for ref in para.images:
+        blob = ir.images.get(ref.sha)
+        if not blob:
+            continue
+
+        meta = _image_meta(ref.sha, blob)
+        size = meta["size"]
+        w = size[0] if size else None
+        h = size[1] if size else None
+        small = (w and h and w < 100 and h < 100)
+        dw, dh = (w, h) if small else _fit(w, h, IMG_BOX)
+
+        url = meta["url"]
+        srcset = None
+        if url and dw and not small:
+            widths = sorted({min(w, dw * f) for f in SRCSET_FACTORS})
+            if len(widths) > 1:
+                srcset = ", ".join(f"{_cloudinary_variant(url, x)} {x}w" for x in widths)
+            url = _cloudinary_variant(url, widths[0])
+        elif not url:
+            data, content_type = blob, ref.content_type or "image/png"
+            if dw and not small and w > dw * max(SRCSET_FACTORS):
+                data = _local_variant(blob, dw * max(SRCSET_FACTORS))
+                content_type = _sniff_type(data, content_type)
+            b64 = base64.b64encode(data).decode("ascii")
+            url = f"data:{content_type};base64,{b64}"
+
+        infos.append({"url": url, "w": w, "h": h, "dw": dw, "dh": dh, "small": small, "srcset": srcset})
 
     return infos
 
 
-def _is_heading(para) -> int:
-    name = (para.style.name or "").lower()
+def _img_tag(info: Dict, style: str, eager: bool) -> str:
+    """<img> met intrinsieke maat (geen layout shift), lazy tenzij boven de vouw."""
+    attrs = [f'src="{info["url"]}"']
+    if info["srcset"]:
+        attrs.append(f'srcset="{info["srcset"]}" sizes="(max-width: {info["dw"]}px) 100vw, {info["dw"]}px"')
+    if info["dw"] and info["dh"]:
+        attrs.append(f'width="{info["dw"]}" height="{info["dh"]}"')
+    attrs.append('alt=""')
+    attrs.append('fetchpriority="high"' if eager else 'loading="lazy"')
+    attrs.append('decoding="async"')
+    return f'<img {" ".join(attrs)} style="{style}" />'
 
-    if name.startswith("heading") or name.startswith("kop"):
-        for n in ("1", "2", "3"):
-            if n in name:
-                return int(n)
-        return 1
 
-    return 0
+def _is_heading(para: ParagraphIR) -> int:
+    return para.heading_level
 
 
-# ---------- Hoofdconverter ----------
-def docx_to_html(file_like) -> str:
-    """ DOCX → HTML met 1 overkoepelende groene div. """
+# ---------- Pagina-opbouw ----------
+PAGER_CSS = [
+    ".pager { display: flex; justify-content: space-between; gap: 1rem; margin: 1rem 0; }",
+    ".pager a { color: #1d5c2e; }",
+    ".toc li { margin: 4px 0; }",
+]
 
-    doc = Document(file_like)
 
-    out = [
+def _page_open(extra_css=()) -> List[str]:
+    return [
         "<html>",
         "<head>",
         "<style>",
@@ -163,6 +265,8 @@ def docx_to_html(file_like) -> str:
         "    border-radius: 6px;",
         "}",
 
+        *extra_css,
+
         "</style>",
         "</head>",
 
@@ -172,9 +276,17 @@ def docx_to_html(file_like) -> str:
         "<div class='lesson light-green'>"
     ]
 
-    # Verwerking tekst + afbeeldingen
-    for para in doc.paragraphs:
-        text = (para.text or "").strip()
+
+def _page_close() -> List[str]:
+    return ["</div>", "</body>", "</html>"]
+
+
+def _body_lines(paragraphs, ir: DocumentIR) -> List[str]:
+    """Tekst + afbeeldingen van een reeks paragrafen; de eerste afbeelding(en) niet lazy."""
+    out: List[str] = []
+    n_images = 0
+    for para in paragraphs:
+        text = para.text.strip()
         level = _is_heading(para)
 
         # Koppen blijven gewoon koppen
@@ -186,7 +298,7 @@ def docx_to_html(file_like) -> str:
             out.append(f"<p>{escape(text)}</p>")
 
         # Afbeeldingen
-        imgs = _img_infos_for_paragraph(para, doc)
+        imgs = _img_infos_for_paragraph(para, ir)
         if not imgs:
             continue
 
@@ -198,23 +310,139 @@ def docx_to_html(file_like) -> str:
                 '<div style="display:flex;gap:8px;flex-wrap:wrap;margin:4px 0;">'
             )
             for i in small:
-                out.append(
-                    f'<img src="{i["url"]}" alt="" '
-                    f'style="max-width:{i["w"] or 100}px;max-height:{i["h"] or 100}px;object-fit:contain;" />'
-                )
+                out.append(_img_tag(
+                    i,
+                    f'max-width:{i["w"] or 100}px;max-height:{i["h"] or 100}px;object-fit:contain;',
+                    eager=n_images < EAGER_IMAGES,
+                ))
+                n_images += 1
             out.append("</div>")
 
         for i in big:
             out.append(
-                f'<p><img src="{i["url"]}" alt="" '
-                f'style="max-width:300px;max-height:300px;object-fit:contain;" /></p>'
+                "<p>"
+                + _img_tag(i, f"max-width:{IMG_BOX}px;max-height:{IMG_BOX}px;height:auto;object-fit:contain;",
+                           eager=n_images < EAGER_IMAGES)
+                + "</p>"
             )
+            n_images += 1
+    return out
 
-    out.append("</div>")
-    out.append("</body>")
-    out.append("</html>")
 
-    return "\n".join(out)
+def _finish(out: List[str], compact: bool) -> str:
+    html = "\n".join(out)
+    if compact:
+        from html_compact import compact_html
+        html = compact_html(html)
+    return html
+
+
+# ---------- Hoofdconverter ----------
+@metrics.instrument("html")
+def docx_to_html(file_like, compact: bool = False) -> str:
+    """
+    DOCX → HTML met 1 overkoepelende groene div.
+    compact=True: herhaalde inline stijlen als klassen, zonder opmaak-witruimte
+    (zie html_compact).
+    """
+
+    ir = parse_docx(file_like)
+
+    out = _page_open()
+    # Verwerking tekst + afbeeldingen
+    out += _body_lines(ir.paragraphs, ir)
+    out += _page_close()
+    return _finish(out, compact)
+
+
+# ---------- Per hoofdstuk (lange documenten) ----------
+# alleen echte kop 1; heading_level geeft ook 1 voor bv. "Heading 4" of "Kop 10"
+SECTION_STYLE_RE = re.compile(r"(heading|kop)\s*1", re.IGNORECASE)
+
+
+def _is_section_heading(para: ParagraphIR) -> bool:
+    return bool(SECTION_STYLE_RE.fullmatch((para.style or "").strip())) and bool(para.text.strip())
+
+
+def split_sections(ir: DocumentIR) -> tuple:
+    """
+    Splitst op kop-1: (intro, [(titel, paragrafen), ...]).
+    intro = alles vóór de eerste kop 1; de kop zelf staat bovenaan zijn sectie.
+    """
+    intro: List[ParagraphIR] = []
+    sections: List[tuple] = []
+    for para in ir.paragraphs:
+        if _is_section_heading(para):
+            sections.append((para.text.strip(), [para]))
+        elif sections:
+            sections[-1][1].append(para)
+        else:
+            intro.append(para)
+    return intro, sections
+
+
+def _slug(title: str, maxlen: int = 40) -> str:
+    ascii_title = unicodedata.normalize("NFKD", title).encode("ascii", "ignore").decode("ascii")
+    slug = re.sub(r"[^a-z0-9]+", "-", ascii_title.lower()).strip("-")
+    return slug[:maxlen].rstrip("-") or "hoofdstuk"
+
+
+def _pager(prev_link, next_link) -> str:
+    prev_html = f'<a href="{prev_link[0]}">← {escape(prev_link[1])}</a>' if prev_link else "<span></span>"
+    next_html = f'<a href="{next_link[0]}">{escape(next_link[1])} →</a>' if next_link else "<span></span>"
+    return f"<nav class='pager'>{prev_html}<a href=\"index.html\">Inhoud</a>{next_html}</nav>"
+
+
+@metrics.instrument("html_pages")
+def docx_to_html_pages(file_like, compact: bool = False) -> Dict[str, str]:
+    """
+    DOCX → meerdere gekoppelde pagina's, één per kop-1-hoofdstuk.
+    Return: {bestandsnaam: html}; index.html bevat de tekst vóór het eerste
+    hoofdstuk plus de inhoudsopgave. Elke pagina bevat alleen zijn eigen
+    afbeeldingen (Cloudinary-uploads gaan via de gedeelde cache).
+    """
+    ir = parse_docx(file_like)
+    intro, sections = split_sections(ir)
+
+    names = [f"{n:02d}-{_slug(title)}.html" for n, (title, _) in enumerate(sections, start=1)]
+    pages: Dict[str, str] = {}
+
+    index = _page_open(PAGER_CSS)
+    index += _body_lines(intro, ir)
+    if sections:
+        index.append("<h2>Inhoud</h2>")
+        index.append("<ol class='toc'>")
+        for name, (title, _) in zip(names, sections):
+            index.append(f'<li><a href="{name}">{escape(title)}</a></li>')
+        index.append("</ol>")
+    index += _page_close()
+    pages["index.html"] = _finish(index, compact)
+
+    for n, (name, (title, paras)) in enumerate(zip(names, sections)):
+        prev_link = (names[n - 1], sections[n - 1][0]) if n > 0 else None
+        next_link = (names[n + 1], sections[n + 1][0]) if n + 1 < len(sections) else None
+        nav = _pager(prev_link, next_link)
+
+        out = _page_open(PAGER_CSS)
+        out.append(nav)
+        out += _body_lines(paras, ir)
+        out.append(nav)
+        out += _page_close()
+        pages[name] = _finish(out, compact)
+
+    return pages
+
+
+def pages_to_zip(pages: Dict[str, str], prefix: str = "") -> bytes:
+    """{bestandsnaam: html} → ZIP (optioneel in een submap)."""
+    import io
+    import zipfile
+
+    buf = io.BytesIO()
+    with zipfile.ZipFile(buf, "w", zipfile.ZIP_DEFLATED) as zf:
+        for name, html in pages.items():
+            zf.writestr(prefix + name, html)
+    return buf.getvalue()
 
 
 
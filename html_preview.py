@@ -0,0 +1,128 @@
+"""
+Lichte voorvertoning van (grote) HTML-uitvoer voor de UI.
+
+De volledige HTML met base64-afbeeldingen kan megabytes zijn; st.code met
+syntax highlighting daarop bevriest het tabblad van de docent. Daarom:
+- broncode: data-URI's ingekort tot "…[123 KB]", opgeknipt in pagina's van
+  PREVIEW_PAGE_CHARS tekens (op regelgrenzen)
+- weergave: de HTML in een <iframe sandbox srcdoc> binnen een data:-URL voor
+  st.iframe (st.iframe zelf laat scripts met dezelfde origin toe): geen
+  scripts, geen toegang tot de app; de CSP blijft als extra slot. Boven
+  PREVIEW_MAX_BYTES worden ingesloten afbeeldingen vervangen door een kleine
+  placeholder en wordt de rest zo nodig afgekapt
+De volledige uitvoer gaat alleen via de download.
+"""
+import os
+import re
+import base64
+from html import escape
+from dataclasses import dataclass
+
+PREVIEW_PAGE_CHARS = int(os.getenv("HTML_PREVIEW_PAGE_CHARS", "20000"))
+PREVIEW_MAX_BYTES = int(float(os.getenv("HTML_PREVIEW_MAX_MB", "2")) * 1024 * 1024)
+
+DATA_URI_RE = re.compile(r"data:([\w.+/-]+);base64,([A-Za-z0-9+/=]+)")
+CSP = "<meta http-equiv=\"Content-Security-Policy\" content=\"script-src 'none'; object-src 'none'\">"
+PLACEHOLDER_SRC = (
+    "data:image/svg+xml;utf8,<svg xmlns='http://www.w3.org/2000/svg' width='300' height='200'>"
+    "<rect width='100%25' height='100%25' fill='%23e5e5e5'/>"
+    "<text x='50%25' y='50%25' text-anchor='middle' font-family='sans-serif' fill='%23777'>afbeelding</text></svg>"
+)
+TRUNCATED_NOTE = (
+    '<p style="padding:1rem;background:#fff3cd;font-family:sans-serif">'
+    "Voorvertoning afgekapt; download het bestand voor de volledige les.</p>"
+)
+
+
+@dataclass
+class Preview:
+    html: str              # de HTML van de voorvertoning (met CSP)
+    src: str               # data:-URL voor st.iframe (sandboxed)
+    source_pages: list     # ingekorte broncode per pagina
+    original_bytes: int
+    data_uris: int         # aantal ingesloten afbeeldingen
+    data_uri_bytes: int    # base64-tekens daarvan
+    images_replaced: bool
+    truncated: bool
+
+
+def _kb(n: int) -> str:
+    return f"{n / 1024:.0f} KB"
+
+
+def elide_data_uris(html: str) -> tuple[str, int, int]:
+    """data-URI's → 'data:image/png;base64,…[123 KB]'. Return: (html, aantal, base64-tekens)."""
+    count = total = 0
+
+    def short(m):
+        nonlocal count, total
+        count += 1
+        total += len(m.group(2))
+        return f"data:{m.group(1)};base64,…[{_kb(len(m.group(2)))}]"
+
+    return DATA_URI_RE.sub(short, html), count, total
+
+
+def paginate(text: str, page_chars: int = PREVIEW_PAGE_CHARS) -> list[str]:
+    """Knipt op regelgrenzen; een regel langer dan een pagina wordt hard geknipt."""
+    pages, current, size = [], [], 0
+    for line in text.splitlines(keepends=True):
+        while len(line) > page_chars:
+            if current:
+                pages.append("".join(current))
+                current, size = [], 0
+            pages.append(line[:page_chars])
+            line = line[page_chars:]
+        if current and size + len(line) > page_chars:
+            pages.append("".join(current))
+            current, size = [], 0
+        current.append(line)
+        size += len(line)
+    if current:
+        pages.append("".join(current))
+    return pages or [""]
+
+
+def _with_csp(html: str) -> str:
+    head = re.search(r"<head[^>]*>", html, re.IGNORECASE)
+    if head:
+        return html[:head.end()] + CSP + html[head.end():]
+    return CSP + html
+
+
+def sandboxed_src(html: str) -> str:
+    """data:-URL van een pagina die `html` toont in een iframe zonder enige rechten (sandbox="")."""
+    page = (
+        '<!DOCTYPE html><html style="height:100%"><body style="margin:0;height:100%">'
+        f'<iframe sandbox="" srcdoc="{escape(html, quote=True)}" '
+        'style="border:0;width:100%;height:100%"></iframe></body></html>'
+    )
+    return "data:text/html;base64," + base64.b64encode(page.encode("utf-8")).decode("ascii")
+
+
+def render_html(html: str, max_bytes: int = PREVIEW_MAX_BYTES) -> tuple[str, bool, bool]:
+    """HTML voor de iframe. Return: (html, afbeeldingen vervangen, afgekapt)."""
+    replaced = truncated = False
+    if len(html) > max_bytes:
+        html = DATA_URI_RE.sub(PLACEHOLDER_SRC, html)
+        replaced = True
+    if len(html) > max_bytes:
+        cut = html.rfind(">", 0, max_bytes) + 1
+        html = html[:cut] + TRUNCATED_NOTE
+        truncated = True
+    return _with_csp(html), replaced, truncated
+
+
+def build_preview(html: str, page_chars: int = PREVIEW_PAGE_CHARS, max_bytes: int = PREVIEW_MAX_BYTES) -> Preview:
+    source, count, uri_chars = elide_data_uris(html)
+    rendered, replaced, truncated = render_html(html, max_bytes)
+    return Preview(
+        html=rendered,
+        src=sandboxed_src(rendered),
+        source_pages=paginate(source, page_chars),
+        original_bytes=len(html.encode("utf-8")),
+        data_uris=count,
+        data_uri_bytes=uri_chars,
+        images_replaced=replaced,
+        truncated=truncated,
+    )
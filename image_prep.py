@@ -0,0 +1,175 @@
+"""
+Afbeeldingen klaarmaken voor print (werkboekjes).
+
+- EXIF-oriëntatie toepassen (telefoonfoto's staan anders scheef)
+- verkleinen tot de doel-DPI voor de werkelijke plaatsingsbreedte
+- opnieuw coderen per soort: foto's als JPEG, tekeningen/transparantie als PNG
+Resultaten worden gecachet op inhoud-hash; meerdere afbeeldingen gaan parallel.
+"""
+import io
+import os
+import hashlib
+import threading
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+
+import metrics
+
+try:
+    from PIL import Image, ImageOps
+    PIL_OK = True
+except Exception:
+    PIL_OK = False
+
+
+PRINT_DPI = int(os.getenv("WORKBOOK_IMAGE_DPI", "200"))
+JPEG_QUALITY = int(os.getenv("WORKBOOK_JPEG_QUALITY", "82"))
+MAX_WORKERS = int(os.getenv("IMAGE_PREP_WORKERS", str(min(4, os.cpu_count() or 1))))
+CACHE_MAX_BYTES = int(os.getenv("IMAGE_PREP_CACHE_MB", "256")) * 1024 * 1024
+
+EXIF_ORIENTATION = 0x0112
+
+
+# ---------- Cache (LRU op totale grootte) ----------
+_cache: "OrderedDict[tuple, bytes]" = OrderedDict()
+_cache_size = 0
+_cache_lock = threading.Lock()
+
+
+def _cache_get(key):
+    with _cache_lock:
+        val = _cache.get(key)
+        if val is not None:
+            _cache.move_to_end(key)
+    metrics.CACHE_REQUESTS.inc(cache="image_prep", result="miss" if val is None else "hit")
+    return val
+
+
+def _cache_put(key, val: bytes):
+    global _cache_size
+    with _cache_lock:
+        if key in _cache:
+            return
+        _cache[key] = val
+        _cache_size += len(val)
+        while _cache_size > CACHE_MAX_BYTES and _cache:
+            _, old = _cache.popitem(last=False)
+            _cache_size -= len(old)
+
+
+# ---------- Normaliseren ----------
+def _has_alpha(im) -> bool:
+    return im.mode in ("RGBA", "LA", "PA") or (im.mode == "P" and "transparency" in im.info)
+
+
+def _encode(im, as_png: bool) -> bytes:
+    out = io.BytesIO()
+    if as_png:
+        if im.mode not in ("RGB", "RGBA", "L", "LA", "P"):
+            im = im.convert("RGBA" if _has_alpha(im) else "RGB")
+        im.save(out, "PNG", optimize=True)
+    else:
+        if im.mode != "RGB":
+            im = im.convert("RGB")
+        im.save(out, "JPEG", quality=JPEG_QUALITY, optimize=True, progressive=True)
+    return out.getvalue()
+
+
+def _normalize(img_bytes: bytes, width_in: float, dpi: int) -> bytes:
+    target_px = max(1, int(round(width_in * dpi)))
+
+    with Image.open(io.BytesIO(img_bytes)) as im:
+        fmt = im.format
+        orientation = im.getexif().get(EXIF_ORIENTATION, 1)
+        needs_rotate = orientation not in (None, 1)
+
+        if im.width <= target_px and not needs_rotate and fmt in ("JPEG", "PNG"):
+            return img_bytes
+
+        # JPEG: laat de decoder al verkleinen (scheelt veel tijd bij 12 MP)
+        if fmt == "JPEG":
+            im.draft("RGB", (target_px, target_px))
+
+        im = ImageOps.exif_transpose(im)
+        if im.width > target_px:
+            ratio = target_px / im.width
+            im = im.resize((target_px, max(1, round(im.height * ratio))), Image.LANCZOS)
+
+        as_png = fmt != "JPEG" or _has_alpha(im)
+        out = _encode(im, as_png)
+
+    if len(out) >= len(img_bytes) and not needs_rotate and fmt in ("JPEG", "PNG"):
+        return img_bytes
+    return out
+
+
+def load_bytes(img) -> bytes:
+    """bytes of een UploadHandle (alles met read_bytes()) → bytes."""
+    if img is None or isinstance(img, (bytes, bytearray)):
+        return img
+    return img.read_bytes()
+
+
+def normalize_image(img, width_in: float, dpi: int = PRINT_DPI, cache: bool = True) -> bytes:
+    """
+    Afbeelding (bytes of UploadHandle) voor een plaatsing van width_in inch
+    breed op dpi. Bij fouten of zonder Pillow komt het origineel terug.
+    Een handle wordt pas hier gelezen, zodat het origineel niet langer dan
+    nodig in het geheugen staat. cache=False: resultaat niet bewaren
+    (eenmalige grote reeksen, zie iter_normalized).
+    """
+    if not img:
+        return img
+
+    if not PIL_OK:
+        return load_bytes(img)
+
+    # handles kennen hun hash al: cache raadplegen zonder te lezen
+    sha = getattr(img, "sha256", None)
+    img_bytes = None if sha else load_bytes(img)
+    key = (sha or hashlib.sha256(img_bytes).hexdigest(), round(width_in, 3), dpi)
+    cached = _cache_get(key) if cache else None
+    if cached is not None:
+        return cached
+    if img_bytes is None:
+        img_bytes = load_bytes(img)
+
+    try:
+        out = _normalize(img_bytes, width_in, dpi)
+    except Exception:
+        out = img_bytes
+
+    if cache:
+        _cache_put(key, out)
+    return out
+
+
+def normalize_images(jobs: list[tuple], dpi: int = PRINT_DPI) -> list[bytes]:
+    """
+    jobs: [(img_bytes of handle, width_in), ...] → genormaliseerde bytes in dezelfde volgorde.
+    Pillow geeft de GIL vrij tijdens decoderen/schalen, dus threads volstaan.
+    """
+    if not jobs:
+        return []
+    if len(jobs) == 1 or MAX_WORKERS <= 1:
+        return [normalize_image(b, w, dpi) for b, w in jobs]
+
+    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as pool:
+        return list(pool.map(lambda job: normalize_image(job[0], job[1], dpi), jobs))
+
+
+def iter_normalized(jobs, dpi: int = PRINT_DPI, cache: bool = False):
+    """
+    Als normalize_images, maar als generator over een (lazy) iterable van jobs:
+    hooguit MAX_WORKERS afbeeldingen tegelijk onderweg, resultaten op volgorde.
+    Zo blijft het geheugen begrensd bij honderden foto's.
+    """
+    jobs = iter(jobs)
+    with ThreadPoolExecutor(max_workers=max(1, MAX_WORKERS)) as pool:
+        pending = deque()
+        for img, width_in in jobs:
+            pending.append(pool.submit(normalize_image, img, width_in, dpi, cache))
+            if len(pending) >= max(1, MAX_WORKERS):
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
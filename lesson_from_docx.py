@@ -2,8 +2,12 @@ import os
 import io
 import json
 import time
+import logging
 from docx import Document
-from openai import OpenAI, RateLimitError, APIError
+
+from docx_ir import parse_docx, ir_to_blocks
+
+log = logging.getLogger("lesson_from_docx")
 
 
 def docx_to_blocks(file_like):
@@ -11,52 +15,21 @@ def docx_to_blocks(file_like):
     Leest het .docx bestand en maakt blokken: [{"title": ..., "body": ...}, ...]
     Een blok = kop + bijbehorende tekst.
     """
-    doc = Document(file_like)
-    blocks = []
-    current_title = None
-    current_body = []
-
-    for para in doc.paragraphs:
-        txt = (para.text or "").strip()
-        if not txt:
-            continue
-
-        # Koppen herkennen
-        is_heading = (
-            (para.style and para.style.name and para.style.name.lower().startswith("heading"))
-            or any(r.bold for r in para.runs)
-            or (len(txt) <= 50 and txt.upper() == txt)
-        )
-
-        if is_heading:
-            # vorig blok afsluiten
-            if current_title or current_body:
-                blocks.append({
-                    "title": current_title or "Lesonderdeel",
-                    "body": "\n".join(current_body).strip()
-                })
-            current_title = txt
-            current_body = []
-        else:
-            current_body.append(txt)
-
-    # laatste blok toevoegen
-    if current_title or current_body:
-        blocks.append({
-            "title": current_title or "Lesonderdeel",
-            "body": "\n".join(current_body).strip()
-        })
+    blocks = [
+        {"title": b["title"] or "Lesonderdeel", "body": b["body"]}
+        for b in ir_to_blocks(parse_docx(file_like))
+    ]
 
     if not blocks:
         raise RuntimeError("Geen tekst of koppen gevonden in het document.")
     return blocks
 
 
-def ai_generate_slide(client, title, body):
-    """
-    Eén AI-call per onderdeel.
-    """
-    prompt = f"""
+LESSON_MODEL = os.getenv("LESSON_MODEL", "gpt-4o-mini")
+
+
+def _slide_prompt(title, body):
+    return f"""
 Maak een korte dia voor een VMBO-les (basis/kader/GL).
 
 Onderwerp: {title}
@@ -72,11 +45,22 @@ Gebruik eenvoudige woorden en leg kort uit hoe iets werkt.
 Geef ALLEEN geldig JSON:
 {{"title": "...", "text": ["...", "..."], "check": "..." }}
 """
-    resp = client.chat.completions.create(
-        model="gpt-4o-mini",
-        messages=[{"role": "user", "content": prompt}],
-        response_format={"type": "json_object"},
-    )
+
+
+def _slide_request_body(title, body):
+    """Request-body voor /v1/chat/completions (zelfde voor interactief en batch)."""
+    return {
+        "model": LESSON_MODEL,
+        "messages": [{"role": "user", "content": _slide_prompt(title, body)}],
+        "response_format": {"type": "json_object"},
+    }
+
+
+def ai_generate_slide(client, title, body):
+    """
+    Eén AI-call per onderdeel.
+    """
+    resp = client.chat.completions.create(**_slide_request_body(title, body))
     slide = json.loads(resp.choices[0].message.content)
     return slide
 
@@ -127,6 +111,8 @@ def docx_to_vmbo_lesson_json(file_like) -> io.BytesIO:
     - Combineert alle resultaten tot één Word-bestand
     - Geen fallback: faalt netjes bij fouten
     """
+    from openai import OpenAI, RateLimitError, APIError
+
     api_key = os.getenv("OPENAI_API_KEY")
     if not api_key:
         raise RuntimeError("OPENAI_API_KEY ontbreekt. Voeg je sleutel toe in de omgeving.")
@@ -148,3 +134,313 @@ def docx_to_vmbo_lesson_json(file_like) -> io.BytesIO:
 
     return build_word_from_slides(slides)
 
+
+
+# ---------- Batch-modus (bulk, offline) ----------
+#
+# Werkmap-indeling:
+#   requests.jsonl  - alle prompts, 1 regel per blok (chat-completions batchformaat)
+#   results.jsonl   - antwoorden per regel (batch-outputformaat)
+#   status.json     - status per document + batch-id (voor hervatten)
+#   out/<doc>.docx  - samengestelde lessen
+
+BATCH_ENDPOINT = "/v1/chat/completions"
+
+
+def _batch_paths(workdir):
+    return {
+        "requests": os.path.join(workdir, "requests.jsonl"),
+        "results": os.path.join(workdir, "results.jsonl"),
+        "status": os.path.join(workdir, "status.json"),
+        "out": os.path.join(workdir, "out"),
+    }
+
+
+def load_batch_status(workdir) -> dict:
+    path = _batch_paths(workdir)["status"]
+    if not os.path.exists(path):
+        return {"batch_id": None, "docs": {}}
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _save_batch_status(workdir, status: dict):
+    path = _batch_paths(workdir)["status"]
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(status, f, ensure_ascii=False, indent=2)
+    os.replace(tmp, path)
+
+
+def _custom_id(doc_id, idx):
+    return f"{doc_id}::{idx}"
+
+
+def _split_custom_id(custom_id):
+    doc_id, _, idx = custom_id.rpartition("::")
+    return doc_id, int(idx)
+
+
+def prepare_batch(docs: dict, workdir) -> dict:
+    """
+    Schrijft de prompts van alle blokken van alle documenten naar één requests.jsonl.
+    docs: {doc_id: file_like of pad}
+    Documenten die al in status.json staan worden overgeslagen (hervatten),
+    behalve als ze mislukt waren; die worden opnieuw geprobeerd.
+    De status wordt na elk document bewaard; regels die er na een crash al
+    staan worden niet nog eens geschreven.
+    Is de batch al ingediend, dan kan er niets meer bij → RuntimeError.
+    """
+    paths = _batch_paths(workdir)
+    os.makedirs(paths["out"], exist_ok=True)
+    status = load_batch_status(workdir)
+    if status.get("batch_id"):
+        raise RuntimeError(
+            f"Batch {status['batch_id']} is al ingediend; gebruik een nieuwe werkmap voor nieuwe documenten."
+        )
+    _truncate_partial_line(paths["requests"])
+    written = {r["custom_id"] for r in _read_jsonl(paths["requests"])}
+
+    with open(paths["requests"], "a", encoding="utf-8") as f:
+        for doc_id, file_like in docs.items():
+            if "::" in doc_id:
+                raise ValueError(f"Ongeldige doc_id (bevat '::'): {doc_id}")
+            if status["docs"].get(doc_id, {}).get("status", "failed") != "failed":
+                continue
+            try:
+                blocks = docx_to_blocks(file_like)
+            except Exception as e:
+                status["docs"][doc_id] = {"status": "failed", "blocks": 0, "error": str(e)}
+                _save_batch_status(workdir, status)
+                continue
+
+            lines = []
+            for i, b in enumerate(blocks, start=1):
+                if _custom_id(doc_id, i) in written:
+                    continue
+                title = b.get("title") or f"Onderdeel {i}"
+                body = b.get("body") or ""
+                line = {
+                    "custom_id": _custom_id(doc_id, i),
+                    "method": "POST",
+                    "url": BATCH_ENDPOINT,
+                    "body": _slide_request_body(title, body),
+                }
+                lines.append(json.dumps(line, ensure_ascii=False) + "\n")
+            f.write("".join(lines))
+            f.flush()
+            os.fsync(f.fileno())
+            status["docs"][doc_id] = {"status": "prepared", "blocks": len(blocks)}
+            _save_batch_status(workdir, status)
+    return status
+
+
+def _read_jsonl(path):
+    """
+    Alle regels als dicts. Een afgebroken laatste regel (crash tijdens het
+    schrijven) wordt overgeslagen en gelogd; die regel wordt later opnieuw gemaakt.
+    """
+    if not os.path.exists(path):
+        return []
+    rows = []
+    with open(path, "r", encoding="utf-8") as f:
+        lines = f.readlines()
+    for n, line in enumerate(lines, start=1):
+        if not line.strip():
+            continue
+        try:
+            rows.append(json.loads(line))
+        except ValueError:
+            if n == len(lines) and not line.endswith("\n"):
+                log.warning("%s: afgebroken laatste regel overgeslagen", path)
+                continue
+            raise
+    return rows
+
+
+def _truncate_partial_line(path):
+    """Knipt een afgebroken laatste regel weg, zodat er weer veilig achter geschreven kan worden."""
+    if not os.path.exists(path):
+        return
+    with open(path, "rb+") as f:
+        data = f.read()
+        if data and not data.endswith(b"\n"):
+            f.truncate(data.rfind(b"\n") + 1)
+            log.warning("%s: afgebroken laatste regel verwijderd", path)
+
+
+def submit_batch(workdir, client) -> str:
+    """Upload requests.jsonl naar een batch-endpoint en bewaar het batch-id."""
+    status = load_batch_status(workdir)
+    if status.get("batch_id"):
+        return status["batch_id"]
+
+    with open(_batch_paths(workdir)["requests"], "rb") as f:
+        input_file = client.files.create(file=f, purpose="batch")
+    batch = client.batches.create(
+        input_file_id=input_file.id,
+        endpoint=BATCH_ENDPOINT,
+        completion_window="24h",
+    )
+    status["batch_id"] = batch.id
+    for doc in status["docs"].values():
+        if doc["status"] == "prepared":
+            doc["status"] = "submitted"
+    _save_batch_status(workdir, status)
+    return batch.id
+
+
+def poll_batch(workdir, client) -> str:
+    """
+    Vraag de status van de batch op; bij 'completed' worden de resultaten
+    naar results.jsonl geschreven. Retourneert de batch-status.
+    """
+    status = load_batch_status(workdir)
+    batch_id = status.get("batch_id")
+    if not batch_id:
+        raise RuntimeError("Nog geen batch ingediend.")
+
+    batch = client.batches.retrieve(batch_id)
+    if batch.status == "completed":
+        with open(_batch_paths(workdir)["results"], "w", encoding="utf-8") as f:
+            for file_id in (batch.output_file_id, batch.error_file_id):
+                if file_id:
+                    f.write(client.files.content(file_id).text.rstrip("\n") + "\n")
+    return batch.status
+
+
+def run_batch_locally(workdir, client) -> int:
+    """
+    Lokale vervanger voor een batch-endpoint: verwerkt requests.jsonl regel
+    voor regel met gewone calls. Regels die al een resultaat hebben worden
+    overgeslagen, dus afbreken en opnieuw starten is veilig.
+    Retourneert het aantal verwerkte regels.
+    """
+    from openai import RateLimitError, APIError
+
+    paths = _batch_paths(workdir)
+    _truncate_partial_line(paths["results"])
+    done = {r["custom_id"] for r in _read_jsonl(paths["results"]) if not r.get("error")}
+    count = 0
+
+    with open(paths["results"], "a", encoding="utf-8") as out:
+        for req in _read_jsonl(paths["requests"]):
+            if req["custom_id"] in done:
+                continue
+            try:
+                resp = client.chat.completions.create(**req["body"])
+                result = {
+                    "custom_id": req["custom_id"],
+                    "response": {"status_code": 200, "body": resp.model_dump()},
+                    "error": None,
+                }
+            except (RateLimitError, APIError) as e:
+                result = {
+                    "custom_id": req["custom_id"],
+                    "response": None,
+                    "error": {"message": str(e)},
+                }
+            out.write(json.dumps(result, ensure_ascii=False) + "\n")
+            out.flush()
+            count += 1
+    return count
+
+
+def _slide_from_result(result):
+    if result.get("error"):
+        raise ValueError(result["error"].get("message") or "onbekende fout")
+    response = result.get("response") or {}
+    if response.get("status_code") != 200:
+        raise ValueError(f"HTTP {response.get('status_code')}")
+    content = response["body"]["choices"][0]["message"]["content"]
+    if not content:
+        raise ValueError("leeg antwoord")
+    slide = json.loads(content)
+    if not isinstance(slide, dict):
+        raise ValueError("antwoord is geen JSON-object")
+    return slide
+
+
+def assemble_batch(workdir) -> dict:
+    """
+    Bouwt per document het Word-bestand uit results.jsonl.
+    Documenten die al 'done' zijn worden overgeslagen.
+    Status per document: done | incomplete | failed.
+    """
+    paths = _batch_paths(workdir)
+    status = load_batch_status(workdir)
+
+    per_doc: dict = {}
+    for result in _read_jsonl(paths["results"]):
+        doc_id, idx = _split_custom_id(result["custom_id"])
+        # latere regels (bv. na opnieuw proberen) winnen
+        per_doc.setdefault(doc_id, {})[idx] = result
+
+    for doc_id, doc in status["docs"].items():
+        if doc["status"] == "failed":
+            continue
+        if doc["status"] == "done" and os.path.exists(doc.get("output", "")):
+            continue
+
+        results = per_doc.get(doc_id, {})
+        slides, errors = [], []
+        for idx in range(1, doc["blocks"] + 1):
+            if idx not in results:
+                errors.append(f"onderdeel {idx}: geen resultaat")
+                continue
+            try:
+                slides.append(_slide_from_result(results[idx]))
+            except (ValueError, KeyError, IndexError, TypeError) as e:
+                errors.append(f"onderdeel {idx}: {e}")
+
+        if errors:
+            doc["status"] = "incomplete"
+            doc["done_blocks"] = len(slides)
+            doc["errors"] = errors
+            continue
+
+        output = os.path.join(paths["out"], f"{doc_id}.docx")
+        try:
+            data = build_word_from_slides(slides).getvalue()
+        except Exception as e:   # rare dia-inhoud: alleen dit document, niet de hele batch
+            doc.update(status="incomplete", done_blocks=0, errors=[f"opbouw: {e}"])
+            continue
+        with open(output, "wb") as f:
+            f.write(data)
+        doc.update(status="done", done_blocks=len(slides), output=output)
+        doc.pop("errors", None)
+
+    _save_batch_status(workdir, status)
+    return status
+
+
+if __name__ == "__main__":
+    import argparse
+    import glob
+
+    parser = argparse.ArgumentParser(description="Bulk lessen genereren via batch-modus.")
+    parser.add_argument("stap", choices=["prepare", "submit", "poll", "local", "assemble", "status"])
+    parser.add_argument("workdir")
+    parser.add_argument("docx", nargs="*", help="bestanden of mappen (alleen bij prepare)")
+    args = parser.parse_args()
+
+    if args.stap == "prepare":
+        files = []
+        for p in args.docx:
+            files += sorted(glob.glob(os.path.join(p, "*.docx"))) if os.path.isdir(p) else [p]
+        docs = {os.path.splitext(os.path.basename(p))[0]: p for p in files}
+        prepare_batch(docs, args.workdir)
+    elif args.stap in ("submit", "poll", "local"):
+        from openai import OpenAI
+        client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+        if args.stap == "submit":
+            print(submit_batch(args.workdir, client))
+        elif args.stap == "poll":
+            print(poll_batch(args.workdir, client))
+        else:
+            print(f"{run_batch_locally(args.workdir, client)} regels verwerkt")
+    elif args.stap == "assemble":
+        assemble_batch(args.workdir)
+
+    for doc_id, doc in load_batch_status(args.workdir)["docs"].items():
+        print(f"{doc_id}: {doc['status']} ({doc.get('done_blocks', 0)}/{doc['blocks']})")
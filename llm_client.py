@@ -0,0 +1,317 @@
+"""
+LLM-client (zonder OpenAI SDK) voor Ollama en OpenAI-compatibele servers.
+
+Los van pptx_converter_hybrid, zodat de app het model al bij de start kan
+opwarmen zonder python-pptx te laden.
+
+- keep_alive: Ollama houdt het model geladen tussen sporadische verzoeken
+- warm_up(): laadt het model én verwerkt de vaste systeemprompt, zodat de
+  KV-cache van die prefix (Ollama / vLLM prefix caching) klaarstaat
+- start_keepalive(): periodieke ping zodat het model niet wordt ontladen
+- measure_cold_warm(): meet het verschil tussen koude en warme start
+
+Meten:  python llm_client.py --measure
+"""
+import os
+import json
+import time
+import threading
+
+import requests
+
+import metrics
+
+
+# LLM config via env
+LLM_PROVIDER = os.getenv("LLM_PROVIDER", "OLLAMA").upper()           # OLLAMA | OPENAI_COMPAT | OFF
+LLM_MODEL    = os.getenv("LLM_MODEL", "mistral")                      # bv. 'mistral', 'qwen2.5:7b-instruct', 'llama3.1'
+LLM_BASE_URL = os.getenv("LLM_BASE_URL", "http://localhost:11434")    # Ollama default; voor OPENAI_COMPAT bv. http://localhost:1234/v1
+LLM_API_KEY  = os.getenv("LLM_API_KEY")                               # alleen voor OPENAI_COMPAT indien nodig
+LLM_KEEP_ALIVE = os.getenv("LLM_KEEP_ALIVE", "30m")                  # Ollama: hoe lang het model geladen blijft
+LLM_KEEPALIVE_INTERVAL = float(os.getenv("LLM_KEEPALIVE_INTERVAL", "240"))  # seconden tussen pings; 0 = uit
+
+
+# Vaste instructies voor de dia-generatie. Staan als system-bericht vóór de
+# wisselende inhoud, zodat de server deze prefix kan hergebruiken (KV-cache).
+# Niet per verzoek aanpassen: elke wijziging maakt de cache ongeldig.
+SLIDES_SYSTEM_PROMPT = """Je krijgt meerdere onderdelen uit een les over installatietechniek.
+Maak hier dia's van voor een VMBO-les (basis/kader/GL).
+
+Voor elk onderdeel:
+- bedenk 1 korte, begrijpelijke titel (max 8 woorden)
+- schrijf 2 of 3 korte, vertellende zinnen in de je-vorm
+- schrijf 1 controlevraag die past bij de uitleg
+- herhaal de titel NIET in de tekst
+- gebruik eenvoudige woorden
+
+Geef ALLEEN geldig JSON in dit formaat, met precies 1 dia per onderdeel en
+bij "index" het nummer van het onderdeel:
+
+{
+  "slides": [
+    {
+      "index": 1,
+      "title": "…",
+      "text": ["…", "…", "…"],
+      "check": "…"
+    }
+  ]
+}"""
+
+
+# =========================
+# LLM Client
+# =========================
+class LLMError(RuntimeError):
+    pass
+
+
+class LLMClient:
+    """
+    Minimale client met 2 providers:
+    - OLLAMA (chat API): POST /api/chat  (support 'format': 'json' -> valide JSON)
+    - OPENAI_COMPAT: POST /chat/completions  (LM Studio / vLLM / andere compatibele servers)
+    Geeft JSON-string terug.
+    """
+
+    def __init__(self, provider: str, model: str, base_url: str, api_key: str | None,
+                 keep_alive: str = LLM_KEEP_ALIVE):
+        self.provider = provider.upper()
+        self.model = model
+        self.base_url = base_url.rstrip("/")
+        self.api_key = api_key
+        self.keep_alive = keep_alive
+
+    @staticmethod
+    def _messages(user_prompt: str, system_prompt: str | None) -> list[dict]:
+        messages = [{"role": "system", "content": system_prompt}] if system_prompt else []
+        messages.append({"role": "user", "content": user_prompt})
+        return messages
+
+    def chat_json(self, user_prompt: str, system_prompt: str | None = None) -> str:
+        if self.provider == "OFF":
+            raise LLMError("LLM staat uit (LLM_PROVIDER=OFF).")
+        if self.provider == "OLLAMA":
+            call = self._chat_ollama
+        elif self.provider == "OPENAI_COMPAT":
+            call = self._chat_openai_compat
+        else:
+            raise LLMError(f"Onbekende LLM_PROVIDER: {self.provider}")
+
+        try:
+            with metrics.LLM_SECONDS.time(provider=self.provider):
+                content = call(self._messages(user_prompt, system_prompt))
+        except LLMError:
+            metrics.LLM_REQUESTS.inc(provider=self.provider, status="error")
+            raise
+        metrics.LLM_REQUESTS.inc(provider=self.provider, status="ok")
+        return content
+
+    def _chat_ollama(self, messages: list[dict], options: dict | None = None) -> str:
+        """
+        Ollama chat API:
+        POST {base}/api/chat
+        body: {model, messages, stream=false, options?, format='json', keep_alive}
+        return: response['message']['content']
+        """
+        url = f"{self.base_url}/api/chat"
+        payload = {
+            "model": self.model,
+            "messages": messages,
+            "stream": False,
+            "format": "json",  # dwing JSON af bij veel modellen
+            "keep_alive": self.keep_alive,
+        }
+        if options:
+            payload["options"] = options
+        try:
+            r = requests.post(url, json=payload, timeout=120)
+            r.raise_for_status()
+            data = r.json()
+            content = (data.get("message") or {}).get("content")
+            if content is None or (not content and not options):
+                raise LLMError("Lege content van Ollama.")
+            return content
+        except requests.RequestException as e:
+            raise LLMError(f"Ollama call faalde: {e}") from e
+        except ValueError:
+            raise LLMError("Ollama gaf geen JSON terug.")
+
+    def _chat_openai_compat(self, messages: list[dict], max_tokens: int | None = None) -> str:
+        """
+        OpenAI-compatible /chat/completions.
+        Probeer response_format=json_object indien ondersteund.
+        """
+        url = f"{self.base_url}/chat/completions"
+        headers = {"Content-Type": "application/json"}
+        if self.api_key:
+            headers["Authorization"] = f"Bearer {self.api_key}"
+
+        payload = {
+            "model": self.model,
+            "messages": messages,
+            # veel compat-servers ondersteunen dit, zo niet: content bevat JSON als tekst
+            "response_format": {"type": "json_object"},
+            "temperature": 0.2,
+        }
+        if max_tokens:
+            payload["max_tokens"] = max_tokens
+        try:
+            r = requests.post(url, json=payload, headers=headers, timeout=120)
+            r.raise_for_status()
+            data = r.json()
+            content = data["choices"][0]["message"]["content"]
+            if content is None or (not content and not max_tokens):
+                raise LLMError("Lege content van OpenAI-compat endpoint.")
+            return content
+        except requests.RequestException as e:
+            raise LLMError(f"OpenAI-compat call faalde: {e}") from e
+        except (KeyError, ValueError):
+            raise LLMError("OpenAI-compat gaf onverwachte payload.")
+
+    # ---------- opwarmen / wakker houden ----------
+    def warm_up(self, system_prompt: str = SLIDES_SYSTEM_PROMPT) -> float:
+        """
+        Laadt het model en verwerkt de vaste systeemprompt met 1 output-token.
+        Retourneert de duur in seconden.
+        """
+        messages = self._messages("Antwoord met {}.", system_prompt)
+        start = time.perf_counter()
+        if self.provider == "OLLAMA":
+            self._chat_ollama(messages, options={"num_predict": 1})
+        elif self.provider == "OPENAI_COMPAT":
+            self._chat_openai_compat(messages, max_tokens=1)
+        else:
+            raise LLMError(f"Onbekende LLM_PROVIDER: {self.provider}")
+        return time.perf_counter() - start
+
+    def ping(self):
+        """Houdt het model geladen (Ollama: verlengt keep_alive zonder te genereren)."""
+        try:
+            if self.provider == "OLLAMA":
+                r = requests.post(
+                    f"{self.base_url}/api/generate",
+                    json={"model": self.model, "keep_alive": self.keep_alive},
+                    timeout=120,
+                )
+                r.raise_for_status()
+            else:
+                self.warm_up()
+        except requests.RequestException as e:
+            raise LLMError(f"Keep-alive faalde: {e}") from e
+
+    def unload(self):
+        """Alleen Ollama: model direct ontladen (voor koude-start metingen)."""
+        if self.provider != "OLLAMA":
+            raise LLMError("Ontladen wordt alleen door Ollama ondersteund.")
+        try:
+            r = requests.post(
+                f"{self.base_url}/api/generate",
+                json={"model": self.model, "keep_alive": 0},
+                timeout=60,
+            )
+            r.raise_for_status()
+        except requests.RequestException as e:
+            raise LLMError(f"Ontladen faalde: {e}") from e
+
+
+def default_client() -> LLMClient:
+    return LLMClient(LLM_PROVIDER, LLM_MODEL, LLM_BASE_URL, LLM_API_KEY)
+
+
+def force_json_or_raise(text: str) -> dict:
+    """
+    Probeer JSON te parsen; als er ruis omheen staat, strip dan tot { ... }.
+    """
+    try:
+        return json.loads(text)
+    except Exception:
+        # probeer JSON uit vrije tekst te vissen
+        start = text.find("{")
+        end = text.rfind("}")
+        if start != -1 and end != -1 and end > start:
+            snippet = text[start : end + 1]
+            return json.loads(snippet)
+        raise
+
+
+# =========================
+# Warm-up + keep-alive bij de start van de app
+# =========================
+def start_warmup_and_keepalive(client: LLMClient | None = None,
+                               interval: float = LLM_KEEPALIVE_INTERVAL) -> threading.Thread:
+    """
+    Daemon-thread: eerst warm_up(), daarna elke `interval` seconden ping().
+    Beide via de LLM-scheduler (sessie SYSTEM_TENANT), zodat ze meetellen in
+    de capaciteit; een ping vervalt als er al verzoeken lopen of wachten (die
+    houden het model ook geladen).
+    Fouten (server nog niet bereikbaar) worden geteld en genegeerd.
+    """
+    # hier en niet bovenaan: llm_scheduler importeert LLMError uit deze module
+    from llm_scheduler import get_scheduler, SYSTEM_TENANT
+
+    client = client or default_client()
+    scheduler = get_scheduler()
+    warmup_cost = len(SLIDES_SYSTEM_PROMPT) // 4   # ± 4 tekens per token
+
+    def run():
+        if client.provider == "OFF":
+            return
+        try:
+            with scheduler.slot(cost=warmup_cost, tenant_name=SYSTEM_TENANT):
+                metrics.LLM_WARMUP_SECONDS.set(client.warm_up(), phase="startup")
+        except LLMError:
+            metrics.LLM_KEEPALIVE.inc(status="error")
+        while interval > 0:
+            time.sleep(interval)
+            if not scheduler.has_capacity():
+                metrics.LLM_KEEPALIVE.inc(status="skipped")
+                continue
+            try:
+                with scheduler.slot(cost=1, tenant_name=SYSTEM_TENANT):
+                    client.ping()
+                metrics.LLM_KEEPALIVE.inc(status="ok")
+            except LLMError:
+                metrics.LLM_KEEPALIVE.inc(status="error")
+
+    thread = threading.Thread(target=run, name="llm-keepalive", daemon=True)
+    thread.start()
+    return thread
+
+
+def measure_cold_warm(client: LLMClient | None = None, runs: int = 3) -> dict:
+    """
+    Koude start (model ontladen) vs. warme start (model + prefix in cache),
+    gemeten met warm_up(). Koud kan alleen bij Ollama worden afgedwongen.
+    """
+    client = client or default_client()
+    result = {"provider": client.provider, "model": client.model, "cold": None, "warm": []}
+
+    if client.provider == "OLLAMA":
+        client.unload()
+        result["cold"] = client.warm_up()
+        metrics.LLM_WARMUP_SECONDS.set(result["cold"], phase="cold")
+    else:
+        client.warm_up()
+
+    for _ in range(runs):
+        result["warm"].append(client.warm_up())
+    metrics.LLM_WARMUP_SECONDS.set(min(result["warm"]), phase="warm")
+    return result
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="LLM opwarmen of koude/warme latency meten.")
+    parser.add_argument("--measure", action="store_true", help="meet koud vs. warm")
+    parser.add_argument("--runs", type=int, default=3)
+    args = parser.parse_args()
+
+    if args.measure:
+        res = measure_cold_warm(runs=args.runs)
+        cold = f"{res['cold']:.2f} s" if res["cold"] is not None else "n.v.t."
+        warm = ", ".join(f"{w:.2f}" for w in res["warm"])
+        print(f"{res['provider']} / {res['model']}: koud {cold}, warm [{warm}] s")
+    else:
+        print(f"Opgewarmd in {default_client().warm_up():.2f} s")
@@ -0,0 +1,226 @@
+"""
+Router voor LLM-verzoeken over een pool van modellen/endpoints.
+
+Pool via LLM_POOL (JSON) of LLM_POOL_FILE (pad naar JSON), bv.:
+
+[
+  {"name": "klein", "model": "qwen2.5:3b-instruct", "base_url": "http://gpu1:11434", "max_tokens": 1500},
+  {"name": "groot", "model": "mistral", "base_url": "http://gpu2:11434", "concurrency": 2}
+]
+
+(provider / api_key per endpoint optioneel; standaard LLM_PROVIDER / LLM_API_KEY.
+max_tokens = grootste invoer in geschatte tokens die dit endpoint krijgt; leeg = onbeperkt.
+concurrency = verzoeken tegelijk op dit endpoint (OLLAMA_NUM_PARALLEL), standaard 1;
+de som is de capaciteit van llm_scheduler, tenzij LLM_MAX_CONCURRENCY gezet is.)
+Zonder pool is er één endpoint uit LLM_MODEL / LLM_BASE_URL, dus hetzelfde gedrag als voorheen.
+
+Per verzoek:
+1. schat de invoer in tokens (± 4 tekens per token)
+2. kandidaten = endpoints die die grootte aankunnen en niet in cooldown zijn
+3. kies de laagste verwachte wachttijd: voortschrijdend gemiddelde (EWMA) van
+   seconden per token x grootte x (1 + lopende verzoeken), gedeeld door de
+   slagingskans (EWMA van fouten). Nog niet gebruikte endpoints gaan eerst.
+4. bij een fout: volgende kandidaat; na LLM_ROUTER_MAX_FAILS fouten op rij
+   gaat een endpoint LLM_ROUTER_COOLDOWN seconden uit de roulatie
+Elke beslissing wordt gelogd (logger 'llm_router') en geteld in metrics.
+Vóór het routeren wacht elk verzoek op zijn beurt in llm_scheduler (eerlijk per sessie).
+"""
+import os
+import json
+import time
+import logging
+import threading
+from collections import deque
+
+import metrics
+from llm_client import (
+    LLM_PROVIDER, LLM_MODEL, LLM_BASE_URL, LLM_API_KEY,
+    LLMError, LLMClient, start_warmup_and_keepalive,
+)
+from llm_scheduler import get_scheduler
+
+log = logging.getLogger("llm_router")
+
+EWMA_ALPHA = float(os.getenv("LLM_ROUTER_ALPHA", "0.3"))
+MAX_FAILS = int(os.getenv("LLM_ROUTER_MAX_FAILS", "3"))
+COOLDOWN = float(os.getenv("LLM_ROUTER_COOLDOWN", "60"))
+CHARS_PER_TOKEN = 4
+
+
+def estimate_tokens(*texts: str) -> int:
+    return sum(len(t or "") for t in texts) // CHARS_PER_TOKEN + 1
+
+
+class Endpoint:
+    """Eén model op één server, met zijn eigen statistiek."""
+
+    def __init__(self, name: str, client: LLMClient, max_tokens: int | None = None, concurrency: int = 1):
+        self.name = name
+        self.client = client
+        self.max_tokens = max_tokens
+        self.concurrency = max(1, int(concurrency))
+        self.sec_per_token: float | None = None   # EWMA
+        self.error_rate = 0.0                     # EWMA van 0/1
+        self.inflight = 0
+        self.fails_in_row = 0
+        self.cooldown_until = 0.0
+        self._lock = threading.Lock()
+
+    def fits(self, tokens: int) -> bool:
+        return self.max_tokens is None or tokens <= self.max_tokens
+
+    def available(self, now: float) -> bool:
+        return now >= self.cooldown_until
+
+    def score(self, tokens: int) -> float:
+        if self.sec_per_token is None:
+            # nog nooit gelukt: eerst proberen, maar na een fout achteraan
+            return 0.0 if self.error_rate == 0 else float("inf")
+        expected = self.sec_per_token * tokens * (1 + self.inflight)
+        return expected / max(0.05, 1.0 - self.error_rate)
+
+    def record(self, ok: bool, seconds: float, tokens: int):
+        with self._lock:
+            self.error_rate += EWMA_ALPHA * ((0.0 if ok else 1.0) - self.error_rate)
+            if ok:
+                per_token = seconds / max(1, tokens)
+                self.sec_per_token = per_token if self.sec_per_token is None else (
+                    self.sec_per_token + EWMA_ALPHA * (per_token - self.sec_per_token)
+                )
+                self.fails_in_row = 0
+            else:
+                self.fails_in_row += 1
+                if self.fails_in_row >= MAX_FAILS:
+                    self.cooldown_until = time.monotonic() + COOLDOWN
+                    self.fails_in_row = 0
+                    log.warning("endpoint %s: %d fouten op rij, %.0f s cooldown", self.name, MAX_FAILS, COOLDOWN)
+
+    def stats(self) -> dict:
+        return {
+            "name": self.name, "model": self.client.model, "base_url": self.client.base_url,
+            "max_tokens": self.max_tokens, "concurrency": self.concurrency, "sec_per_token": self.sec_per_token,
+            "error_rate": round(self.error_rate, 3), "inflight": self.inflight,
+            "cooldown": max(0.0, round(self.cooldown_until - time.monotonic(), 1)),
+        }
+
+
+class LLMRouter:
+    """Zelfde interface als LLMClient.chat_json, maar kiest per verzoek een endpoint."""
+
+    def __init__(self, endpoints: list[Endpoint]):
+        if not endpoints:
+            raise ValueError("LLM-pool is leeg.")
+        self.endpoints = endpoints
+        self.decisions: deque = deque(maxlen=200)
+        self._lock = threading.Lock()
+
+    @property
+    def capacity(self) -> int:
+        """Verzoeken die de hele pool tegelijk aankan."""
+        return sum(e.concurrency for e in self.endpoints)
+
+    def candidates(self, tokens: int) -> list[Endpoint]:
+        """Endpoints op volgorde van voorkeur voor een verzoek van deze grootte."""
+        now = time.monotonic()
+        fitting = [e for e in self.endpoints if e.fits(tokens)]
+        if not fitting:
+            # te groot voor alles: het endpoint met de grootste capaciteit
+            fitting = [max(self.endpoints, key=lambda e: e.max_tokens or 0)]
+        ready = [e for e in fitting if e.available(now)] or fitting
+        return sorted(ready, key=lambda e: e.score(tokens))
+
+    def chat_json(self, user_prompt: str, system_prompt: str | None = None) -> str:
+        if all(e.client.provider == "OFF" for e in self.endpoints):
+            raise LLMError("LLM staat uit (LLM_PROVIDER=OFF).")
+        tokens = estimate_tokens(user_prompt, system_prompt)
+        # eerst een plek in de eerlijke wachtrij, dan pas routeren (actuele inflight)
+        with get_scheduler().slot(cost=tokens):
+            return self._route(user_prompt, system_prompt, tokens)
+
+    def _route(self, user_prompt: str, system_prompt: str | None, tokens: int) -> str:
+        with self._lock:
+            order = self.candidates(tokens)
+            first = order[0]
+            first.inflight += 1
+
+        last_error = None
+        for attempt, endpoint in enumerate(order):
+            if attempt:
+                with self._lock:
+                    endpoint.inflight += 1
+            reason = "voorkeur" if attempt == 0 else "failover"
+            self._decide(endpoint, tokens, reason)
+            start = time.perf_counter()
+            try:
+                content = endpoint.client.chat_json(user_prompt, system_prompt=system_prompt)
+            except LLMError as e:
+                endpoint.record(False, time.perf_counter() - start, tokens)
+                last_error = e
+                log.info("endpoint %s faalde (%s), volgende kandidaat", endpoint.name, e)
+                continue
+            finally:
+                with self._lock:
+                    endpoint.inflight -= 1
+            endpoint.record(True, time.perf_counter() - start, tokens)
+            if endpoint.sec_per_token is not None:
+                metrics.LLM_ENDPOINT_SEC_PER_TOKEN.set(endpoint.sec_per_token, endpoint=endpoint.name)
+            return content
+
+        raise LLMError(f"Alle LLM-endpoints faalden: {last_error}")
+
+    def _decide(self, endpoint: Endpoint, tokens: int, reason: str):
+        decision = {"time": time.time(), "endpoint": endpoint.name, "tokens": tokens, "reason": reason,
+                    "score": round(endpoint.score(tokens), 3)}
+        self.decisions.append(decision)
+        metrics.LLM_ROUTED.inc(endpoint=endpoint.name, reason=reason)
+        log.info("route %d tokens → %s (%s, score %.3f)", tokens, endpoint.name, reason, decision["score"])
+
+    def stats(self) -> list[dict]:
+        return [e.stats() for e in self.endpoints]
+
+    def start_warmup_and_keepalive(self) -> list[threading.Thread]:
+        return [start_warmup_and_keepalive(e.client) for e in self.endpoints]
+
+
+# ---------- Pool uit config ----------
+def load_pool() -> list[dict]:
+    raw = os.getenv("LLM_POOL")
+    path = os.getenv("LLM_POOL_FILE")
+    if path:
+        with open(path, "r", encoding="utf-8") as f:
+            raw = f.read()
+    if not raw:
+        return [{"name": "default", "model": LLM_MODEL, "base_url": LLM_BASE_URL}]
+    pool = json.loads(raw)
+    if not isinstance(pool, list) or not pool:
+        raise ValueError("LLM_POOL moet een niet-lege JSON-lijst zijn.")
+    return pool
+
+
+def router_from_config(pool: list[dict]) -> LLMRouter:
+    endpoints = []
+    for i, cfg in enumerate(pool):
+        client = LLMClient(
+            cfg.get("provider", LLM_PROVIDER),
+            cfg.get("model", LLM_MODEL),
+            cfg.get("base_url", LLM_BASE_URL),
+            cfg.get("api_key", LLM_API_KEY),
+        )
+        endpoints.append(Endpoint(cfg.get("name") or f"ep{i}", client, cfg.get("max_tokens"),
+                                  cfg.get("concurrency", 1)))
+    return LLMRouter(endpoints)
+
+
+_router = None
+_router_lock = threading.Lock()
+
+
+def get_router() -> LLMRouter:
+    """Eén router per proces, zodat de statistiek over verzoeken heen meetelt."""
+    global _router
+    with _router_lock:
+        if _router is None:
+            _router = router_from_config(load_pool())
+            if "LLM_MAX_CONCURRENCY" not in os.environ:
+                get_scheduler().set_capacity(_router.capacity)
+        return _router
@@ -0,0 +1,220 @@
+"""
+Eerlijke verdeling van LLM-capaciteit over sessies (docenten).
+
+Eén Ollama-server kan maar LLM_MAX_CONCURRENCY verzoeken tegelijk aan
+(OLLAMA_NUM_PARALLEL). Bij een pool zet llm_router de capaciteit op de som
+van de `concurrency` per endpoint, tenzij LLM_MAX_CONCURRENCY expliciet gezet
+is. Alle LLM-verzoeken in dit proces gaan via deze scheduler:
+- per sessie ("tenant") een eigen wachtrij
+- weighted fair queuing (self-clocked): elk verzoek krijgt een virtuele
+  eindtijd = max(virtuele klok, vorige eindtijd van die sessie) + kosten/gewicht,
+  met kosten = geschatte tokens. De kleinste eindtijd gaat eerst, dus een
+  losse kleine vraag haalt de tweede batch van een groot document in.
+- globale limiet op gelijktijdige verzoeken
+- status(tenant): positie in de wachtrij, voor feedback in de UI
+Een lopend verzoek wordt niet onderbroken; grote documenten worden pas echt
+eerlijk gedeeld als ze in batches gaan (LLM_BATCH_TOKENS).
+Warm-up en keep-alive (llm_client) lopen ook hierdoor, als sessie SYSTEM_TENANT;
+een keep-alive-ping vervalt als er toch al verzoeken lopen of wachten.
+
+De sessie wordt via een contextvar doorgegeven: `with tenant(session_id): ...`.
+Zo ook een annuleer-event (`with cancellable(event): ...`): wie in de rij staat
+of een nieuw verzoek doet nadat het event gezet is, krijgt LLMCancelled.
+"""
+import os
+import time
+import threading
+import contextvars
+from collections import deque
+from contextlib import contextmanager
+
+import metrics
+from llm_client import LLMError
+
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "1"))
+LLM_QUEUE_TIMEOUT = float(os.getenv("LLM_QUEUE_TIMEOUT", "600"))   # seconden wachten, daarna LLMError
+DEFAULT_TENANT = "anoniem"
+SYSTEM_TENANT = "systeem"     # warm-up / keep-alive
+
+_current_tenant = contextvars.ContextVar("llm_tenant", default=DEFAULT_TENANT)
+_cancel_event = contextvars.ContextVar("llm_cancel", default=None)
+CANCEL_POLL = 0.25
+
+
+class LLMCancelled(LLMError):
+    """Het werk is afgeblazen (bv. speculatief werk voor een vervangen upload)."""
+
+
+@contextmanager
+def tenant(name: str):
+    """Alle LLM-verzoeken binnen dit blok tellen voor sessie `name`."""
+    token = _current_tenant.set(name or DEFAULT_TENANT)
+    try:
+        yield
+    finally:
+        _current_tenant.reset(token)
+
+
+def current_tenant() -> str:
+    return _current_tenant.get()
+
+
+@contextmanager
+def cancellable(event: threading.Event):
+    """LLM-verzoeken binnen dit blok stoppen zodra `event` gezet is."""
+    token = _cancel_event.set(event)
+    try:
+        yield
+    finally:
+        _cancel_event.reset(token)
+
+
+def cancelled() -> bool:
+    event = _cancel_event.get()
+    return event is not None and event.is_set()
+
+
+class _Ticket:
+    __slots__ = ("tenant", "cost", "finish", "seq", "granted", "queued_at")
+
+    def __init__(self, tenant: str, cost: float, finish: float, seq: int):
+        self.tenant = tenant
+        self.cost = cost
+        self.finish = finish
+        self.seq = seq
+        self.granted = False
+        self.queued_at = time.monotonic()
+
+    def key(self):
+        return (self.finish, self.seq)
+
+
+class FairScheduler:
+    def __init__(self, capacity: int = LLM_MAX_CONCURRENCY):
+        self.capacity = max(1, capacity)
+        self.weights: dict = {}
+        self._cond = threading.Condition()
+        self._queues: dict = {}          # tenant -> deque[_Ticket]
+        self._last_finish: dict = {}     # tenant -> virtuele eindtijd van het laatste verzoek
+        self._running: dict = {}         # tenant -> aantal lopend
+        self._vtime = 0.0
+        self._seq = 0
+
+    def set_capacity(self, capacity: int):
+        with self._cond:
+            self.capacity = max(1, capacity)
+            self._dispatch()
+
+    def set_weight(self, tenant_name: str, weight: float):
+        with self._cond:
+            self.weights[tenant_name] = max(0.01, weight)
+
+    # -- intern (onder lock) --
+    def _queued(self) -> list:
+        return sorted((t for q in self._queues.values() for t in q), key=_Ticket.key)
+
+    def _dispatch(self):
+        while sum(self._running.values()) < self.capacity:
+            heads = [q[0] for q in self._queues.values() if q]
+            if not heads:
+                break
+            ticket = min(heads, key=_Ticket.key)
+            self._queues[ticket.tenant].popleft()
+            ticket.granted = True
+            self._vtime = max(self._vtime, ticket.finish)
+            self._running[ticket.tenant] = self._running.get(ticket.tenant, 0) + 1
+        self._prune()
+        metrics.LLM_QUEUE_DEPTH.set(sum(len(q) for q in self._queues.values()))
+        self._cond.notify_all()
+
+    def _prune(self):
+        """
+        Vergeet sessies zonder wachtende verzoeken waarvan de eindtijd al achter
+        de virtuele klok ligt: max(klok, eindtijd) = klok, dus er verandert niets.
+        Zonder dit groeit _last_finish met elke sessie die ooit iets vroeg.
+        """
+        for name in [n for n, q in self._queues.items() if not q]:
+            del self._queues[name]
+        for name in [n for n, f in self._last_finish.items() if f <= self._vtime and n not in self._queues]:
+            del self._last_finish[name]
+
+    # -- publiek --
+    def acquire(self, cost: float, tenant_name: str | None = None, timeout: float = LLM_QUEUE_TIMEOUT) -> _Ticket:
+        tenant_name = tenant_name or current_tenant()
+        cancel = _cancel_event.get()
+        if cancelled():
+            raise LLMCancelled("LLM-verzoek geannuleerd.")
+        with self._cond:
+            weight = self.weights.get(tenant_name, 1.0)
+            start = max(self._vtime, self._last_finish.get(tenant_name, 0.0))
+            finish = start + max(1.0, cost) / weight
+            self._last_finish[tenant_name] = finish
+            self._seq += 1
+            ticket = _Ticket(tenant_name, cost, finish, self._seq)
+            self._queues.setdefault(tenant_name, deque()).append(ticket)
+            self._dispatch()
+
+            deadline = time.monotonic() + timeout
+            while not ticket.granted:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0 or (cancel is not None and cancel.is_set()):
+                    self._queues[tenant_name].remove(ticket)
+                    self._dispatch()
+                    if remaining > 0:
+                        raise LLMCancelled("LLM-verzoek geannuleerd in de wachtrij.")
+                    raise LLMError(f"LLM-wachtrij: na {timeout:.0f} s nog niet aan de beurt.")
+                self._cond.wait(remaining if cancel is None else min(remaining, CANCEL_POLL))
+
+        metrics.LLM_QUEUE_WAIT_SECONDS.observe(time.monotonic() - ticket.queued_at)
+        return ticket
+
+    def release(self, ticket: _Ticket):
+        with self._cond:
+            self._running[ticket.tenant] -= 1
+            if not self._running[ticket.tenant]:
+                del self._running[ticket.tenant]
+            self._dispatch()
+
+    @contextmanager
+    def slot(self, cost: float, tenant_name: str | None = None):
+        ticket = self.acquire(cost, tenant_name)
+        try:
+            yield ticket
+        finally:
+            self.release(ticket)
+
+    def has_capacity(self) -> bool:
+        """Vrije plek en niemand in de rij: ruimte voor speculatief werk."""
+        with self._cond:
+            return sum(self._running.values()) < self.capacity and not any(self._queues.values())
+
+    def status(self, tenant_name: str | None = None) -> dict:
+        """
+        {'running': lopend voor deze sessie, 'queued': wachtend voor deze sessie,
+         'position': plek van het eerste wachtende verzoek (1 = volgende) of None,
+         'total_queued': alle wachtenden, 'busy': alle lopenden}
+        """
+        tenant_name = tenant_name or current_tenant()
+        with self._cond:
+            queued = self._queued()
+            mine = [i for i, t in enumerate(queued, start=1) if t.tenant == tenant_name]
+            return {
+                "running": self._running.get(tenant_name, 0),
+                "queued": len(mine),
+                "position": mine[0] if mine else None,
+                "total_queued": len(queued),
+                "busy": sum(self._running.values()),
+            }
+
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+
+def get_scheduler() -> FairScheduler:
+    """Eén scheduler per proces (alle sessies delen dezelfde modelserver)."""
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = FairScheduler()
+        return _scheduler
@@ -0,0 +1,286 @@
+"""
+In-process metrics in Prometheus-tekstformaat (zonder extra dependencies).
+
+Alle metrics van de app staan onderaan dit bestand gedefinieerd, zodat de
+converters ze alleen hoeven te importeren. Exporteren:
+- start_http_server(port)  → GET /metrics op een lokale poort (daemon-thread)
+- render()                 → tekst voor een eigen endpoint (bv. api_server)
+De app start de exporter als METRICS_PORT gezet is.
+"""
+import os
+import time
+import threading
+import functools
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+DEFAULT_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _label_str(names, values, extra=()) -> str:
+    pairs = [f'{n}="{_escape(v)}"' for n, v in list(zip(names, values)) + list(extra)]
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _fmt(v) -> str:
+    if v == float("inf"):
+        return "+Inf"
+    return repr(float(v)) if isinstance(v, float) else str(v)
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help_text: str, labelnames=()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values: dict = {}
+
+    def _key(self, labels: dict) -> tuple:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name}: labels {sorted(labels)} != {sorted(self.labelnames)}")
+        return tuple(labels[n] for n in self.labelnames)
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            items = sorted(self._values.items())
+        for key, value in items:
+            lines.extend(self._render_one(key, value))
+        return lines
+
+    def _render_one(self, key, value):
+        return [f"{self.name}{_label_str(self.labelnames, key)} {_fmt(value)}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0)
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def set(self, value: float, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels):
+        self.inc(-amount, **labels)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, help_text, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help_text, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (float("inf"),)
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = {"counts": [0] * len(self.buckets), "sum": 0.0, "count": 0}
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state["counts"][i] += 1
+            state["sum"] += value
+            state["count"] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def _render_one(self, key, state):
+        lines = []
+        for bound, count in zip(self.buckets, state["counts"]):
+            labels = _label_str(self.labelnames, key, [("le", _fmt(bound))])
+            lines.append(f"{self.name}_bucket{labels} {count}")
+        labels = _label_str(self.labelnames, key)
+        lines.append(f"{self.name}_sum{labels} {_fmt(state['sum'])}")
+        lines.append(f"{self.name}_count{labels} {state['count']}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: dict = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric: _Metric) -> _Metric:
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"Metric bestaat al: {metric.name}")
+            self._metrics[metric.name] = metric
+        return metric
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for m in metrics:
+            lines.extend(m.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+
+def counter(name, help_text, labelnames=()) -> Counter:
+    return REGISTRY.register(Counter(name, help_text, labelnames))
+
+
+def gauge(name, help_text, labelnames=()) -> Gauge:
+    return REGISTRY.register(Gauge(name, help_text, labelnames))
+
+
+def histogram(name, help_text, labelnames=(), buckets=DEFAULT_BUCKETS) -> Histogram:
+    return REGISTRY.register(Histogram(name, help_text, labelnames, buckets))
+
+
+def render() -> str:
+    return REGISTRY.render()
+
+
+# ---------- Exporter ----------
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = render().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", CONTENT_TYPE)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+_server = None
+_server_lock = threading.Lock()
+
+
+def start_http_server(port: int, host: str = "127.0.0.1"):
+    """Start de exporter één keer per proces; volgende aanroepen doen niets."""
+    global _server
+    with _server_lock:
+        if _server is not None:
+            return _server
+        _server = ThreadingHTTPServer((host, port), _MetricsHandler)
+        _server.daemon_threads = True
+        threading.Thread(target=_server.serve_forever, name="metrics", daemon=True).start()
+        return _server
+
+
+def start_from_env():
+    port = os.getenv("METRICS_PORT")
+    if port:
+        start_http_server(int(port), os.getenv("METRICS_HOST", "127.0.0.1"))
+
+
+# ---------- Metrics van de app ----------
+CONVERSIONS = counter(
+    "triade_conversions_total", "Aantal conversies per converter en uitkomst.", ("converter", "status")
+)
+CONVERSION_SECONDS = histogram(
+    "triade_conversion_seconds", "Duur van een conversie.", ("converter",)
+)
+CLOUDINARY_UPLOADS = counter(
+    "triade_cloudinary_uploads_total", "Cloudinary-uploads (ok | error | disabled).", ("status",)
+)
+CLOUDINARY_SECONDS = histogram(
+    "triade_cloudinary_upload_seconds", "Duur van een Cloudinary-upload.", buckets=(0.1, 0.25, 0.5, 1, 2, 5, 10, 30)
+)
+LLM_REQUESTS = counter(
+    "triade_llm_requests_total", "LLM-calls per provider en uitkomst.", ("provider", "status")
+)
+LLM_SECONDS = histogram(
+    "triade_llm_request_seconds", "Duur van een LLM-call.", ("provider",)
+)
+LLM_ROUTED = counter(
+    "triade_llm_routed_total", "Routerbeslissingen per endpoint (voorkeur | failover).", ("endpoint", "reason")
+)
+LLM_ENDPOINT_SEC_PER_TOKEN = gauge(
+    "triade_llm_endpoint_seconds_per_token", "Voortschrijdend gemiddelde latency per invoertoken.", ("endpoint",)
+)
+LLM_QUEUE_WAIT_SECONDS = histogram(
+    "triade_llm_queue_wait_seconds", "Wachttijd in de eerlijke LLM-wachtrij."
+)
+LLM_QUEUE_DEPTH = gauge(
+    "triade_llm_queue_depth", "Aantal wachtende LLM-verzoeken (alle sessies)."
+)
+PPTX_SLIDE_SOURCE = counter(
+    "triade_pptx_decks_total", "PowerPoint-decks naar bron van de dia's (llm | fallback).", ("source",)
+)
+PPTX_FALLBACKS = counter(
+    "triade_pptx_fallbacks_total", "Terugval op heuristische dia's, naar fouttype.", ("reason",)
+)
+PPTX_SLIDES = counter(
+    "triade_pptx_slides_total", "Dia's naar bron (llm | extractive | repair | fallback).", ("source",)
+)
+EXTRACTIVE_SCORE = histogram(
+    "triade_extractive_score", "Kwaliteitsscore van extractieve dia's per blok.",
+    buckets=(0.1, 0.2, 0.3, 0.4, 0.5, 0.6, 0.7, 0.8, 0.9, 1.0)
+)
+PPTX_SLIM_BYTES = counter(
+    "triade_pptx_slim_bytes_saved_total", "Bytes bespaard door het herschalen van afbeeldingen in decks."
+)
+LLM_WARMUP_SECONDS = gauge(
+    "triade_llm_warmup_seconds", "Laatste warm-up duur (startup | cold | warm).", ("phase",)
+)
+LLM_KEEPALIVE = counter(
+    "triade_llm_keepalive_total", "Warm-up/keep-alive pings naar de LLM-server (ok | error | skipped).", ("status",)
+)
+HTML_OUTPUT_BYTES = counter(
+    "triade_html_output_bytes_total", "Bytes HTML-uitvoer per variant (origineel | compact | gzip | br).", ("variant",)
+)
+CACHE_REQUESTS = counter(
+    "triade_cache_requests_total", "Cache-opvragingen per cache (hit | miss).", ("cache", "result")
+)
+
+
+def instrument(converter: str):
+    """Decorator: telt conversies (ok/error) en meet de duur."""
+    def wrap(fn):
+        @functools.wraps(fn)
+        def inner(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                result = fn(*args, **kwargs)
+            except BaseException:
+                CONVERSIONS.inc(converter=converter, status="error")
+                raise
+            finally:
+                CONVERSION_SECONDS.observe(time.perf_counter() - start, converter=converter)
+            CONVERSIONS.inc(converter=converter, status="ok")
+            return result
+        return inner
+    return wrap
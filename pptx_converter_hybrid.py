@@ -2,167 +2,51 @@ import io
 import os
 import re
 import json
-import requests
+import hashlib
+import threading
+import contextvars
+from collections import OrderedDict
 from copy import deepcopy
+from concurrent.futures import ThreadPoolExecutor
 
-from docx import Document
 from pptx import Presentation
 from pptx.util import Inches, Pt
 from pptx.dml.color import RGBColor
 from pptx.enum.shapes import MSO_SHAPE_TYPE
 
+import metrics
+from docx_ir import parse_docx, ir_to_blocks
+from pptx_slim import add_logo_to_layout, slim_presentation
+from llm_client import LLMError, force_json_or_raise, SLIDES_SYSTEM_PROMPT
+from llm_router import get_router, estimate_tokens
+from llm_scheduler import cancelled
+from extractive import summarize_blocks
+
 
 # =========================
 # CONFIG
 # =========================
 BASE_TEMPLATE_NAME = "basis layout.pptx"  # in ./templates/
-LOCAL_LOGO_PATH = os.path.join(os.path.dirname(__file__), "assets", "logo.png")
-
-# LLM config via env
-LLM_PROVIDER = os.getenv("LLM_PROVIDER", "OLLAMA").upper()           # OLLAMA | OPENAI_COMPAT
-LLM_MODEL    = os.getenv("LLM_MODEL", "mistral")                      # bv. 'mistral', 'qwen2.5:7b-instruct', 'llama3.1'
-LLM_BASE_URL = os.getenv("LLM_BASE_URL", "http://localhost:11434")    # Ollama default; voor OPENAI_COMPAT bv. http://localhost:1234/v1
-LLM_API_KEY  = os.getenv("LLM_API_KEY")                               # alleen voor OPENAI_COMPAT indien nodig
-
-
-# =========================
-# 0. LLM Client (zonder OpenAI SDK)
-# =========================
-class LLMError(RuntimeError):
-    pass
-
-
-class LLMClient:
-    """
-    Minimale client met 2 providers:
-    - OLLAMA (chat API): POST /api/chat  (support 'format': 'json' -> valide JSON)
-    - OPENAI_COMPAT: POST /chat/completions  (LM Studio / vLLM / andere compatibele servers)
-    Geeft JSON-string terug.
-    """
-
-    def __init__(self, provider: str, model: str, base_url: str, api_key: str | None):
-        self.provider = provider.upper()
-        self.model = model
-        self.base_url = base_url.rstrip("/")
-        self.api_key = api_key
-
-    def chat_json(self, user_prompt: str) -> str:
-        if self.provider == "OLLAMA":
-            return self._chat_ollama(user_prompt)
-        elif self.provider == "OPENAI_COMPAT":
-            return self._chat_openai_compat(user_prompt)
-        else:
-            raise LLMError(f"Onbekende LLM_PROVIDER: {self.provider}")
-
-    def _chat_ollama(self, user_prompt: str) -> str:
-        """
-        Ollama chat API:
-        POST {base}/api/chat
-        body: {model, messages, stream=false, options?, format='json'}
-        return: response['message']['content']
-        """
-        url = f"{self.base_url}/api/chat"
-        payload = {
-            "model": self.model,
-            "messages": [{"role": "user", "content": user_prompt}],
-            "stream": False,
-            "format": "json",  # dwing JSON af bij veel modellen
-        }
-        try:
-            r = requests.post(url, json=payload, timeout=120)
-            r.raise_for_status()
-            data = r.json()
-            content = (data.get("message") or {}).get("content")
-            if not content:
-                raise LLMError("Lege content van Ollama.")
-            return content
-        except requests.RequestException as e:
-            raise LLMError(f"Ollama call faalde: {e}") from e
-        except ValueError:
-            raise LLMError("Ollama gaf geen JSON terug.")
-
-    def _chat_openai_compat(self, user_prompt: str) -> str:
-        """
-        OpenAI-compatible /chat/completions.
-        Probeer response_format=json_object indien ondersteund.
-        """
-        url = f"{self.base_url}/chat/completions"
-        headers = {"Content-Type": "application/json"}
-        if self.api_key:
-            headers["Authorization"] = f"Bearer {self.api_key}"
-
-        payload = {
-            "model": self.model,
-            "messages": [{"role": "user", "content": user_prompt}],
-            # veel compat-servers ondersteunen dit, zo niet: content bevat JSON als tekst
-            "response_format": {"type": "json_object"},
-            "temperature": 0.2,
-        }
-        try:
-            r = requests.post(url, json=payload, headers=headers, timeout=120)
-            r.raise_for_status()
-            data = r.json()
-            content = data["choices"][0]["message"]["content"]
-            if not content:
-                raise LLMError("Lege content van OpenAI-compat endpoint.")
-            return content
-        except requests.RequestException as e:
-            raise LLMError(f"OpenAI-compat call faalde: {e}") from e
-        except (KeyError, ValueError):
-            raise LLMError("OpenAI-compat gaf onverwachte payload.")
-
-
-def force_json_or_raise(text: str) -> dict:
-    """
-    Probeer JSON te parsen; als er ruis omheen staat, strip dan tot { ... }.
-    """
-    try:
-        return json.loads(text)
-    except Exception:
-        # probeer JSON uit vrije tekst te vissen
-        start = text.find("{")
-        end = text.rfind("}")
-        if start != -1 and end != -1 and end > start:
-            snippet = text[start : end + 1]
-            return json.loads(snippet)
-        raise
-
+LLM_REPAIR_ROUNDS = int(os.getenv("LLM_REPAIR_ROUNDS", "1"))  # vervolgcalls voor ontbrekende/ongeldige dia's
+LLM_BATCH_TOKENS = int(os.getenv("LLM_BATCH_TOKENS", "0"))    # >0: blokken in batches van max. zoveel tokens
+LLM_BATCH_WORKERS = int(os.getenv("LLM_BATCH_WORKERS", "2"))  # batches tegelijk (over de endpoints van de router)
+LOCAL_LOGO_PATH = os.path.join(os.path.dirname(__file__), "assets", "logo-triade-460px.png")
+PPTX_SLIM = os.getenv("PPTX_SLIM", "1") == "1"  # afslankronde na het opbouwen (zie pptx_slim)
+SLIDES_CACHE_SIZE = int(os.getenv("PPTX_SLIDES_CACHE_SIZE", "32"))   # LLM-antwoorden per blokkenset
+EXTRACTIVE_SKIP_SCORE = float(os.getenv("EXTRACTIVE_SKIP_SCORE", "0.8"))  # >1: elk blok naar het LLM
 
 # =========================
 # 1. DOCX → blokken (kop + tekst)
 # =========================
-def docx_to_blocks(doc: Document) -> list[dict]:
+def docx_to_blocks(source) -> list[dict]:
     """
     Structuur uit Word:
     elke heading / vet / ALL CAPS = nieuwe dia
     onderliggende tekst = body
+    source: DocumentIR, python-docx Document of file_like
     return: [{"title": "...", "body": "..."}, ...]
     """
-    blocks = []
-    current_title = None
-    current_body: list[str] = []
-
-    for para in doc.paragraphs:
-        txt = "".join(r.text for r in para.runs if r.text).strip()
-        if not txt:
-            continue
-
-        is_heading = (
-            (para.style and para.style.name and para.style.name.lower().startswith("heading"))
-            or any(r.bold for r in para.runs)
-            or (len(txt) <= 50 and txt.upper() == txt)  # korte regel in CAPS
-        )
-
-        if is_heading:
-            if current_title or current_body:
-                blocks.append({"title": current_title, "body": "\n".join(current_body).strip()})
-            current_title = txt
-            current_body = []
-        else:
-            current_body.append(txt)
-
-    if current_title or current_body:
-        blocks.append({"title": current_title, "body": "\n".join(current_body).strip()})
+    blocks = ir_to_blocks(parse_docx(source))
 
     if not blocks:
         blocks = [{"title": "Lesonderdeel", "body": "(Geen duidelijke structuur gevonden in dit document.)"}]
@@ -173,103 +57,269 @@ def docx_to_blocks(doc: Document) -> list[dict]:
 # =========================
 # 2. LLM (zonder OpenAI SDK): alle blokken → slides
 # =========================
-def llm_make_all_slides_from_blocks(blocks: list[dict]) -> list[dict]:
+MAX_TEXT_LINES = 4
+
+
+def validate_slide(obj) -> dict | None:
+    """
+    Strikte controle van één dia uit het LLM-antwoord.
+    Geldig: title (niet-lege tekst), text (1-4 niet-lege regels; losse tekst
+    mag), check (niet-lege tekst). Return: genormaliseerde dia of None.
     """
-    Stuurt ALLE blokken in één prompt naar het gekozen model (Ollama / OpenAI-compat).
-    Return: [{"title":"...","text":["...","..."],"check":"..."}...]
+    if not isinstance(obj, dict):
+        return None
+    title, text, check = obj.get("title"), obj.get("text"), obj.get("check")
+    if isinstance(text, str):
+        text = [text]
+    if not isinstance(title, str) or not title.strip():
+        return None
+    if not isinstance(check, str) or not check.strip():
+        return None
+    if not isinstance(text, list) or not all(isinstance(t, str) for t in text):
+        return None
+    text = [t.strip() for t in text if t.strip()]
+    if not 1 <= len(text) <= MAX_TEXT_LINES:
+        return None
+    return {"title": title.strip(), "text": text, "check": check.strip()}
+
+
+def _salvage_slides(raw: str) -> list:
     """
-    client = LLMClient(LLM_PROVIDER, LLM_MODEL, LLM_BASE_URL, LLM_API_KEY)
+    Haalt de volledige dia-objecten uit een (mogelijk afgekapt) antwoord.
+    Een afgebroken laatste dia gaat verloren, de rest blijft bruikbaar.
+    """
+    try:
+        data = force_json_or_raise(raw)
+        slides = data.get("slides") if isinstance(data, dict) else None
+        if isinstance(slides, list):
+            return slides
+    except ValueError:
+        pass
+
+    m = re.search(r'"slides"\s*:\s*\[', raw)
+    if not m:
+        return []
+    decoder = json.JSONDecoder()
+    slides, pos = [], m.end()
+    while True:
+        while pos < len(raw) and raw[pos] in " \t\r\n,":
+            pos += 1
+        if pos >= len(raw) or raw[pos] == "]":
+            break
+        try:
+            obj, pos = decoder.raw_decode(raw, pos)
+        except ValueError:
+            break
+        slides.append(obj)
+    return slides
+
+
+def match_slides(slides: list, indices: list[int]) -> dict:
+    """
+    Koppelt teruggegeven dia's aan de gevraagde onderdelen (1-based nummers).
+    Op "index" als die er is; zonder index alleen op positie wanneer het
+    aantal precies klopt. Return: {index: genormaliseerde dia} (alleen geldige).
+    """
+    wanted = set(indices)
+    matched = {}
+    has_index = any(isinstance(s, dict) and "index" in s for s in slides)
+
+    for pos, raw in enumerate(slides):
+        if has_index:
+            idx = raw.get("index") if isinstance(raw, dict) else None
+            if isinstance(idx, str) and idx.strip().isdigit():
+                idx = int(idx)
+        elif len(slides) == len(indices):
+            idx = indices[pos]
+        else:
+            idx = None
+        if not isinstance(idx, int) or idx not in wanted or idx in matched:
+            continue
+        slide = validate_slide(raw)
+        if slide is not None:
+            matched[idx] = slide
+    return matched
 
+
+def _slides_prompt(blocks: list[dict], indices: list[int], repair: bool = False) -> str:
     parts = []
-    for i, b in enumerate(blocks, start=1):
+    for i in indices:
+        b = blocks[i - 1]
         parts.append(f"### Onderdeel {i}\nKop: {b.get('title') or ''}\nTekst:\n{b.get('body') or ''}\n")
     joined = "\n\n".join(parts)
+    if repair:
+        return (
+            "Maak alleen dia's voor deze onderdelen (gebruik hun nummer als index):\n\n"
+            f"{joined}"
+        )
+    return f"Hier zijn de onderdelen uit het Word-document:\n\n{joined}"
+
+
+def _request_slides(client, blocks: list[dict], indices: list[int], repair: bool) -> dict:
+    # vaste instructies als system-prefix (KV-cache), alleen de inhoud wisselt
+    raw = client.chat_json(_slides_prompt(blocks, indices, repair), system_prompt=SLIDES_SYSTEM_PROMPT)
+    return match_slides(_salvage_slides(raw), indices)
+
+
+def _batches(blocks: list[dict], indices: list[int], limit: int) -> list[list[int]]:
+    """Opeenvolgende blokken gegroepeerd tot max. `limit` geschatte tokens (0 = één batch)."""
+    if limit <= 0:
+        return [indices]
+    batches, current, size = [], [], 0
+    for i in indices:
+        b = blocks[i - 1]
+        tokens = estimate_tokens(b.get("title") or "", b.get("body") or "")
+        if current and size + tokens > limit:
+            batches.append(current)
+            current, size = [], 0
+        current.append(i)
+        size += tokens
+    if current:
+        batches.append(current)
+    return batches
+
+
+def _request_batches(client, blocks: list[dict], batches: list[list[int]], repair: bool) -> dict:
+    """Batches (parallel) naar de router; een mislukte batch levert gewoon niets op."""
+    def one(batch):
+        try:
+            return _request_slides(client, blocks, batch, repair)
+        except LLMError:
+            return {}
+
+    if len(batches) == 1:
+        return one(batches[0])
+    matched = {}
+    # worker-threads erven geen contextvars (sessie, annuleren): per batch een kopie
+    contexts = [contextvars.copy_context() for _ in batches]
+    with ThreadPoolExecutor(max_workers=max(1, LLM_BATCH_WORKERS)) as pool:
+        for result in pool.map(lambda ctx, batch: ctx.run(one, batch), contexts, batches):
+            matched.update(result)
+    return matched
+
+
+def llm_make_all_slides_from_blocks(blocks: list[dict]) -> list[dict]:
+    """
+    Zie _llm_slides.
+    Return: [{"title":"...","text":["...","..."],"check":"..."}...], 1 per blok
+    """
+    return _llm_slides(blocks)[0]
+
+
+def _llm_slides(blocks: list[dict]) -> tuple[list[dict], int]:
+    """
+    Stuurt de blokken naar het LLM via de router (llm_router): in één prompt,
+    of in batches van LLM_BATCH_TOKENS zodat kleine batches op een sneller
+    model kunnen landen.
+    Blokken met een extractieve score ≥ EXTRACTIVE_SKIP_SCORE slaan het LLM over.
+    Elke dia wordt gevalideerd en aan zijn blok gekoppeld; alleen ontbrekende of
+    ongeldige dia's worden opnieuw gevraagd (LLM_REPAIR_ROUNDS), wat dan nog
+    ontbreekt krijgt de extractieve dia. Levert niets bruikbaars op → LLMError.
+    Return: (dia's, aantal blokken dat op de extractieve terugval is beland)
+    """
+    client = get_router()
+    indices = list(range(1, len(blocks) + 1))
+
+    # blokken waarvan de extractieve dia goed genoeg is, gaan niet naar het LLM
+    summaries = summarize_blocks(blocks)
+    for s in summaries:
+        metrics.EXTRACTIVE_SCORE.observe(s.score)
+    local = {i: summaries[i - 1].slide() for i in indices if summaries[i - 1].score >= EXTRACTIVE_SKIP_SCORE}
+    ask = [i for i in indices if i not in local]
+
+    matched = {}
+    if ask:
+        batches = _batches(blocks, ask, LLM_BATCH_TOKENS)
+        if len(batches) == 1:
+            matched = _request_slides(client, blocks, ask, repair=False)
+        else:
+            matched = _request_batches(client, blocks, batches, repair=False)
+        if not matched:
+            raise LLMError("LLM antwoord bevat geen geldige dia's.")
+        metrics.PPTX_SLIDES.inc(len(matched), source="llm")
+    matched.update(local)
+    if local:
+        metrics.PPTX_SLIDES.inc(len(local), source="extractive")
+
+    for _ in range(LLM_REPAIR_ROUNDS):
+        missing = [i for i in indices if i not in matched]
+        if not missing:
+            break
+        repaired = _request_batches(client, blocks, _batches(blocks, missing, LLM_BATCH_TOKENS), repair=True)
+        matched.update(repaired)
+        metrics.PPTX_SLIDES.inc(len(repaired), source="repair")
+
+    slides, fallbacks = [], 0
+    for i in indices:
+        if i not in matched:
+            matched[i] = summaries[i - 1].slide()
+            metrics.PPTX_SLIDES.inc(source="fallback")
+            fallbacks += 1
+        slides.append(matched[i])
+    return slides, fallbacks
+
+
+# Antwoorden gecachet op de inhoud van de blokken. Loopt er al een generatie
+# voor dezelfde blokken (bv. speculatief na de upload), dan wacht je daarop
+# in plaats van het LLM een tweede keer te belasten.
+_slides_cache: "OrderedDict[str, list]" = OrderedDict()
+_slides_inflight: dict = {}   # key → threading.Event (gezet als de generatie klaar is)
+_slides_lock = threading.Lock()
+
+
+def slides_cache_key(blocks: list[dict]) -> str:
+    return hashlib.sha256(json.dumps(blocks, ensure_ascii=False, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+def cached_slides(key: str) -> list[dict] | None:
+    with _slides_lock:
+        slides = _slides_cache.get(key)
+        if slides is not None:
+            _slides_cache.move_to_end(key)
+        return slides
+
+
+def slides_for_blocks(blocks: list[dict]) -> list[dict]:
+    """llm_make_all_slides_from_blocks met cache en één generatie tegelijk per inhoud."""
+    key = slides_cache_key(blocks)
+    while True:
+        with _slides_lock:
+            slides = _slides_cache.get(key)
+            running = _slides_inflight.get(key)
+            if slides is not None:
+                _slides_cache.move_to_end(key)
+            elif running is None:
+                done = _slides_inflight[key] = threading.Event()
+        if slides is not None or running is None:
+            break
+        running.wait()   # daarna opnieuw kijken: klaar, mislukt of geannuleerd
+    if slides is not None:
+        metrics.CACHE_REQUESTS.inc(cache="pptx_slides", result="hit")
+        return slides
+    metrics.CACHE_REQUESTS.inc(cache="pptx_slides", result="miss")
 
-    prompt = f"""
-Je krijgt hieronder meerdere onderdelen uit een les over installatietechniek.
-Maak hier dia's van voor een VMBO-les (basis/kader/GL).
-
-Voor elk onderdeel:
-- bedenk 1 korte, begrijpelijke titel (max 8 woorden)
-- schrijf 2 of 3 korte, vertellende zinnen in de je-vorm
-- schrijf 1 controlevraag die past bij de uitleg
-- herhaal de titel NIET in de tekst
-- gebruik eenvoudige woorden
-
-Geef ALLEEN geldig JSON in dit formaat:
-
-{{
-  "slides": [
-    {{
-      "title": "…",
-      "text": ["…", "…", "…"],
-      "check": "…"
-    }}
-  ]
-}}
-
-Hier zijn de onderdelen uit het Word-document:
-
-{joined}
-"""
     try:
-        raw = client.chat_json(prompt)
-        data = force_json_or_raise(raw)
-    except Exception as e:
-        raise LLMError(f"LLM gaf geen geldig JSON: {e}") from e
-
-    slides = data.get("slides")
-    if not slides or not isinstance(slides, list):
-        raise LLMError("LLM antwoord bevat geen 'slides' lijst.")
-    # minimale normalisatie
-    norm = []
-    for s in slides:
-        title = (s.get("title") or "Lesonderdeel").strip()
-        text = s.get("text") or []
-        if isinstance(text, str):
-            text = [text]
-        text = [t.strip() for t in text if t and t.strip()]
-        check = (s.get("check") or "").strip()
-        norm.append({"title": title, "text": text, "check": check})
-    return norm
+        slides, fallbacks = _llm_slides(blocks)
+        # afgebroken of deels mislukt werk bevat terugval-dia's: niet vasthouden,
+        # de volgende aanvraag probeert het LLM opnieuw
+        if not fallbacks and not cancelled():
+            with _slides_lock:
+                _slides_cache[key] = slides
+                while len(_slides_cache) > SLIDES_CACHE_SIZE:
+                    _slides_cache.popitem(last=False)
+        return slides
+    finally:
+        with _slides_lock:
+            del _slides_inflight[key]
+        done.set()
 
 
 # =========================
 # 3. Fallback: zonder LLM → heuristisch
 # =========================
 def fallback_slides_from_blocks(blocks: list[dict]) -> list[dict]:
-    slides = []
-    for b in blocks:
-        title_raw = (b.get("title") or "Lesonderdeel").strip()
-        body_raw = (b.get("body") or "").strip()
-        title = title_raw.capitalize()
-
-        sentences = re.split(r"[.!?]\s+", body_raw)
-        sentences = [s.strip(" .!?") for s in sentences if s.strip()]
-        text_lines = []
-        for s in sentences[:3]:
-            s = s.replace("Men ", "Je ").replace("men ", "je ")
-            if not s.lower().startswith(("je ", "dit ", "zo ", "dan ", "als ")):
-                s = "Je " + s[0].lower() + s[1:]
-            text_lines.append(s)
-
-        if not text_lines:
-            text_lines = [
-                "Je leert hier hoe je dit onderdeel goed uitvoert.",
-                "Zo kan water en lucht goed weg.",
-                "Dan krijg je geen stank.",
-            ]
-
-        lower = body_raw.lower()
-        if any(k in lower for k in ("niet", "mag", "nooit")):
-            check = "Waarom mag je dit niet zo doen?"
-        elif any(k in lower for k in ("leiding", "afvoer")):
-            check = "Wat gebeurt er als je dit verkeerd aansluit?"
-        else:
-            check = "Kun je uitleggen waarom je dit zo doet?"
-
-        slides.append({"title": title, "text": text_lines, "check": check})
-    return slides
+    """Extractieve dia's (zie extractive): beste zinnen per blok + controlevraag."""
+    return [s.slide() for s in summarize_blocks(blocks)]
 
 
 # =========================
@@ -283,9 +333,10 @@ def get_logo_bytes():
 
 
 def add_logo(slide, logo_bytes):
+    """Logo op de layout van deze dia (1x per deck; alle dia's met die layout tonen het)."""
     if not logo_bytes:
         return
-    slide.shapes.add_picture(io.BytesIO(logo_bytes), Inches(7.5), Inches(0.2), width=Inches(1.5))
+    add_logo_to_layout(slide.slide_layout, logo_bytes, Inches(7.5), Inches(0.2), Inches(1.5))
 
 
 def get_positions_from_first_slide(slide):
@@ -304,7 +355,7 @@ def get_positions_from_first_slide(slide):
 
 def duplicate_slide_clean(prs: Presentation, slide_index: int):
     src = prs.slides[slide_index]
-    dest = prs.slides.add_slide(prs.slide_layouts[0])
+    dest = prs.slides.add_slide(src.slide_layout)   # zelfde layout → zelfde logo (add_logo)
     for shp in src.shapes:
         if shp.shape_type == MSO_SHAPE_TYPE.PICTURE:
             continue
@@ -361,6 +412,7 @@ def place_text_and_question(slide, lines: list[str], check: str, pos: dict):
 # =========================
 # 5. MAIN: DOCX → PPTX
 # =========================
+@metrics.instrument("pptx")
 def docx_to_pptx_hybrid(file_like):
     # 1) template
     base_dir = os.path.dirname(__file__)
@@ -368,13 +420,15 @@ def docx_to_pptx_hybrid(file_like):
     prs = Presentation(template_path) if os.path.exists(template_path) else Presentation()
 
     # 2) input
-    doc = Document(file_like)
-    blocks = docx_to_blocks(doc)
+    blocks = docx_to_blocks(parse_docx(file_like))
 
     # 3) LLM of fallback
     try:
-        slides_data = llm_make_all_slides_from_blocks(blocks)
-    except Exception:
+        slides_data = slides_for_blocks(blocks)
+        metrics.PPTX_SLIDE_SOURCE.inc(source="llm")
+    except Exception as e:
+        metrics.PPTX_SLIDE_SOURCE.inc(source="fallback")
+        metrics.PPTX_FALLBACKS.inc(reason=type(e).__name__)
         slides_data = fallback_slides_from_blocks(blocks)
 
     # 4) logo + eerste dia
@@ -398,12 +452,12 @@ def docx_to_pptx_hybrid(file_like):
 
     for sd in slides_data[1:]:
         slide = duplicate_slide_clean(prs, 0)
-        if logo_bytes:
-            add_logo(slide, logo_bytes)
         place_title(slide, sd["title"], positions["title"])
         place_text_and_question(slide, sd.get("text", []), sd.get("check", ""), positions["body"])
 
-    # 6) output
+    # 6) afslanken + output
+    if PPTX_SLIM:
+        slim_presentation(prs)
     out = io.BytesIO()
     prs.save(out)
     out.seek(0)
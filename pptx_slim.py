@@ -0,0 +1,117 @@
+"""
+Afslankronde voor gegenereerde PowerPoint-decks (na het opbouwen, vóór opslaan).
+
+- logo één keer op de dia-indeling (layout) i.p.v. een afbeelding per dia
+- ongebruikte layouts en masters (met hun thema's en media) eruit
+- te grote afbeeldingen opnieuw coderen naar de weergavemaat op PPTX_IMAGE_DPI
+  (via image_prep; alleen als het resultaat kleiner is en het formaat gelijk blijft)
+python-pptx schrijft alleen onderdelen die nog bereikbaar zijn, dus wat na
+het loskoppelen nergens meer naar verwijst, komt niet in het bestand.
+"""
+import io
+import os
+
+from pptx.util import Emu
+from pptx.parts.image import ImagePart
+from pptx.oxml.ns import qn
+from pptx.oxml.shapes.picture import CT_Picture
+
+import image_prep
+import metrics
+
+PPTX_IMAGE_DPI = int(os.getenv("PPTX_IMAGE_DPI", "150"))   # scherm/beamer; print heeft meer nodig
+
+R_EMBED = qn("r:embed")
+
+
+# ---------- Logo op de layout ----------
+def add_logo_to_layout(layout, logo_bytes: bytes, left, top, width):
+    """Logo als afbeelding op de layout; alle dia's met die layout tonen het."""
+    image_part, rId = layout.part.get_or_add_image_part(io.BytesIO(logo_bytes))
+    px_w, px_h = image_part._px_size
+    height = int(width * px_h / px_w) if px_w else width
+    shapes = layout.shapes
+    pic = CT_Picture.new_pic(shapes._next_shape_id, "Logo", "", rId, left, top, width, height)
+    shapes._spTree.insert_element_before(pic, "p:extLst")
+
+
+# ---------- Ongebruikte layouts / masters ----------
+def drop_unused_layouts(prs) -> int:
+    removed = 0
+    for master in prs.slide_masters:
+        for layout in list(master.slide_layouts):
+            # een master moet minstens één layout houden
+            if len(master.slide_layouts) > 1 and not layout.used_by_slides:
+                master.slide_layouts.remove(layout)
+                removed += 1
+    return removed
+
+
+def drop_unused_masters(prs) -> int:
+    used = {slide.slide_layout.slide_master.part for slide in prs.slides}
+    id_lst = prs.part._element.sldMasterIdLst
+    removed = 0
+    for master_id in list(id_lst.sldMasterId_lst):
+        if len(id_lst.sldMasterId_lst) <= 1:
+            break
+        if prs.part.related_part(master_id.rId) in used:
+            continue
+        id_lst.remove(master_id)
+        prs.part.drop_rel(master_id.rId)
+        removed += 1
+    return removed
+
+
+# ---------- Afbeeldingen ----------
+def _display_widths(prs) -> dict:
+    """ImagePart → grootste weergavebreedte in inch (over dia's, layouts en masters)."""
+    parts = [s.part for s in prs.slides]
+    for master in prs.slide_masters:
+        parts.append(master.part)
+        parts.extend(layout.part for layout in master.slide_layouts)
+
+    widths: dict = {}
+    for part in parts:
+        for pic in part._element.iter(qn("p:pic")):
+            blip = pic.find(f".//{qn('a:blip')}")
+            ext = pic.find(f".//{qn('a:xfrm')}/{qn('a:ext')}")
+            if blip is None or ext is None or not blip.get(R_EMBED):
+                continue
+            image_part = part.related_part(blip.get(R_EMBED))
+            if not isinstance(image_part, ImagePart):
+                continue
+            cx = int(ext.get("cx"))
+            # bijgesneden: het volledige beeld is breder dan wat je ziet
+            crop = pic.find(f".//{qn('a:srcRect')}")
+            if crop is not None:
+                visible = 1 - (int(crop.get("l", 0)) + int(crop.get("r", 0))) / 100000
+                if visible > 0:
+                    cx = int(cx / visible)
+            widths[image_part] = max(widths.get(image_part, 0), Emu(cx).inches)
+    return widths
+
+
+def _same_format(a: bytes, b: bytes) -> bool:
+    return a[:3] == b[:3]   # JPEG (FF D8 FF) / PNG (89 'PN')
+
+
+def recompress_images(prs, dpi: int = PPTX_IMAGE_DPI) -> int:
+    """Herschaalt afbeeldingen die groter zijn dan nodig; return: bespaarde bytes."""
+    saved = 0
+    for image_part, width_in in _display_widths(prs).items():
+        blob = image_part.blob
+        new = image_prep.normalize_image(blob, width_in, dpi)
+        if new and len(new) < len(blob) and _same_format(blob, new):
+            image_part._blob = new
+            saved += len(blob) - len(new)
+    return saved
+
+
+def slim_presentation(prs, dpi: int = PPTX_IMAGE_DPI) -> dict:
+    report = {
+        "layouts_removed": drop_unused_layouts(prs),
+        "masters_removed": drop_unused_masters(prs),
+        "image_bytes_saved": recompress_images(prs, dpi),
+    }
+    metrics.PPTX_SLIM_BYTES.inc(report["image_bytes_saved"])
+    return report
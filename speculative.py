@@ -0,0 +1,84 @@
+"""
+Speculatief voorwerk voor de PowerPoint-tab, direct na de upload.
+
+Op de achtergrond (daemon-thread):
+1. DOCX parsen en in blokken delen (parse_docx cachet op inhoud-hash)
+2. alleen als de LLM-scheduler ruimte heeft: de dia's alvast laten genereren
+   in de slides-cache van pptx_converter_hybrid
+Klikt de docent daarna op "Maak PowerPoint", dan is het antwoord er al, of
+wacht de conversie op de lopende generatie in plaats van een tweede te starten.
+
+Annuleren: cancel(), een nieuwe upload, of het verdwijnen van de sessie
+(weakref.finalize). Een lopend LLM-verzoek wordt afgemaakt, maar wachtende en
+volgende verzoeken vervallen (llm_scheduler.LLMCancelled).
+"""
+import os
+import threading
+import weakref
+
+# hier importeren, niet in de thread: Streamlit zet de app-map alleen tijdens
+# een scriptrun op sys.path
+from docx_ir import parse_docx
+from llm_scheduler import get_scheduler, tenant, cancellable, LLMCancelled
+from pptx_converter_hybrid import docx_to_blocks, slides_for_blocks
+
+PPTX_SPECULATE = os.getenv("PPTX_SPECULATE", "1") == "1"
+
+# toestanden
+PARSING = "parsen"
+GENERATING = "genereren"
+DONE = "klaar"
+SKIPPED = "overgeslagen"     # geen ruimte bij het LLM; de klik doet het werk
+CANCELLED = "geannuleerd"
+FAILED = "fout"
+
+
+def _run(source, session, cancel: threading.Event, state: dict):
+    try:
+        blocks = docx_to_blocks(parse_docx(source))
+        if cancel.is_set():
+            state["status"] = CANCELLED
+            return
+        state["blocks"] = len(blocks)
+        if not get_scheduler().has_capacity():
+            state["status"] = SKIPPED
+            return
+        state["status"] = GENERATING
+        with tenant(session), cancellable(cancel):
+            slides_for_blocks(blocks)
+        state["status"] = CANCELLED if cancel.is_set() else DONE
+    except Exception as e:
+        # in batches wordt LLMCancelled per batch opgevangen; het event is leidend
+        if isinstance(e, LLMCancelled) or cancel.is_set():
+            state["status"] = CANCELLED
+        else:
+            state["status"] = FAILED
+            state["error"] = str(e)
+
+
+class Speculation:
+    """Eén speculatieve voorbereiding voor één upload (file_id)."""
+
+    def __init__(self, file_id, source, session: str | None = None):
+        self.file_id = file_id
+        self._cancel = threading.Event()
+        self._state = {"status": PARSING}
+        # de thread kent alleen event + state, niet dit object: zo kan de
+        # finalizer afgaan als de sessie (en daarmee dit object) verdwijnt
+        self._thread = threading.Thread(
+            target=_run, args=(source, session, self._cancel, self._state),
+            name="pptx-speculate", daemon=True,
+        )
+        self._finalizer = weakref.finalize(self, self._cancel.set)
+        self._thread.start()
+
+    @property
+    def status(self) -> str:
+        return self._state["status"]
+
+    @property
+    def running(self) -> bool:
+        return self._thread.is_alive()
+
+    def cancel(self):
+        self._finalizer()
@@ -0,0 +1,28 @@
+"""De modules staan plat in de hoofdmap van de repo."""
+import io
+import os
+import sys
+
+import pytest
+from docx import Document
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def docx_bytes(paragraphs) -> bytes:
+    """[(stijl, tekst), ...] → .docx-bytes; onbekende stijlen worden aangemaakt."""
+    from docx.enum.style import WD_STYLE_TYPE
+
+    doc = Document()
+    for style, text in paragraphs:
+        if style not in doc.styles:
+            doc.styles.add_style(style, WD_STYLE_TYPE.PARAGRAPH)
+        doc.add_paragraph(text, style=style)
+    out = io.BytesIO()
+    doc.save(out)
+    return out.getvalue()
+
+
+@pytest.fixture
+def make_docx():
+    return docx_bytes
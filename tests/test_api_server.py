@@ -0,0 +1,120 @@
+import io
+import json
+import base64
+import threading
+import http.client
+
+import pytest
+from docx import Document
+from PIL import Image
+
+import api_server
+import workbook_stream
+
+
+@pytest.fixture(scope="module")
+def server():
+    httpd = api_server.ThreadingHTTPServer(("127.0.0.1", 0), api_server.Handler)
+    httpd.daemon_threads = True
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    yield httpd.server_address[1]
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def request(port, method, path, body=None, headers=None):
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+    conn.request(method, path, body=body, headers=headers or {})
+    resp = conn.getresponse()
+    data = resp.read()
+    conn.close()
+    return resp.status, resp.headers, data
+
+
+@pytest.fixture
+def lesson(make_docx):
+    return make_docx([("Heading 1", "Les"), ("Normal", "Tekst van de les.")])
+
+
+def test_async_cache_hit_geeft_job(server, lesson):
+    status, headers, html = request(server, "POST", "/convert/html", lesson)
+    assert status == 200
+
+    status, headers, data = request(server, "POST", "/convert/html?mode=async", lesson)
+    assert status == 202
+    job = json.loads(data)
+    assert headers["Location"] == job["status_url"]
+
+    status, _, data = request(server, "GET", job["status_url"])
+    assert json.loads(data)["status"] == "done"
+    status, _, result = request(server, "GET", job["status_url"] + "/result")
+    assert status == 200 and result == html
+
+
+def test_if_none_match_exact(server, lesson):
+    _, headers, _ = request(server, "POST", "/convert/html", lesson)
+    etag = headers["ETag"]
+    assert request(server, "POST", "/convert/html", lesson, {"If-None-Match": etag})[0] == 304
+    assert request(server, "POST", "/convert/html", lesson, {"If-None-Match": f'{etag[:-1]}-gzip"'})[0] == 304
+    assert request(server, "POST", "/convert/html", lesson, {"If-None-Match": "*"})[0] == 304
+    prefix = etag[:-6] + '"'
+    assert request(server, "POST", "/convert/html", lesson, {"If-None-Match": prefix})[0] == 200
+
+
+@pytest.mark.parametrize("body", [
+    b"{geen json",
+    json.dumps({"meta": {"logo": "@@niet-base64@@"}, "steps": []}).encode(),
+    json.dumps([1, 2]).encode(),
+])
+def test_workbook_ongeldige_invoer_is_400(server, body):
+    assert request(server, "POST", "/convert/workbook?mode=async", body)[0] == 400
+
+
+def test_ongeldige_chunk_grootte_is_400(server):
+    conn = http.client.HTTPConnection("127.0.0.1", server, timeout=30)
+    conn.putrequest("POST", "/convert/html")
+    conn.putheader("Transfer-Encoding", "chunked")
+    conn.endheaders()
+    conn.send(b"zz\r\n")
+    assert conn.getresponse().status == 400
+    conn.close()
+
+
+def test_geen_docx_is_400(server):
+    assert request(server, "POST", "/convert/html", b"dit is geen docx")[0] == 400
+    assert request(server, "POST", "/convert/pptx?mode=async", b"PK\x03\x04kapot")[0] == 400
+
+
+@pytest.mark.parametrize("spec", [
+    {"steps": [{"title": ["geen", "tekst"]}]},
+    {"steps": [{"text_blocks": [1, 2]}]},
+    {"steps": [{"images": "abc"}]},
+    {"steps": [{"images": [base64.b64encode(b"geen afbeelding").decode()]}]},
+    {"meta": {"opdracht_titel": 3}},
+    {"meta": {"materialen": ["schroef"]}},
+])
+def test_workbook_spec_typecontrole(server, spec):
+    status, _, data = request(server, "POST", "/convert/workbook", json.dumps(spec).encode())
+    assert status == 400 and json.loads(data)["error"]
+
+
+def test_onbekend_pad_sluit_verbinding(server):
+    conn = http.client.HTTPConnection("127.0.0.1", server, timeout=30)
+    conn.request("POST", "/convert/onbekend", body=b"x" * 1000)
+    resp = conn.getresponse()
+    resp.read()
+    assert resp.status == 404 and resp.headers["Connection"] == "close"
+    conn.close()
+
+
+def test_gestreamd_werkboekje_komt_van_schijf(server, monkeypatch):
+    monkeypatch.setattr(workbook_stream, "WORKBOOK_STREAM_MIN_IMAGES", 1)
+    img = io.BytesIO()
+    Image.new("RGB", (60, 40), "red").save(img, "PNG")
+    spec = {"meta": {"opdracht_titel": "Kast"},
+            "steps": [{"title": "Stap 1", "images": [base64.b64encode(img.getvalue()).decode()]}]}
+
+    status, headers, data = request(server, "POST", "/convert/workbook", json.dumps(spec).encode())
+    assert status == 200 and int(headers["Content-Length"]) == len(data)
+    assert isinstance(api_server.MANAGER.cached(headers["ETag"])[1], api_server.FileResult)
+    assert len(Document(io.BytesIO(data)).inline_shapes) == 1
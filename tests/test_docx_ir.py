@@ -0,0 +1,31 @@
+import io
+
+import pytest
+from docx import Document
+from PIL import Image
+
+from docx_ir import DocumentIR, parse_docx
+
+
+@pytest.fixture
+def ir():
+    doc = Document()
+    doc.add_paragraph("tekst")
+    img = io.BytesIO()
+    Image.new("RGB", (8, 8), "red").save(img, "PNG")
+    img.seek(0)
+    doc.add_picture(img)
+    out = io.BytesIO()
+    doc.save(out)
+    return parse_docx(out.getvalue())
+
+
+def test_afbeeldingen_alleen_lezen(ir):
+    with pytest.raises(TypeError):
+        ir.images["x"] = b""
+
+
+def test_hashbaar_en_picklebaar(ir):
+    assert hash(ir) == hash(DocumentIR.from_bytes(ir.to_bytes()))
+    assert DocumentIR.from_bytes(ir.to_bytes()) == ir
+    assert len(ir.without_images().images) == 0
@@ -0,0 +1,38 @@
+from extractive import summarize_blocks, split_sentences, DEFAULT_CHECK, EMPTY_LINES
+
+
+BLOCK = {
+    "title": "De standleiding aansluiten",
+    "body": (
+        "Eerst zaag je de standleiding recht af op de juiste lengte. "
+        "Daarna ontbraam je de standleiding aan de binnenkant en de buitenkant. "
+        "Men controleert of de mof schoon en droog is voordat je lijmt. "
+        "Daarna ontbraam je de standleiding aan de binnenkant en de buitenkant. "
+        "Het weer is vandaag mooi."
+    ),
+}
+
+
+def test_zinnen_splitsen():
+    assert split_sentences("Eén. Twee!\nDrie?  ") == ["Eén", "Twee", "Drie"]
+
+
+def test_samenvatting_per_blok():
+    [summary] = summarize_blocks([BLOCK], max_lines=3)
+    assert summary.title == "De standleiding aansluiten"
+    assert len(summary.lines) == 3
+    assert len(set(summary.lines)) == 3                     # MMR: geen dubbele regels
+    assert "Het weer is vandaag mooi" not in summary.lines
+    assert any(line.startswith("Je controleert") for line in summary.lines)   # "Men" → "Je"
+    assert "standleiding" in summary.check
+    assert 0 < summary.score <= 1
+
+
+def test_leeg_blok_geeft_vaste_dia():
+    summaries = summarize_blocks([{"title": "", "body": ""}, BLOCK])
+    assert summaries[0].lines == EMPTY_LINES and summaries[0].check == DEFAULT_CHECK
+    assert summaries[0].score == 0.0 and summaries[1].score > 0
+
+
+def test_geen_blokken():
+    assert summarize_blocks([]) == []
@@ -0,0 +1,40 @@
+import io
+import zipfile
+
+from html_bulk import collect_items, convert_to_zip
+
+
+def zip_bytes(files: dict) -> bytes:
+    buf = io.BytesIO()
+    with zipfile.ZipFile(buf, "w") as zf:
+        for name, data in files.items():
+            zf.writestr(name, data)
+    return buf.getvalue()
+
+
+def test_paden_blijven_binnen_de_zip():
+    module = zip_bytes({
+        "../../etc/les.docx": b"a",
+        "/abs/les.docx": b"b",
+        "map/../../les.docx": b"c",
+        "map\\sub\\les2.docx": b"d",
+    })
+    names = [item.name for item in collect_items([("module.zip", module)])]
+    assert names == ["etc/les.docx", "abs/les.docx", "les.docx", "map/sub/les2.docx"]
+    assert all(not n.startswith("/") and ".." not in n.split("/") for n in names)
+
+
+def test_dubbele_namen_en_rommel(make_docx):
+    module = zip_bytes({
+        "les.docx": b"a", "./les.docx": b"b", "~$les.docx": b"x", "__MACOSX/._les.docx": b"x",
+    })
+    names = [item.name for item in collect_items([("module.zip", module), ("les.docx", b"c")])]
+    assert names == ["les.docx", "les (2).docx", "les (3).docx"]
+
+
+def test_convert_to_zip(make_docx):
+    lesson = make_docx([("Heading 1", "Les"), ("Normal", "Tekst.")])
+    data, items = convert_to_zip([("module.zip", zip_bytes({"../les.docx": lesson})), ("kapot.docx", b"geen")])
+    assert [item.status for item in items] == ["klaar", "fout"]
+    with zipfile.ZipFile(io.BytesIO(data)) as zf:
+        assert sorted(zf.namelist()) == ["les.html", "manifest.json"]
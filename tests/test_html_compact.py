@@ -0,0 +1,34 @@
+import gzip
+
+from html_compact import hoist_inline_styles, compact_html, precompress, build_output
+
+
+def test_herhaalde_stijl_wordt_klasse():
+    html = ('<style>p{}</style><p style="color: red;">a</p><p style="color:red">b</p>'
+            '<p style="color:blue">c</p>')
+    out = hoist_inline_styles(html)
+    assert out.count('class="s0"') == 2
+    assert ".s0{color:red}" in out
+    assert 'style="color:blue"' in out          # uniek: blijft inline
+
+
+def test_bestaande_klasse_wordt_aangevuld():
+    html = '<p class="les" style="margin:0">a</p><p style="margin:0">b</p>'
+    out = hoist_inline_styles(html)
+    assert 'class="les s0"' in out and out.startswith("<style>.s0{margin:0}</style>")
+
+
+def test_compact_html_haalt_witruimte_weg():
+    html = "<style>\n  p { color : red ; }\n</style>\n<div>\n  <p>tekst</p>\n</div>\n"
+    assert compact_html(html) == "<style>p{color:red}</style><div><p>tekst</p></div>"
+
+
+def test_precompress_en_rapport():
+    html = "<div>\n" + "<p style='x'>herhaald</p>\n" * 200 + "</div>"
+    assert gzip.decompress(precompress(html.encode())["gzip"]) == html.encode()
+
+    output = build_output(html)
+    report = output.report()
+    assert report["origineel"]["bytes"] == len(html.encode())
+    assert report["compact"]["bytes"] < report["origineel"]["bytes"]
+    assert report["gzip"]["besparing_pct"] > 90
@@ -0,0 +1,18 @@
+from docx_ir import parse_docx
+from html_converter import split_sections
+
+
+def test_split_sections_alleen_op_kop_1(make_docx):
+    data = make_docx([
+        ("Normal", "intro"),
+        ("Heading 1", "Eerste"),
+        ("Heading 4", "Sub"),
+        ("Kop 5", "Nog dieper"),
+        ("Heading 10", "Heel diep"),
+        ("Kop 1", "Tweede"),
+        ("Normal", "tekst"),
+    ])
+    intro, sections = split_sections(parse_docx(data))
+    assert [p.text for p in intro] == ["intro"]
+    assert [title for title, _ in sections] == ["Eerste", "Tweede"]
+    assert len(sections[0][1]) == 4
@@ -0,0 +1,34 @@
+import base64
+import re
+from html import unescape
+
+from html_preview import build_preview, elide_data_uris, paginate
+
+
+def frame_page(src: str) -> str:
+    prefix = "data:text/html;base64,"
+    assert src.startswith(prefix)
+    return base64.b64decode(src[len(prefix):]).decode("utf-8")
+
+
+def test_voorvertoning_in_sandbox():
+    html = '<html><head></head><body><p>Les</p><script>alert("x")</script></body></html>'
+    page = frame_page(build_preview(html).src)
+    frame = re.search(r'<iframe sandbox="" srcdoc="([^"]*)"', page)
+    assert frame and "<script>" not in page.replace(frame.group(1), "")
+    inner = unescape(frame.group(1))
+    assert "<p>Les</p>" in inner and "script-src 'none'" in inner
+
+
+def test_grote_voorvertoning_zonder_afbeeldingen():
+    img = "data:image/png;base64," + "A" * 5000
+    preview = build_preview(f'<p><img src="{img}"></p>' * 3, max_bytes=1000)
+    assert preview.images_replaced and img not in preview.html
+    assert preview.data_uris == 3
+
+
+def test_broncode_ingekort_en_gepagineerd():
+    source, count, chars = elide_data_uris('<img src="data:image/png;base64,' + "A" * 4096 + '">')
+    assert count == 1 and chars == 4096 and "[4 KB]" in source
+    pages = paginate("\n".join(f"<p>{i}</p>" for i in range(100)), page_chars=100)
+    assert len(pages) > 1 and all(len(p) <= 100 for p in pages)
@@ -0,0 +1,53 @@
+import io
+
+from PIL import Image
+
+import image_prep
+
+
+def _image(size, fmt="JPEG", mode="RGB", exif_orientation=None) -> bytes:
+    out = io.BytesIO()
+    im = Image.new(mode, size, "red")
+    kwargs = {}
+    if exif_orientation:
+        exif = Image.Exif()
+        exif[image_prep.EXIF_ORIENTATION] = exif_orientation
+        kwargs["exif"] = exif
+    im.save(out, fmt, **kwargs)
+    return out.getvalue()
+
+
+def _size(data: bytes):
+    with Image.open(io.BytesIO(data)) as im:
+        return im.format, im.size
+
+
+def test_grote_foto_verkleind_tot_doel_dpi():
+    out = image_prep.normalize_image(_image((3000, 2000)), width_in=2.0, dpi=100, cache=False)
+    assert _size(out) == ("JPEG", (200, 133))
+
+
+def test_kleine_afbeelding_blijft_origineel():
+    data = _image((50, 50), "PNG")
+    assert image_prep.normalize_image(data, width_in=2.0, dpi=100, cache=False) is data
+
+
+def test_exif_orientatie_toegepast():
+    data = _image((80, 40), exif_orientation=6)   # 90° gedraaid
+    assert _size(image_prep.normalize_image(data, width_in=4.0, dpi=100, cache=False))[1] == (40, 80)
+
+
+def test_transparantie_blijft_png():
+    out = image_prep.normalize_image(_image((1000, 500), "PNG", "RGBA"), width_in=1.0, dpi=100, cache=False)
+    assert _size(out) == ("PNG", (100, 50))
+
+
+def test_geen_afbeelding_geeft_origineel_terug():
+    assert image_prep.normalize_image(b"geen plaatje", 1.0, cache=False) == b"geen plaatje"
+
+
+def test_iter_normalized_houdt_volgorde():
+    jobs = [(_image((400 + i * 100, 100)), 1.0) for i in range(6)]
+    out = list(image_prep.iter_normalized(iter(jobs), dpi=100))
+    assert [_size(d)[1][0] for d in out] == [100] * 6
+    assert [_size(d)[1][1] for d in out] == [round(100 * 100 / (400 + i * 100)) for i in range(6)]
@@ -0,0 +1,74 @@
+import io
+import json
+import os
+
+import pytest
+
+import lesson_from_docx as lesson
+
+
+@pytest.fixture
+def lesson_docx(make_docx):
+    return lambda: io.BytesIO(make_docx([
+        ("Heading 1", "Zagen"), ("Normal", "Je zaagt de plank op maat."),
+        ("Heading 1", "Schuren"), ("Normal", "Je schuurt de randen glad."),
+    ]))
+
+
+def _result(custom_id, content):
+    body = {"choices": [{"message": {"content": content}}]}
+    return {"custom_id": custom_id, "response": {"status_code": 200, "body": body}, "error": None}
+
+
+def _slide(title):
+    return json.dumps({"title": title, "text": ["regel"], "check": "vraag?"})
+
+
+def test_prepare_hervat_zonder_dubbele_regels(tmp_path, lesson_docx):
+    status = lesson.prepare_batch({"a": lesson_docx(), "kapot": io.BytesIO(b"geen docx")}, tmp_path)
+    assert status["docs"]["kapot"]["status"] == "failed"
+
+    # crash na het schrijven van de regels, vóór de status van "a"
+    status["docs"].pop("a")
+    lesson._save_batch_status(tmp_path, status)
+    status = lesson.prepare_batch({"a": lesson_docx(), "kapot": lesson_docx()}, tmp_path)
+
+    assert {d["status"] for d in status["docs"].values()} == {"prepared"}
+    ids = [r["custom_id"] for r in lesson._read_jsonl(os.path.join(tmp_path, "requests.jsonl"))]
+    assert sorted(ids) == ["a::1", "a::2", "kapot::1", "kapot::2"]
+
+
+def test_prepare_na_indienen_geweigerd(tmp_path, lesson_docx):
+    status = lesson.prepare_batch({"a": lesson_docx()}, tmp_path)
+    status["batch_id"] = "batch_1"
+    lesson._save_batch_status(tmp_path, status)
+    with pytest.raises(RuntimeError):
+        lesson.prepare_batch({"b": lesson_docx()}, tmp_path)
+
+
+def test_assemble_met_afgebroken_regel_en_leeg_antwoord(tmp_path, lesson_docx):
+    lesson.prepare_batch({"a": lesson_docx(), "b": lesson_docx()}, tmp_path)
+    lines = [
+        _result("a::1", _slide("Zagen")),
+        _result("a::2", _slide("Schuren")),
+        _result("b::1", None),
+        _result("b::2", _slide("Schuren")),
+    ]
+    with open(os.path.join(tmp_path, "results.jsonl"), "w", encoding="utf-8") as f:
+        f.write("".join(json.dumps(r) + "\n" for r in lines))
+        f.write('{"custom_id": "b::1", "resp')   # crash midden in een regel
+
+    status = lesson.assemble_batch(tmp_path)
+    assert status["docs"]["a"]["status"] == "done"
+    assert os.path.exists(status["docs"]["a"]["output"])
+    assert status["docs"]["b"]["status"] == "incomplete"
+    assert status["docs"]["b"]["errors"] == ["onderdeel 1: leeg antwoord"]
+
+
+def test_afgebroken_regel_wordt_weggeknipt(tmp_path):
+    path = os.path.join(tmp_path, "results.jsonl")
+    with open(path, "w", encoding="utf-8") as f:
+        f.write('{"custom_id": "a::1"}\n{"custom_id": "a::2", "resp')
+    lesson._truncate_partial_line(path)
+    with open(path, encoding="utf-8") as f:
+        assert f.read() == '{"custom_id": "a::1"}\n'
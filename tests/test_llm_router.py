@@ -0,0 +1,79 @@
+import json
+
+import pytest
+
+import llm_router
+import llm_scheduler
+from llm_client import LLMError
+from llm_router import Endpoint, LLMRouter
+
+
+class FakeClient:
+    provider, base_url = "OLLAMA", "http://test"
+
+    def __init__(self, model: str, fail: bool = False):
+        self.model = model
+        self.fail = fail
+        self.calls = 0
+
+    def chat_json(self, user_prompt, system_prompt=None):
+        self.calls += 1
+        if self.fail:
+            raise LLMError("stuk")
+        return json.dumps({"model": self.model})
+
+
+@pytest.fixture(autouse=True)
+def fresh_scheduler(monkeypatch):
+    monkeypatch.setattr(llm_scheduler, "_scheduler", None)
+
+
+def test_klein_endpoint_alleen_voor_kleine_invoer():
+    klein = Endpoint("klein", FakeClient("k"), max_tokens=10)
+    groot = Endpoint("groot", FakeClient("g"))
+    router = LLMRouter([klein, groot])
+    assert router.candidates(5)[0] in (klein, groot)
+    assert router.candidates(1000) == [groot]
+
+
+def test_failover_en_cooldown(monkeypatch):
+    monkeypatch.setattr(llm_router, "MAX_FAILS", 2)
+    stuk = Endpoint("stuk", FakeClient("s", fail=True))
+    goed = Endpoint("goed", FakeClient("g"))
+    router = LLMRouter([stuk, goed])
+
+    for _ in range(2):
+        assert json.loads(router.chat_json("vraag"))["model"] == "g"
+    assert [(d["endpoint"], d["reason"]) for d in router.decisions] == [
+        ("stuk", "voorkeur"), ("goed", "failover"), ("goed", "voorkeur"),
+    ]
+
+    stuk.record(False, 1.0, 10)
+    assert not stuk.available(llm_router.time.monotonic())   # tweede fout op rij → cooldown
+
+
+def test_alles_faalt_geeft_llm_error():
+    router = LLMRouter([Endpoint("a", FakeClient("a", fail=True))])
+    with pytest.raises(LLMError):
+        router.chat_json("vraag")
+
+
+def test_pool_bepaalt_scheduler_capaciteit(monkeypatch):
+    pool = [{"name": "a", "concurrency": 2}, {"name": "b", "concurrency": 3}, {"name": "c"}]
+    monkeypatch.setenv("LLM_POOL", json.dumps(pool))
+    monkeypatch.delenv("LLM_POOL_FILE", raising=False)
+    monkeypatch.delenv("LLM_MAX_CONCURRENCY", raising=False)
+    monkeypatch.setattr(llm_router, "_router", None)
+
+    assert llm_router.get_router().capacity == 6
+    assert llm_scheduler.get_scheduler().capacity == 6
+
+
+def test_llm_max_concurrency_gaat_voor(monkeypatch):
+    monkeypatch.setenv("LLM_POOL", json.dumps([{"name": "a", "concurrency": 4}]))
+    monkeypatch.delenv("LLM_POOL_FILE", raising=False)
+    monkeypatch.setenv("LLM_MAX_CONCURRENCY", "1")
+    monkeypatch.setattr(llm_router, "_router", None)
+
+    llm_router.get_router()
+    assert llm_scheduler.get_scheduler().capacity == llm_scheduler.LLM_MAX_CONCURRENCY
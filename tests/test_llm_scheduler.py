@@ -0,0 +1,35 @@
+import threading
+import time
+
+from llm_scheduler import FairScheduler
+
+
+def test_sessies_worden_vergeten():
+    scheduler = FairScheduler(capacity=1)
+    for i in range(100):
+        with scheduler.slot(cost=10, tenant_name=f"sessie-{i}"):
+            pass
+    assert scheduler._last_finish == {}
+    assert scheduler._queues == {}
+
+
+def test_kleine_vraag_gaat_voor_grote_batches():
+    scheduler = FairScheduler(capacity=1)
+    order = []
+    blocker = scheduler.acquire(1, "bezet")
+
+    def run(name, cost):
+        with scheduler.slot(cost, name):
+            order.append(name)
+
+    threads = [threading.Thread(target=run, args=("groot", 1000)) for _ in range(4)]
+    for t in threads:
+        t.start()
+        time.sleep(0.02)
+    small = threading.Thread(target=run, args=("klein", 100))
+    small.start()
+    time.sleep(0.05)
+    scheduler.release(blocker)
+    for t in threads + [small]:
+        t.join(5)
+    assert order.index("klein") <= 1
@@ -0,0 +1,53 @@
+import io
+
+from PIL import Image
+from pptx import Presentation
+from pptx.util import Inches
+from pptx.enum.shapes import MSO_SHAPE_TYPE
+
+import pptx_converter_hybrid
+from pptx_slim import add_logo_to_layout, slim_presentation
+
+
+def png(size=(2000, 1000)) -> bytes:
+    buf = io.BytesIO()
+    Image.effect_noise(size, 40).convert("RGB").save(buf, "PNG")
+    return buf.getvalue()
+
+
+def test_logo_staat_een_keer_op_de_layout():
+    prs = Presentation()
+    layout = prs.slide_layouts[1]
+    slides = [prs.slides.add_slide(layout) for _ in range(3)]
+    add_logo_to_layout(layout, png((200, 100)), Inches(7.5), Inches(0.2), Inches(1.5))
+    assert sum(s.shape_type == MSO_SHAPE_TYPE.PICTURE for s in layout.shapes) == 1
+    assert all(not any(s.shape_type == MSO_SHAPE_TYPE.PICTURE for s in slide.shapes) for slide in slides)
+
+
+def test_slim_verwijdert_layouts_en_verkleint_afbeeldingen():
+    prs = Presentation()
+    slide = prs.slides.add_slide(prs.slide_layouts[6])
+    big = png()
+    slide.shapes.add_picture(io.BytesIO(big), 0, 0, width=Inches(2))
+
+    report = slim_presentation(prs, dpi=100)
+    assert report["layouts_removed"] == 10
+    assert report["image_bytes_saved"] > 0
+
+    out = io.BytesIO()
+    prs.save(out)
+    reopened = Presentation(io.BytesIO(out.getvalue()))
+    assert len(reopened.slide_layouts) == 1
+    pic = next(s for s in reopened.slides[0].shapes if s.shape_type == MSO_SHAPE_TYPE.PICTURE)
+    assert pic.image.size[0] <= 200
+
+
+def test_dia_kopie_houdt_layout_van_eerste_dia():
+    prs = Presentation()
+    first = prs.slides.add_slide(prs.slide_layouts[5])
+    copy = pptx_converter_hybrid.duplicate_slide_clean(prs, 0)
+    assert copy.slide_layout == first.slide_layout
+
+
+def test_lokaal_logo_bestaat():
+    assert pptx_converter_hybrid.get_logo_bytes()
@@ -0,0 +1,61 @@
+import gc
+import io
+import os
+
+from upload_store import UploadStore
+
+
+class Upload(io.BytesIO):
+    def __init__(self, data: bytes, file_id: str, name: str = "les.docx"):
+        super().__init__(data)
+        self.file_id = file_id
+        self.name = name
+        self.size = len(data)
+
+
+def test_kleine_upload_deelt_de_buffer():
+    data = bytes(1000)
+    upload = Upload(data, "a")
+    handle = UploadStore(threshold=10_000).put("k", upload)
+    assert handle.in_memory and handle.read_bytes() is upload.getvalue()
+
+
+def test_zelfde_upload_wordt_niet_opnieuw_ingelezen():
+    store = UploadStore()
+    upload = Upload(b"abc", "a")
+    assert store.put("k", upload) is store.put("k", upload)
+
+
+def test_grote_upload_gaat_naar_schijf_en_blijft_leesbaar_na_sluiten():
+    store = UploadStore(threshold=10)
+    handle = store.put("k", Upload(b"x" * 100, "a"))
+    assert not handle.in_memory and os.path.exists(handle._path)
+
+    store.close()
+    del store
+    gc.collect()
+    assert handle.read_bytes() == b"x" * 100   # lopende conversie leest gewoon door
+
+    path, directory = handle._path, os.path.dirname(handle._path)
+    del handle
+    gc.collect()
+    assert not os.path.exists(path) and not os.path.exists(directory)
+
+
+def test_budget_verplaatst_oudste_naar_schijf():
+    store = UploadStore(budget=150, threshold=1000)
+    first = store.put("a", Upload(b"1" * 100, "a"))
+    second = store.put("b", Upload(b"2" * 100, "b"))
+    assert not first.in_memory and second.in_memory
+    assert first.read_bytes() == b"1" * 100
+
+
+def test_discard_vergeet_de_upload():
+    store = UploadStore(threshold=10)
+    handle = store.put("k", Upload(b"x" * 100, "a"))
+    path = handle._path
+    store.discard("k")
+    assert store.get("k") is None and os.path.exists(path)
+    del handle
+    gc.collect()
+    assert not os.path.exists(path)
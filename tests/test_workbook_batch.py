@@ -0,0 +1,39 @@
+import json
+import zipfile
+
+from docx import Document
+from PIL import Image
+
+import workbook_batch
+
+
+def test_batch_met_ontbrekende_bestanden(tmp_path):
+    Image.new("RGB", (1200, 800), "red").save(tmp_path / "foto.jpg")
+    (tmp_path / "kast.csv").write_text("Benaming;Aantal\nplank;2\n", encoding="utf-8")
+    spec = {
+        "defaults": {"vak": "BWI"},
+        "workbooks": [
+            {"name": "kast", "meta": {"opdracht_titel": "Kast", "include_materiaalstaat": True,
+                                      "materialen_file": "kast.csv", "cover": "foto.jpg"},
+             "pages": [{"title": "Stap 1", "text": "Zagen.", "images": ["foto.jpg"]}]},
+            {"name": "geen-csv", "meta": {"materialen_file": "weg.csv"}, "pages": []},
+            {"name": "geen-foto", "pages": [{"title": "Stap", "images": ["weg.jpg"]}]},
+        ],
+    }
+    spec_path = tmp_path / "spec.json"
+    spec_path.write_text(json.dumps(spec), encoding="utf-8")
+    out = tmp_path / "uit.zip"
+
+    manifest = workbook_batch.build_batch(str(spec_path), str(out), workers=1)
+
+    by_name = {r["name"]: r for r in manifest["workbooks"]}
+    assert "error" not in by_name["kast"]
+    assert "materiaalstaat" in by_name["geen-csv"]["error"]
+    assert "weg.jpg" in by_name["geen-foto"]["error"]
+    assert manifest["failed"] == 2
+
+    with zipfile.ZipFile(out) as zf:
+        assert sorted(zf.namelist()) == ["kast.docx", "manifest.json"]
+        doc = Document(zf.open("kast.docx"))
+    assert doc.tables[-1].rows[1].cells[2].text == "plank"
+    assert len(doc.inline_shapes) == 2
@@ -0,0 +1,82 @@
+import pytest
+from docx import Document
+
+import workbook_builder as wb
+
+
+# ---------- zonder de benoemde werkboekstijlen ----------
+def test_p_op_gewoon_document():
+    doc = Document()
+    p = wb._p(doc, "x", size=11)
+    run = p.runs[0]
+    assert run.font.name == "Arial"
+    assert run.font.size.pt == 11
+
+
+def test_p_normal_op_gewoon_document_is_arial():
+    run = wb._p(Document(), "x").runs[0]
+    assert run.font.name == "Arial" and run.font.size.pt == 12
+
+
+def test_p_gebruikt_stijl_in_werkboekdocument():
+    doc = wb.new_workbook_document()
+    assert wb._p(doc, "x", size=11).style.name == "WB Tekst"
+    assert wb._p(doc, "x").style.name == "Normal"
+
+
+def test_materiaalstaat_op_gewoon_document():
+    doc = Document()
+    wb.add_materiaalstaat_page(doc, [{"Benaming": "plank"}])
+    header = doc.tables[-1].rows[0].cells[0].paragraphs[0].runs[0]
+    assert header.bold and header.font.name == "Arial" and header.font.size.pt == 12
+
+
+def test_naam_klas_tabel_in_arial():
+    doc = Document()
+    wb.add_cover_page(doc, opdracht_titel="Kast", vak="BWI", profieldeel="", docent="", duur="")
+    run = doc.tables[-1].rows[0].cells[0].paragraphs[0].runs[0]
+    assert run.text == "Naam:" and run.font.name == "Arial" and run.font.size.pt == 12
+
+
+# ---------- read_materiaalstaat ----------
+def test_csv_utf8_met_kop():
+    rows = wb.read_materiaalstaat("m.csv", "Benaming;Aantal\nplank;2\n".encode("utf-8-sig"))
+    assert rows == [{**{c: "" for c in wb.MATERIAAL_COLS}, "Benaming": "plank", "Aantal": "2"}]
+
+
+def test_csv_zonder_kop_volgt_kolomvolgorde():
+    rows = wb.read_materiaalstaat("m.csv", b"1,4,plank\n")
+    assert (rows[0]["Nummer"], rows[0]["Aantal"], rows[0]["Benaming"]) == ("1", "4", "plank")
+
+
+def test_csv_cp1252():
+    rows = wb.read_materiaalstaat("m.csv", "Benaming\nbeukenhout café\n".encode("cp1252"))
+    assert rows[0]["Benaming"] == "beukenhout café"
+
+
+def test_csv_onbekende_bytes_geeft_geen_unboundlocalerror():
+    rows = wb.read_materiaalstaat("m.csv", b"Benaming\n\x81\x8d\n")
+    assert rows[0]["Benaming"] == "��"
+
+
+def test_stuurtekens_worden_verwijderd():
+    rows = wb.read_materiaalstaat("m.csv", b"Benaming;Aantal\nplank\x01;2\x0b\n")
+    assert rows[0]["Benaming"] == "plank"
+    assert rows[0]["Aantal"] == "2"
+
+
+def test_xlsx(tmp_path):
+    openpyxl = pytest.importorskip("openpyxl")
+    book = openpyxl.Workbook()
+    book.active.append(["Benaming", "Lengte"])
+    book.active.append(["plank", 120])
+    path = tmp_path / "m.xlsx"
+    book.save(path)
+    rows = wb.read_materiaalstaat("m.xlsx", path.read_bytes())
+    assert (rows[0]["Benaming"], rows[0]["Lengte"]) == ("plank", "120")
+
+
+def test_materiaalstaat_met_stuurteken_in_cel():
+    doc = wb.new_workbook_document()
+    wb.add_materiaalstaat_page(doc, [{"Benaming": "a\x01b"}])
+    assert doc.tables[-1].rows[1].cells[2].text == "ab"
@@ -0,0 +1,44 @@
+import io
+
+from docx import Document
+from PIL import Image
+
+import workbook_stream
+from workbook_builder import build_workbook_docx_front_and_steps
+
+
+def jpeg(color="red") -> bytes:
+    buf = io.BytesIO()
+    Image.new("RGB", (400, 300), color).save(buf, "JPEG")
+    return buf.getvalue()
+
+
+META = {"opdracht_titel": "Kast\x01bouwen", "vak": "BWI", "docent": "Jansen\x0b", "duur": "2 x 45 min",
+        "include_materiaalstaat": True, "materialen": [{"Benaming": "plank\x02"}]}
+STEPS = [
+    {"title": "Stap\x07 1", "text_blocks": ["Zaag\x1f de plank.", "Schuur de randen."], "images": [jpeg()]},
+    {"title": "Stap 2", "text_blocks": ["Lijm & schroef."], "images": [jpeg("blue"), jpeg("green")]},
+]
+
+
+def texts(doc) -> list[str]:
+    return [p.text for p in doc.paragraphs if p.text.strip()]
+
+
+def test_stuurtekens_geven_geldig_document():
+    out = io.BytesIO()
+    workbook_stream.write_workbook_docx(dict(META), STEPS, out)
+    doc = Document(io.BytesIO(out.getvalue()))
+    assert "Kastbouwen" in texts(doc)
+    assert "Stap 1" in texts(doc) and "Zaag de plank." in texts(doc)
+    assert len(doc.inline_shapes) == 3
+
+
+def test_zelfde_inhoud_als_dom_builder():
+    out = io.BytesIO()
+    workbook_stream.write_workbook_docx(dict(META), STEPS, out)
+    streamed = Document(io.BytesIO(out.getvalue()))
+    built = Document(build_workbook_docx_front_and_steps(dict(META), STEPS))
+    assert texts(streamed) == texts(built)
+    assert len(streamed.inline_shapes) == len(built.inline_shapes)
+    assert [c.text for c in streamed.tables[-1].rows[1].cells] == [c.text for c in built.tables[-1].rows[1].cells]
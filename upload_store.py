@@ -0,0 +1,169 @@
+"""
+Opslag van uploads per sessie, met een geheugenbudget.
+
+Van kleine uploads houden we alleen een verwijzing naar de buffer die
+Streamlit al heeft (getvalue() kopieert niet); grote gaan in stukken naar een
+tijdelijk bestand. Komt een sessie boven zijn budget, dan worden de oudste
+uploads naar schijf verplaatst. Converters krijgen een UploadHandle (met
+read_bytes()/open()) in plaats van losse bytes-kopieën.
+Elk bestand hoort bij zijn handle: een vervangen of vergeten upload verdwijnt
+pas als niemand de handle meer vasthoudt, zodat een conversie die nog loopt
+(bv. speculatief werk of een bulkjob) hem gewoon kan uitlezen. De map zelf
+verdwijnt als de store (= de sessie) en al zijn handles weg zijn.
+"""
+import io
+import os
+import shutil
+import hashlib
+import tempfile
+import threading
+import weakref
+from collections import OrderedDict
+
+SPOOL_THRESHOLD = int(float(os.getenv("UPLOAD_SPOOL_THRESHOLD_MB", "2")) * 1024 * 1024)
+SESSION_BUDGET = int(float(os.getenv("UPLOAD_SESSION_BUDGET_MB", "64")) * 1024 * 1024)
+CHUNK = 1024 * 1024
+
+
+def _remove_file(path: str):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+class _TempDir:
+    """Tijdelijke map; weg zodra niemand (store of handle) er nog naar verwijst."""
+
+    def __init__(self):
+        self.path = tempfile.mkdtemp(prefix="triade-uploads-")
+        self._cleanup = weakref.finalize(self, shutil.rmtree, self.path, True)
+
+
+class UploadHandle:
+    """Verwijzing naar één upload; inhoud in het geheugen of op schijf."""
+
+    def __init__(self, name: str, file_id, data: bytes = None, path: str = None, size: int = 0,
+                 sha256: str = "", directory: _TempDir = None):
+        self.name = name
+        self.file_id = file_id
+        self.size = size
+        self.sha256 = sha256
+        self._data = data
+        self._path = path
+        self._dir = directory      # houdt de map in leven zolang dit bestand bestaat
+        self._cleanup = weakref.finalize(self, _remove_file, path) if path else None
+
+    @property
+    def in_memory(self) -> bool:
+        return self._data is not None
+
+    def read_bytes(self) -> bytes:
+        if self._data is not None:
+            return self._data
+        with open(self._path, "rb") as f:
+            return f.read()
+
+    def open(self):
+        if self._data is not None:
+            return io.BytesIO(self._data)
+        return open(self._path, "rb")
+
+    def _spill(self, directory: _TempDir):
+        if self._data is None:
+            return
+        fd, path = tempfile.mkstemp(dir=directory.path)
+        with os.fdopen(fd, "wb") as f:
+            f.write(self._data)
+        self._path, self._data, self._dir = path, None, directory
+        self._cleanup = weakref.finalize(self, _remove_file, path)
+
+    def __repr__(self):
+        where = "geheugen" if self.in_memory else "schijf"
+        return f"<UploadHandle {self.name!r} {self.size} B ({where})>"
+
+
+class UploadStore:
+    """
+    Uploads per widget-key. Dezelfde upload (zelfde file_id) opnieuw aanbieden
+    bij een rerun kopieert niets; een nieuwe upload vervangt de oude.
+    """
+
+    def __init__(self, budget: int = SESSION_BUDGET, threshold: int = SPOOL_THRESHOLD):
+        self.budget = budget
+        self.threshold = threshold
+        self._dir = _TempDir()
+        self._handles: "OrderedDict[str, UploadHandle]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def memory_used(self) -> int:
+        return sum(h.size for h in self._handles.values() if h.in_memory)
+
+    def put(self, key: str, uploaded) -> UploadHandle:
+        """uploaded: Streamlit UploadedFile (of ander file-object met .name)."""
+        file_id = getattr(uploaded, "file_id", None) or id(uploaded)
+        with self._lock:
+            current = self._handles.get(key)
+            if current is not None and current.file_id == file_id:
+                self._handles.move_to_end(key)
+                return current
+
+            # de oude handle wordt niet gewist; zie _remove_file/finalize
+            handle = self._ingest(getattr(uploaded, "name", key), file_id, uploaded)
+            self._handles[key] = handle
+            self._enforce_budget()
+            return handle
+
+    def get(self, key: str):
+        with self._lock:
+            return self._handles.get(key)
+
+    def keys(self) -> list[str]:
+        with self._lock:
+            return list(self._handles)
+
+    def discard(self, key: str):
+        """Vergeet de upload; het bestand verdwijnt zodra geen lezer de handle meer heeft."""
+        with self._lock:
+            self._handles.pop(key, None)
+
+    def close(self):
+        """Vergeet alle uploads; bestanden die een lopende conversie nog leest blijven tot die klaar is."""
+        with self._lock:
+            self._handles.clear()
+
+    # -- intern --
+    def _ingest(self, name: str, file_id, uploaded) -> UploadHandle:
+        if hasattr(uploaded, "seek"):
+            uploaded.seek(0)
+        size = getattr(uploaded, "size", None)
+        digest = hashlib.sha256()
+
+        if size is not None and size <= self.threshold:
+            # BytesIO (zoals Streamlits UploadedFile) deelt zijn buffer via getvalue()
+            data = uploaded.getvalue() if hasattr(uploaded, "getvalue") else uploaded.read()
+            digest.update(data)
+            return UploadHandle(name, file_id, data=data, size=len(data), sha256=digest.hexdigest())
+
+        # groot of onbekend: in stukken naar schijf
+        fd, path = tempfile.mkstemp(dir=self._dir.path)
+        total = 0
+        with os.fdopen(fd, "wb") as f:
+            while True:
+                chunk = uploaded.read(CHUNK)
+                if not chunk:
+                    break
+                digest.update(chunk)
+                f.write(chunk)
+                total += len(chunk)
+        return UploadHandle(name, file_id, path=path, size=total, sha256=digest.hexdigest(), directory=self._dir)
+
+    def _enforce_budget(self):
+        used = self.memory_used
+        for handle in self._handles.values():
+            if used <= self.budget:
+                break
+            if handle.in_memory:
+                used -= handle.size
+                handle._spill(self._dir)
@@ -0,0 +1,290 @@
+"""
+Werkboekjes in bulk maken vanuit een specificatiebestand (JSON of YAML).
+
+Voorbeeld (paden zijn relatief aan het specbestand):
+
+{
+  "defaults": {"vak": "BWI", "duur": "11 x 45 minuten", "docent": "J. de Vries"},
+  "workbooks": [
+    {
+      "name": "3A-kast",
+      "meta": {"opdracht_titel": "Kast", "profieldeel": "Hout", "cover": "fotos/kast.jpg",
+               "include_materiaalstaat": true, "materialen_file": "kast.csv"},
+      "pages": [
+        {"title": "Werktekening", "images": ["tekeningen/kast.png"]},
+        {"title": "Stap 1", "text": "Zaag de planken op lengte.", "images": ["fotos/zagen.jpg"]}
+      ]
+    }
+  ]
+}
+
+Gebruik:  python workbook_batch.py spec.json -o werkboekjes.zip [--workers 4]
+
+Elke afbeelding wordt voor de hele batch één keer geladen en genormaliseerd;
+de werkboekjes zelf worden parallel in een process pool gebouwd en direct
+naar schijf gestreamd (workbook_stream). De ZIP bevat
+alle .docx-bestanden plus manifest.json met tijden per werkboekje.
+Een ontbrekend bestand (materiaalstaat of afbeelding) laat alleen dat
+werkboekje mislukken; de fout staat in het manifest.
+"""
+import os
+import re
+import json
+import time
+import shutil
+import zipfile
+import tempfile
+import hashlib
+from concurrent.futures import ProcessPoolExecutor
+
+try:
+    import yaml
+except Exception:
+    yaml = None
+
+import image_prep
+from workbook_stream import write_workbook_docx
+from workbook_builder import (
+    read_materiaalstaat,
+    LOGO_WIDTH_IN,
+    COVER_WIDTH_IN,
+    STEP_IMAGE_WIDTH_IN,
+)
+
+DEFAULT_LOGO = os.path.join(os.path.dirname(os.path.abspath(__file__)), "assets", "logo-triade-460px.png")
+DEFAULT_WORKERS = int(os.getenv("WORKBOOK_BATCH_WORKERS", str(os.cpu_count() or 1)))
+
+
+# ---------- Spec inlezen ----------
+def load_spec(path: str) -> dict:
+    with open(path, "r", encoding="utf-8") as f:
+        if path.lower().endswith((".yaml", ".yml")):
+            if yaml is None:
+                raise RuntimeError("YAML-spec vereist het pakket 'pyyaml'.")
+            spec = yaml.safe_load(f)
+        else:
+            spec = json.load(f)
+
+    if not isinstance(spec, dict) or not isinstance(spec.get("workbooks"), list):
+        raise ValueError("Spec moet een object met een 'workbooks'-lijst zijn.")
+    return spec
+
+
+def _safe_name(name: str) -> str:
+    return re.sub(r"[^\w.-]+", "_", name).strip("._") or "werkboekje"
+
+
+def _resolve(base_dir: str, path):
+    if not path:
+        return None
+    return path if os.path.isabs(path) else os.path.join(base_dir, path)
+
+
+def _text_blocks(page: dict) -> list[str]:
+    text = page.get("text_blocks", page.get("text", []))
+    if isinstance(text, str):
+        text = [text]
+    return [t for t in text if t]
+
+
+def plan_jobs(spec: dict, base_dir: str) -> list[dict]:
+    """
+    Spec → lijst jobs met afbeeldingen als (pad, breedte)-referenties.
+    Nog niets geladen; dat gebeurt centraal in prepare_images.
+    Een materiaalstaat die niet te lezen is → job["error"].
+    """
+    defaults = spec.get("defaults", {})
+    default_logo = defaults.get("logo", DEFAULT_LOGO if os.path.exists(DEFAULT_LOGO) else None)
+
+    jobs, seen = [], set()
+    for i, wb in enumerate(spec["workbooks"], start=1):
+        meta = {**defaults, **wb.get("meta", {})}
+        name = _safe_name(wb.get("name") or meta.get("opdracht_titel") or f"werkboekje-{i}")
+        while name in seen:
+            name += f"-{i}"
+        seen.add(name)
+
+        error = None
+        if meta.get("materialen_file"):
+            path = _resolve(base_dir, meta.pop("materialen_file"))
+            try:
+                with open(path, "rb") as f:
+                    meta["materialen"] = read_materiaalstaat(path, f.read())
+            except (OSError, ValueError, RuntimeError) as e:
+                error = f"materiaalstaat: {e}"
+
+        logo = meta.pop("logo", default_logo)
+        cover = meta.pop("cover", None)
+        meta["logo_ref"] = (_resolve(base_dir, logo), LOGO_WIDTH_IN) if logo else None
+        meta["cover_ref"] = (_resolve(base_dir, cover), COVER_WIDTH_IN) if cover else None
+
+        steps = [
+            {
+                "title": page.get("title", ""),
+                "text_blocks": _text_blocks(page),
+                "image_refs": [(_resolve(base_dir, p), STEP_IMAGE_WIDTH_IN) for p in page.get("images", []) if p],
+            }
+            for page in wb.get("pages", [])
+        ]
+        jobs.append({"name": name, "meta": meta, "steps": steps, "error": error})
+    return jobs
+
+
+# ---------- Afbeeldingen: 1x laden + normaliseren ----------
+def _job_refs(job: dict):
+    meta = job["meta"]
+    for key in ("logo_ref", "cover_ref"):
+        if meta.get(key):
+            yield meta[key]
+    for step in job["steps"]:
+        yield from step["image_refs"]
+
+
+def prepare_images(jobs: list[dict], cache_dir: str) -> tuple[dict, dict]:
+    """
+    Laadt en normaliseert elke unieke (pad, breedte) één keer voor de hele
+    batch en schrijft het resultaat naar cache_dir. Gestreamd via
+    image_prep.iter_normalized: hooguit een paar originelen tegelijk in het geheugen.
+    Retourneert ({(pad, breedte): pad_in_cache}, {(pad, breedte): foutmelding}).
+    """
+    refs = sorted({ref for job in jobs if not job.get("error") for ref in _job_refs(job)})
+    loaded, failed = [], {}
+
+    def raw():
+        for ref in refs:
+            try:
+                data = _read(ref[0])
+            except OSError as e:
+                failed[ref] = f"afbeelding {ref[0]}: {e.strerror or e}"
+                continue
+            loaded.append(ref)
+            yield data, ref[1]
+
+    mapping = {}
+    # loaded[i] staat er al voordat de i-de afbeelding terugkomt
+    for i, data in enumerate(image_prep.iter_normalized(raw())):
+        out_path = os.path.join(cache_dir, hashlib.sha256(data).hexdigest())
+        if not os.path.exists(out_path):
+            with open(out_path, "wb") as f:
+                f.write(data)
+        mapping[loaded[i]] = out_path
+    return mapping, failed
+
+
+def _read(path):
+    with open(path, "rb") as f:
+        return f.read()
+
+
+# ---------- Werkboekje bouwen (in worker-proces) ----------
+def _render_job(job: dict, images: dict, out_dir: str) -> dict:
+    started = time.perf_counter()
+    if job.get("error"):
+        return {"name": job["name"], "error": job["error"], "seconds": 0.0}
+    try:
+        meta = dict(job["meta"])
+        logo_ref, cover_ref = meta.pop("logo_ref"), meta.pop("cover_ref")
+        if logo_ref:
+            meta["logo"] = _read(images[logo_ref])
+        if cover_ref:
+            meta["cover_bytes"] = images[cover_ref]
+
+        # afbeeldingen als paden: de streamende schrijver leest ze pas als ze aan de beurt zijn
+        steps = [
+            {
+                "title": s["title"],
+                "text_blocks": s["text_blocks"],
+                "images": [images[ref] for ref in s["image_refs"]],
+            }
+            for s in job["steps"]
+        ]
+
+        file_name = f"{job['name']}.docx"
+        out_path = os.path.join(out_dir, file_name)
+        write_workbook_docx(meta, steps, out_path, normalize_images=False)
+
+        return {
+            "name": job["name"],
+            "file": file_name,
+            "pages": len(steps),
+            "bytes": os.path.getsize(out_path),
+            "seconds": round(time.perf_counter() - started, 3),
+        }
+    except Exception as e:
+        return {
+            "name": job["name"],
+            "error": str(e),
+            "seconds": round(time.perf_counter() - started, 3),
+        }
+
+
+# ---------- Hoofdfunctie ----------
+def build_batch(spec_path: str, out_zip: str, workers: int = DEFAULT_WORKERS) -> dict:
+    """Bouwt alle werkboekjes uit de spec naar out_zip; retourneert het manifest."""
+    started = time.perf_counter()
+    spec = load_spec(spec_path)
+    base_dir = os.path.dirname(os.path.abspath(spec_path))
+    jobs = plan_jobs(spec, base_dir)
+
+    work_dir = tempfile.mkdtemp(prefix="werkboekjes-")
+    try:
+        cache_dir = os.path.join(work_dir, "img")
+        out_dir = os.path.join(work_dir, "out")
+        os.makedirs(cache_dir)
+        os.makedirs(out_dir)
+
+        t_img = time.perf_counter()
+        images, image_errors = prepare_images(jobs, cache_dir)
+        image_seconds = time.perf_counter() - t_img
+        for job in jobs:
+            missing = [image_errors[ref] for ref in _job_refs(job) if ref in image_errors]
+            if missing and not job["error"]:
+                job["error"] = "; ".join(dict.fromkeys(missing))
+
+        t_build = time.perf_counter()
+        if workers <= 1 or len(jobs) <= 1:
+            results = [_render_job(job, images, out_dir) for job in jobs]
+        else:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                futures = [pool.submit(_render_job, job, images, out_dir) for job in jobs]
+                results = [f.result() for f in futures]
+        build_seconds = time.perf_counter() - t_build
+
+        manifest = {
+            "spec": os.path.basename(spec_path),
+            "workers": workers,
+            "workbooks": results,
+            "images": {"distinct": len(images), "failed": len(image_errors), "seconds": round(image_seconds, 3)},
+            "build_seconds": round(build_seconds, 3),
+            "failed": sum(1 for r in results if "error" in r),
+        }
+
+        with zipfile.ZipFile(out_zip, "w", compression=zipfile.ZIP_DEFLATED) as zf:
+            for r in results:
+                if "file" in r:
+                    # .docx is al gecomprimeerd
+                    zf.write(os.path.join(out_dir, r["file"]), r["file"], compress_type=zipfile.ZIP_STORED)
+            manifest["total_seconds"] = round(time.perf_counter() - started, 3)
+            zf.writestr("manifest.json", json.dumps(manifest, ensure_ascii=False, indent=2))
+        return manifest
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Werkboekjes in bulk maken vanuit een spec-bestand.")
+    parser.add_argument("spec", help="JSON- of YAML-bestand")
+    parser.add_argument("-o", "--output", default="werkboekjes.zip")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS)
+    args = parser.parse_args()
+
+    manifest = build_batch(args.spec, args.output, args.workers)
+    for r in manifest["workbooks"]:
+        status = f"FOUT: {r['error']}" if "error" in r else f"{r['bytes'] // 1024} kB"
+        print(f"{r['name']}: {status} ({r['seconds']} s)")
+    print(
+        f"{len(manifest['workbooks'])} werkboekjes, {manifest['images']['distinct']} unieke afbeeldingen, "
+        f"{manifest['total_seconds']} s totaal → {args.output}"
+    )
@@ -1,13 +1,62 @@
 import io
+import re
+import csv
+from copy import deepcopy
+from functools import lru_cache
+
 from docx import Document
-from docx.shared import Pt, Inches
+from docx.shared import Pt, Inches, Emu
+from docx.enum.style import WD_STYLE_TYPE
 from docx.enum.text import WD_ALIGN_PARAGRAPH
-from docx.enum.table import WD_ALIGN_VERTICAL
 from docx.oxml import parse_xml
 from docx.oxml.ns import nsdecls
+from xml.sax.saxutils import escape as xml_escape
+
+import image_prep
+import metrics
+from workbook_fields import MATERIAAL_COLS
+
+LOGO_WIDTH_IN = 1.0
+COVER_WIDTH_IN = 4.5
+STEP_IMAGE_WIDTH_IN = 4.5
+
+
+# (vet, grootte) -> benoemde stijl in het basisdocument
+NAMED_STYLES = {
+    (False, 12): "Normal",
+    (False, 11): "WB Tekst",
+    (True, 12): "WB Tabelkop",
+    (True, 14): "WB Kop",
+    (True, 16): "WB Paginatitel",
+    (True, 28): "WB Titel",
+}
+
+
+def _named_style(doc, bold: bool, size: int) -> str | None:
+    """
+    Naam van de benoemde stijl voor (vet, grootte), of None als het document
+    die niet heeft (alleen new_workbook_document() heeft de WB-stijlen).
+    Normal bestaat overal, maar is alleen in het basisdocument Arial 12.
+    """
+    name = NAMED_STYLES.get((bold, size))
+    if name is None or name not in doc.styles:
+        return None
+    if name == "Normal":
+        font = doc.styles[name].font
+        if font.name != "Arial" or font.size != Pt(size):
+            return None
+    return name
 
 
 def _p(doc, text="", bold=False, size=12, align=None):
+    text = _xml_text(text or "")
+    style = _named_style(doc, bold, size)
+    if style:
+        p = doc.add_paragraph(text, style=style)
+        if align:
+            p.alignment = align
+        return p
+
     p = doc.add_paragraph()
     run = p.add_run(text)
     run.font.name = "Arial"
@@ -18,76 +67,200 @@ def _p(doc, text="", bold=False, size=12, align=None):
     return p
 
 
+# ---------- Basisdocument (1x per proces opgebouwd) ----------
+def _add_named_styles(doc):
+    normal = doc.styles["Normal"]
+    normal.font.name = "Arial"
+    normal.font.size = Pt(12)
+
+    for (bold, size), name in NAMED_STYLES.items():
+        if name == "Normal":
+            continue
+        style = doc.styles.add_style(name, WD_STYLE_TYPE.PARAGRAPH)
+        style.base_style = normal
+        style.font.bold = bold
+        style.font.size = Pt(size)
+
+
+@lru_cache(maxsize=4)
+def _base_document_bytes(logo: bytes = None) -> bytes:
+    """Lege werkboek-basis met stijlen en (optioneel) logo in de koptekst."""
+    doc = Document()
+    _add_named_styles(doc)
+    if logo:
+        add_logo_to_header(doc.sections[0], logo)
+    out = io.BytesIO()
+    doc.save(out)
+    return out.getvalue()
+
+
+@lru_cache(maxsize=1)
+def _naam_klas_table_xml():
+    """Naam/Klas-tabel van het voorblad, eenmalig opgebouwd."""
+    doc = Document()
+    table = doc.add_table(rows=2, cols=2)
+    table.style = "Table Grid"
+    table.rows[0].cells[0].text = "Naam:"
+    table.rows[1].cells[0].text = "Klas:"
+    # Arial per run, zoals voorheen: ook juist in een document zonder Arial-Normal
+    for row in table.rows:
+        for run in row.cells[0].paragraphs[0].runs:
+            run.font.name = "Arial"
+            run.font.size = Pt(12)
+    return table._tbl
+
+
+def new_workbook_document(logo: bytes = None):
+    """Kloon van het basisdocument; alleen variabele inhoud moet er nog in."""
+    return Document(io.BytesIO(_base_document_bytes(logo)))
+
+
 def add_logo_to_header(section, logo_bytes: bytes):
     header = section.header
     paragraph = header.paragraphs[0]
     paragraph.alignment = WD_ALIGN_PARAGRAPH.RIGHT
     run = paragraph.add_run()
-    run.add_picture(io.BytesIO(logo_bytes), width=Inches(1.0), height=Inches(1.0))
+    run.add_picture(io.BytesIO(logo_bytes), width=Inches(LOGO_WIDTH_IN), height=Inches(LOGO_WIDTH_IN))
 
 
-def _force_cell_vertical_center(cell):
-    tc_pr = cell._tc.get_or_add_tcPr()
-    tc_pr.append(parse_xml(r'<w:vAlign %s w:val="center"/>' % nsdecls('w')))
-    cell.vertical_alignment = WD_ALIGN_VERTICAL.CENTER
-    for p in cell.paragraphs:
-        p.alignment = WD_ALIGN_PARAGRAPH.CENTER
+
+# tekens die niet in XML 1.0 mogen (stuurtekens uit CSV/Excel)
+_XML_INVALID_RE = re.compile("[\x00-\x08\x0b\x0c\x0e-\x1f\ufffe\uffff]")
+
+
+def _xml_text(value) -> str:
+    return _XML_INVALID_RE.sub("", str(value))
+
+# Rij-sjablonen voor de materiaalstaat: de hele tabel wordt in één keer als
+# XML opgebouwd en geparsed, in plaats van per cel python-docx objecten.
+_TBL_OPEN = (
+    '<w:tbl %s><w:tblPr><w:tblStyle w:val="TableGrid"/><w:tblW w:type="auto" w:w="0"/>'
+    '<w:tblLook w:firstColumn="1" w:firstRow="1" w:lastColumn="0" w:lastRow="0" '
+    'w:noHBand="0" w:noVBand="1" w:val="04A0"/></w:tblPr>' % nsdecls("w")
+)
+_HDR_CELL = (
+    '<w:tc><w:tcPr><w:tcW w:type="dxa" w:w="{w}"/><w:shd w:fill="D9D9D9"/><w:vAlign w:val="center"/></w:tcPr>'
+    '<w:p><w:pPr>{style}<w:jc w:val="center"/></w:pPr>'
+    '<w:r>{rpr}<w:t xml:space="preserve">{text}</w:t></w:r></w:p></w:tc>'
+)
+_DATA_CELL = (
+    '<w:tc><w:tcPr><w:tcW w:type="dxa" w:w="{w}"/><w:vAlign w:val="center"/></w:tcPr>'
+    '<w:p><w:pPr><w:jc w:val="center"/></w:pPr>'
+    '<w:r>{rpr}<w:t xml:space="preserve">{text}</w:t></w:r></w:p></w:tc>'
+)
+# opmaak per run voor documenten zonder de benoemde stijlen
+_RPR_ARIAL = '<w:rPr><w:rFonts w:ascii="Arial" w:hAnsi="Arial"/>{b}<w:sz w:val="24"/></w:rPr>'
+_DATA_ROW_OPEN = '<w:tr><w:trPr><w:trHeight w:val="600"/></w:trPr>'
+
+
+def materiaalstaat_table_xml(materialen: list[dict], col_width: int = 1234,
+                             header_style: str | None = "WBTabelkop") -> str:
+    """
+    Volledige <w:tbl> voor de materiaalstaat als XML-string (1 doorgang).
+    col_width in twips; header_style is de stijl-id van de kopcellen, of None
+    voor Arial 12 per run (document zonder de benoemde stijlen).
+    """
+    if header_style:
+        style, hdr_rpr, data_rpr = f'<w:pStyle w:val="{header_style}"/>', "", ""
+    else:
+        style, hdr_rpr, data_rpr = "", _RPR_ARIAL.replace("{b}", "<w:b/>"), _RPR_ARIAL.replace("{b}", "")
+    hdr_cell = _HDR_CELL.replace("{w}", str(col_width)).replace("{style}", style).replace("{rpr}", hdr_rpr)
+    data_cell = _DATA_CELL.replace("{w}", str(col_width)).replace("{rpr}", data_rpr)
+
+    parts = [_TBL_OPEN, "<w:tblGrid>", f'<w:gridCol w:w="{col_width}"/>' * len(MATERIAAL_COLS), "</w:tblGrid>"]
+
+    # kopregel herhaalt op elke pagina bij lange lijsten
+    parts.append("<w:tr><w:trPr><w:tblHeader/></w:trPr>")
+    parts.extend(hdr_cell.replace("{text}", xml_escape(c)) for c in MATERIAAL_COLS)
+    parts.append("</w:tr>")
+
+    for item in materialen:
+        parts.append(_DATA_ROW_OPEN)
+        for key in MATERIAAL_COLS:
+            parts.append(data_cell.replace("{text}", xml_escape(_xml_text(item.get(key) or ""))))
+        parts.append("</w:tr>")
+
+    parts.append("</w:tbl>")
+    return "".join(parts)
 
 
 def add_materiaalstaat_page(doc: Document, materialen: list[dict]):
-    """Voegt materiaalstaat toe op eigen pagina."""
+    """Voegt materiaalstaat toe op eigen pagina (bij voorkeur in een doc uit new_workbook_document)."""
     doc.add_page_break()
 
-    title_p = doc.add_paragraph()
-    run = title_p.add_run("Materiaalstaat")
-    run.font.bold = True
-    run.font.name = "Arial"
-    run.font.size = Pt(16)
+    _p(doc, "Materiaalstaat", bold=True, size=16)
 
     _p(doc, "")
 
-    cols = ["Nummer", "Aantal", "Benaming", "Lengte", "Breedte", "Dikte", "Materiaal"]
-    table = doc.add_table(rows=1, cols=len(cols))
-    table.style = "Table Grid"
+    section = doc.sections[-1]
+    usable = Emu(section.page_width - section.left_margin - section.right_margin)
+    col_width = int(usable.twips / len(MATERIAAL_COLS))
+    header_style = _named_style(doc, True, 12)
+    if header_style:
+        header_style = doc.styles[header_style].style_id
 
-    # header
-    hdr_cells = table.rows[0].cells
-    for i, col_name in enumerate(cols):
-        cell = hdr_cells[i]
-        cell.text = col_name
-        for p in cell.paragraphs:
-            for r in p.runs:
-                r.font.bold = True
-                r.font.name = "Arial"
-                r.font.size = Pt(12)
-        cell._element.get_or_add_tcPr().append(
-            parse_xml(r'<w:shd {} w:fill="D9D9D9"/>'.format(nsdecls("w")))
-        )
-        _force_cell_vertical_center(cell)
-
-    # data
-    for item in materialen:
-        row_cells = table.add_row().cells
-        for j, key in enumerate(cols):
-            value = item.get(key, "")
-            cell = row_cells[j]
-            cell.text = value
-            for p in cell.paragraphs:
-                for r in p.runs:
-                    r.font.name = "Arial"
-                    r.font.size = Pt(12)
-            _force_cell_vertical_center(cell)
-
-        # rijhoogte vergroten
-        tr = row_cells[0]._tc.getparent()
-        trPr = tr.get_or_add_trPr()
-        trHeight = parse_xml(r'<w:trHeight {} w:val="600"/>'.format(nsdecls("w")))
-        trPr.append(trHeight)
+    tbl = parse_xml(materiaalstaat_table_xml(materialen, col_width, header_style))
+    doc.element.body._insert_tbl(tbl)
 
     _p(doc, "")
     _p(doc, "")
 
 
+def read_materiaalstaat(filename: str, data: bytes) -> list[dict]:
+    """
+    Materiaallijst uit CSV (; , of tab) of Excel (.xlsx, eerste werkblad).
+    Eerste rij met herkenbare kolomnamen wordt als kop gebruikt; zonder kop
+    wordt de kolomvolgorde van de materiaalstaat aangenomen.
+    """
+    name = (filename or "").lower()
+    if name.endswith(".xlsx"):
+        try:
+            import openpyxl  # pas hier: scheelt importtijd bij elke start
+        except ImportError:
+            raise RuntimeError("Excel-import vereist het pakket 'openpyxl'.")
+        wb = openpyxl.load_workbook(io.BytesIO(data), read_only=True, data_only=True)
+        rows = [
+            ["" if v is None else _xml_text(v).strip() for v in row]
+            for row in wb.worksheets[0].iter_rows(values_only=True)
+        ]
+        wb.close()
+    else:
+        for encoding in ("utf-8-sig", "cp1252"):
+            try:
+                text = data.decode(encoding)
+                break
+            except UnicodeDecodeError:
+                continue
+        else:
+            # bytes die ook in cp1252 niet bestaan (0x81, 0x8d, ...) → �
+            text = data.decode("cp1252", errors="replace")
+        try:
+            dialect = csv.Sniffer().sniff(text[:4096], delimiters=";,\t")
+        except csv.Error:
+            dialect = csv.excel
+        rows = [[_xml_text(v).strip() for v in row] for row in csv.reader(io.StringIO(text), dialect)]
+
+    rows = [r for r in rows if any(r)]
+    if not rows:
+        return []
+
+    lookup = {c.lower(): c for c in MATERIAAL_COLS}
+    header = [lookup.get(v.lower()) for v in rows[0]]
+    if any(header):
+        rows = rows[1:]
+    else:
+        header = MATERIAAL_COLS[: len(rows[0])]
+
+    materialen = []
+    for row in rows:
+        item = {c: "" for c in MATERIAAL_COLS}
+        for col, value in zip(header, row):
+            if col:
+                item[col] = value
+        materialen.append(item)
+    return materialen
+
+
 def add_cover_page(
     doc: Document,
     *,
@@ -132,35 +305,66 @@ def add_cover_page(
         p = doc.add_paragraph()
         p.alignment = WD_ALIGN_PARAGRAPH.CENTER
         r = p.add_run()
-        r.add_picture(io.BytesIO(cover_bytes), width=Inches(4.5))
+        r.add_picture(io.BytesIO(cover_bytes), width=Inches(COVER_WIDTH_IN))
         _p(doc, "")
 
     # naam / klas
-    table = doc.add_table(rows=2, cols=2)
-    table.style = "Table Grid"
-    table.rows[0].cells[0].text = "Naam:"
-    table.rows[0].cells[1].text = ""
-    table.rows[1].cells[0].text = "Klas:"
-    table.rows[1].cells[1].text = ""
-
-    for row in table.rows:
-        for cell in row.cells:
-            for p in cell.paragraphs:
-                for r in p.runs:
-                    r.font.name = "Arial"
-                    r.font.size = Pt(12)
+    doc.element.body._insert_tbl(deepcopy(_naam_klas_table_xml()))
 
     _p(doc, "")
     _p(doc, "")
 
 
-def build_workbook_docx_front_and_steps(meta: dict, steps: list[dict]) -> io.BytesIO:
+def prepare_workbook_images(meta: dict, steps: list[dict]) -> tuple[dict, list[dict]]:
+    """
+    Normaliseert logo, omslagfoto en alle stap-afbeeldingen in één parallelle
+    ronde (EXIF-rotatie, print-DPI voor de plaatsingsbreedte, hercodering).
+    Retourneert kopieën van meta en steps met de nieuwe bytes.
+    """
+    jobs = []
+    if meta.get("logo"):
+        jobs.append((meta["logo"], LOGO_WIDTH_IN))
+    if meta.get("cover_bytes"):
+        jobs.append((meta["cover_bytes"], COVER_WIDTH_IN))
+    for step in steps:
+        for img_bytes in step.get("images", []):
+            if img_bytes:
+                jobs.append((img_bytes, STEP_IMAGE_WIDTH_IN))
+
+    results = iter(image_prep.normalize_images(jobs))
+
+    meta = dict(meta)
+    if meta.get("logo"):
+        meta["logo"] = next(results)
+    if meta.get("cover_bytes"):
+        meta["cover_bytes"] = next(results)
+
+    new_steps = []
+    for step in steps:
+        images = [next(results) if img_bytes else img_bytes for img_bytes in step.get("images", [])]
+        new_steps.append({**step, "images": images})
+    return meta, new_steps
+
+
+@metrics.instrument("workbook")
+def build_workbook_docx_front_and_steps(
+    meta: dict, steps: list[dict], normalize_images: bool = True
+) -> io.BytesIO:
     """
     - Voorpagina
     - (optioneel) Materiaalstaat
     - Elke stap/pagina op EIGEN pagina
+    Afbeeldingen mogen bytes of UploadHandles zijn.
+    normalize_images=False als de afbeeldingen al voorbereid zijn.
     """
-    doc = Document()
+    if normalize_images:
+        meta, steps = prepare_workbook_images(meta, steps)
+    else:
+        meta = {**meta, "logo": image_prep.load_bytes(meta.get("logo")),
+                "cover_bytes": image_prep.load_bytes(meta.get("cover_bytes"))}
+        steps = [{**s, "images": [image_prep.load_bytes(i) for i in s.get("images", [])]} for s in steps]
+
+    doc = new_workbook_document(meta.get("logo"))
 
     add_cover_page(
         doc,
@@ -169,7 +373,6 @@ def build_workbook_docx_front_and_steps(meta: dict, steps: list[dict]) -> io.Byt
         profieldeel=meta.get("profieldeel", ""),
         docent=meta.get("docent", ""),
         duur=meta.get("duur", ""),
-        logo=meta.get("logo"),
         cover_bytes=meta.get("cover_bytes"),
     )
 
@@ -183,7 +386,7 @@ def build_workbook_docx_front_and_steps(meta: dict, steps: list[dict]) -> io.Byt
 
         # titel
         if step.get("title"):
-            doc.add_heading(step["title"], level=1)
+            doc.add_heading(_xml_text(step["title"]), level=1)
 
         # tekstblokken
         for txt in step.get("text_blocks", []):
@@ -192,7 +395,7 @@ def build_workbook_docx_front_and_steps(meta: dict, steps: list[dict]) -> io.Byt
         # afbeeldingen
         for img_bytes in step.get("images", []):
             if img_bytes:
-                doc.add_picture(io.BytesIO(img_bytes), width=Inches(4.5))
+                doc.add_picture(io.BytesIO(img_bytes), width=Inches(STEP_IMAGE_WIDTH_IN))
                 _p(doc, "")
 
     out = io.BytesIO()
@@ -0,0 +1,9 @@
+"""
+Velden van het werkboekje die zowel de UI als de builders kennen.
+
+Los van workbook_builder, zodat app.py ze kan gebruiken zonder python-docx
+bij het laden van de pagina te importeren.
+"""
+
+# kolommen van de materiaalstaat, in tabelvolgorde
+MATERIAAL_COLS = ["Nummer", "Aantal", "Benaming", "Lengte", "Breedte", "Dikte", "Materiaal"]
@@ -0,0 +1,263 @@
+"""
+Werkboekje als DOCX rechtstreeks naar een zip-stroom, met begrensd geheugen.
+
+build_workbook_docx_front_and_steps bouwt alles in een python-docx DOM en
+slaat dat op in een BytesIO: piek = alle afbeeldingen + XML-boom + uitvoer.
+Deze schrijver levert hetzelfde document, maar:
+- de vaste onderdelen (stijlen, thema, koptekst met logo) komen ongewijzigd uit
+  het basisdocument van workbook_builder
+- elke afbeelding wordt genormaliseerd (image_prep.iter_normalized, hooguit een
+  paar tegelijk) en meteen als part in de zip geschreven
+- de body gaat pagina voor pagina naar een tijdelijk bestand en komt aan het
+  eind als word/document.xml in de zip, samen met relaties en content types
+Voor werkboekjes met honderden foto's.
+
+CLI:  python workbook_stream.py spec.json -o werkboekje.docx
+      (spec zoals POST /convert/workbook van api_server, afbeeldingen in base64)
+"""
+import io
+import os
+import re
+import json
+import base64
+import shutil
+import zipfile
+import argparse
+import tempfile
+from functools import lru_cache
+from xml.sax.saxutils import escape as xml_escape
+
+from docx.shared import Emu, Inches
+from docx.image.image import Image as DocxImage
+from docx.oxml.shape import CT_Inline
+from lxml import etree
+
+import image_prep
+import metrics
+from workbook_builder import (
+    NAMED_STYLES, MATERIAAL_COLS, COVER_WIDTH_IN, STEP_IMAGE_WIDTH_IN, LOGO_WIDTH_IN,
+    _base_document_bytes, _naam_klas_table_xml, _xml_text, materiaalstaat_table_xml, new_workbook_document,
+)
+
+WORKBOOK_SPOOL_MB = int(os.getenv("WORKBOOK_SPOOL_MB", "16"))   # uitvoer/body groter → tijdelijk bestand
+WORKBOOK_STREAM_MIN_IMAGES = int(os.getenv("WORKBOOK_STREAM_MIN_IMAGES", "40"))  # vanaf hier streamen
+
+DOCUMENT = "word/document.xml"
+DOCUMENT_RELS = "word/_rels/document.xml.rels"
+CONTENT_TYPES = "[Content_Types].xml"
+RT_IMAGE = "http://schemas.openxmlformats.org/officeDocument/2006/relationships/image"
+
+PAGE_BREAK = '<w:p><w:r><w:br w:type="page"/></w:r></w:p>'
+
+
+# ---------- Basisdocument ----------
+@lru_cache(maxsize=4)
+def _base_layout(logo: bytes = None) -> tuple:
+    """(stijl-id per stijlnaam, bruikbare breedte in twips) van het basisdocument."""
+    doc = new_workbook_document(logo)
+    names = set(NAMED_STYLES.values()) | {"Heading 1"}
+    style_ids = {name: doc.styles[name].style_id for name in names}
+    section = doc.sections[-1]
+    usable = Emu(section.page_width - section.left_margin - section.right_margin)
+    return style_ids, int(usable.twips)
+
+
+def _split_document(xml: str) -> tuple[str, str]:
+    """document.xml van de basis → (alles t/m <w:body>, vanaf de laatste <w:sectPr>)."""
+    body = re.search(r"<w:body>", xml)
+    sect = xml.rfind("<w:sectPr")
+    return xml[:body.end()], xml[sect:]
+
+
+# ---------- Body-fragmenten (zelfde opmaak als workbook_builder._p) ----------
+def _p_xml(style_ids: dict, text: str = "", bold: bool = False, size: int = 12, jc: str = None) -> str:
+    ppr = f'<w:jc w:val="{jc}"/>' if jc else ""
+    text = _xml_text(text or "")        # stuurtekens e.d. mogen niet in XML
+    run = f'<w:r><w:t xml:space="preserve">{xml_escape(text)}</w:t></w:r>' if text else ""
+    style = NAMED_STYLES.get((bold, size))
+    if style:
+        return f'<w:p><w:pPr><w:pStyle w:val="{style_ids[style]}"/>{ppr}</w:pPr>{run}</w:p>'
+
+    rpr = '<w:rPr><w:rFonts w:ascii="Arial" w:hAnsi="Arial"/>' + ("<w:b/>" if bold else "") + \
+          f'<w:sz w:val="{size * 2}"/></w:rPr>'
+    return (f'<w:p>{f"<w:pPr>{ppr}</w:pPr>" if ppr else ""}'
+            f'<w:r>{rpr}<w:t xml:space="preserve">{xml_escape(text)}</w:t></w:r></w:p>')
+
+
+class _Package:
+    """Houdt de nieuwe afbeeldingsparts bij (relatie-id's, extensies)."""
+
+    def __init__(self, zf: zipfile.ZipFile):
+        self.zf = zf
+        self.rels: list[tuple] = []        # (rId, target)
+        self.extensions: dict = {}         # ext → content type
+        self._by_sha: dict = {}            # sha1 → rId (zelfde foto maar één keer)
+        self._shape_id = 1000
+
+    def picture_xml(self, blob: bytes, width_in: float, jc: str = None) -> str:
+        image = DocxImage.from_blob(blob)
+        rId = self._by_sha.get(image.sha1)
+        if rId is None:
+            n = len(self.rels) + 1
+            rId, target = f"rIdWb{n}", f"media/wb{n}.{image.ext}"
+            self.zf.writestr(f"word/{target}", blob)
+            self.rels.append((rId, target))
+            self.extensions.setdefault(image.ext, image.content_type)
+            self._by_sha[image.sha1] = rId
+
+        cx, cy = image.scaled_dimensions(Inches(width_in), None)
+        self._shape_id += 1
+        inline = CT_Inline.new_pic_inline(self._shape_id, rId, image.filename, cx, cy)
+        ppr = f'<w:pPr><w:jc w:val="{jc}"/></w:pPr>' if jc else ""
+        return f'<w:p>{ppr}<w:r><w:drawing>{etree.tostring(inline, encoding="unicode")}</w:drawing></w:r></w:p>'
+
+    def write_rels(self, base_xml: bytes):
+        extra = "".join(f'<Relationship Id="{rId}" Type="{RT_IMAGE}" Target="{target}"/>' for rId, target in self.rels)
+        self.zf.writestr(DOCUMENT_RELS, base_xml.decode("utf-8").replace("</Relationships>", extra + "</Relationships>"))
+
+    def write_content_types(self, base_xml: bytes):
+        xml = base_xml.decode("utf-8")
+        known = set(re.findall(r'Default Extension="([^"]+)"', xml))
+        extra = "".join(
+            f'<Default Extension="{ext}" ContentType="{ct}"/>'
+            for ext, ct in self.extensions.items() if ext not in known
+        )
+        self.zf.writestr(CONTENT_TYPES, xml.replace("<Override ", extra + "<Override ", 1) if extra else xml)
+
+
+# ---------- Pagina's ----------
+def _image_jobs(meta: dict, steps: list[dict]):
+    if meta.get("cover_bytes"):
+        yield meta["cover_bytes"], COVER_WIDTH_IN
+    for step in steps:
+        for img in step.get("images", []):
+            if img:
+                yield img, STEP_IMAGE_WIDTH_IN
+
+
+def _load(img) -> bytes:
+    """bytes, UploadHandle (read_bytes) of pad naar een bestand."""
+    if isinstance(img, (str, os.PathLike)):
+        with open(img, "rb") as f:
+            return f.read()
+    return image_prep.load_bytes(img)
+
+
+def _body(meta: dict, steps: list[dict], pkg: _Package, style_ids: dict, usable_twips: int, images):
+    """Body-XML in stukken, in dezelfde volgorde als build_workbook_docx_front_and_steps."""
+    p = lambda *a, **k: _p_xml(style_ids, *a, **k)
+
+    # voorblad
+    yield p("Opdracht :", bold=True, size=14)
+    yield p(meta.get("opdracht_titel", "") or " ", bold=True, size=28)
+    yield p("")
+    yield p(meta.get("vak", "BWI") or "", bold=True, size=14)
+    profieldeel, docent, duur = meta.get("profieldeel", ""), meta.get("docent", ""), meta.get("duur", "")
+    yield p(f"Keuze/profieldeel: {profieldeel}" if profieldeel else "Keuze/profieldeel:", size=12)
+    yield p(f"Docent: {docent}" if docent else "Docent:", size=12)
+    yield p(f"Duur van de opdracht:     {duur}" if duur else "Duur van de opdracht:", size=12)
+    yield p("")
+    if meta.get("cover_bytes"):
+        yield pkg.picture_xml(next(images), COVER_WIDTH_IN, jc="center")
+        yield p("")
+    yield etree.tostring(_naam_klas_table_xml(), encoding="unicode")
+    yield p("")
+    yield p("")
+
+    # materiaalstaat
+    if meta.get("include_materiaalstaat"):
+        yield PAGE_BREAK
+        yield p("Materiaalstaat", bold=True, size=16)
+        yield p("")
+        yield materiaalstaat_table_xml(
+            meta.get("materialen", []), int(usable_twips / len(MATERIAAL_COLS)), style_ids["WB Tabelkop"]
+        )
+        yield p("")
+        yield p("")
+
+    # elke stap op een eigen pagina
+    for step in steps:
+        yield PAGE_BREAK
+        if step.get("title"):
+            yield (f'<w:p><w:pPr><w:pStyle w:val="{style_ids["Heading 1"]}"/></w:pPr>'
+                   f'<w:r><w:t xml:space="preserve">{xml_escape(_xml_text(step["title"]))}</w:t></w:r></w:p>')
+        for txt in step.get("text_blocks", []):
+            yield p(txt, size=11)
+        for img in step.get("images", []):
+            if img:
+                yield pkg.picture_xml(next(images), STEP_IMAGE_WIDTH_IN)
+                yield p("")
+
+
+# ---------- Publiek ----------
+@metrics.instrument("workbook_stream")
+def write_workbook_docx(meta: dict, steps: list[dict], target, normalize_images: bool = True):
+    """
+    Schrijft het werkboekje naar target (pad of schrijfbaar binair bestand).
+    Afbeeldingen: bytes, UploadHandles of paden; pas gelezen als ze aan de beurt zijn.
+    normalize_images=False als de afbeeldingen al voorbereid zijn.
+    """
+    logo = image_prep.load_bytes(meta.get("logo"))
+    if logo and normalize_images:
+        logo = image_prep.normalize_image(logo, LOGO_WIDTH_IN)
+    style_ids, usable_twips = _base_layout(logo)
+
+    jobs = ((_load(img), width) for img, width in _image_jobs(meta, steps))
+    if normalize_images:
+        images = image_prep.iter_normalized(jobs)
+    else:
+        images = (blob for blob, _ in jobs)
+
+    base = zipfile.ZipFile(io.BytesIO(_base_document_bytes(logo)))
+    with zipfile.ZipFile(target, "w", zipfile.ZIP_DEFLATED) as zf, \
+            tempfile.SpooledTemporaryFile(max_size=WORKBOOK_SPOOL_MB * 1024 * 1024) as body:
+        for name in base.namelist():
+            if name not in (DOCUMENT, DOCUMENT_RELS, CONTENT_TYPES):
+                zf.writestr(base.getinfo(name), base.read(name))
+
+        pkg = _Package(zf)
+        for chunk in _body(meta, steps, pkg, style_ids, usable_twips, images):
+            body.write(chunk.encode("utf-8"))
+
+        head, tail = _split_document(base.read(DOCUMENT).decode("utf-8"))
+        body.seek(0)
+        with zf.open(DOCUMENT, "w", force_zip64=True) as out:
+            out.write(head.encode("utf-8"))
+            shutil.copyfileobj(body, out, 1024 * 1024)
+            out.write(tail.encode("utf-8"))
+
+        pkg.write_rels(base.read(DOCUMENT_RELS))
+        pkg.write_content_types(base.read(CONTENT_TYPES))
+
+
+def build_workbook_docx_stream(meta: dict, steps: list[dict], normalize_images: bool = True):
+    """Als write_workbook_docx, naar een SpooledTemporaryFile (op positie 0)."""
+    out = tempfile.SpooledTemporaryFile(max_size=WORKBOOK_SPOOL_MB * 1024 * 1024)
+    write_workbook_docx(meta, steps, out, normalize_images)
+    out.seek(0)
+    return out
+
+
+def count_images(meta: dict, steps: list[dict]) -> int:
+    return sum(1 for _ in _image_jobs(meta, steps))
+
+
+# ---------- CLI ----------
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Werkboekje (JSON-spec met base64-afbeeldingen) → .docx, gestreamd.")
+    parser.add_argument("spec")
+    parser.add_argument("-o", "--out", default="werkboekje.docx")
+    args = parser.parse_args()
+
+    with open(args.spec, "r", encoding="utf-8") as f:
+        spec = json.load(f)
+    meta = dict(spec.get("meta") or {})
+    for key in ("logo", "cover_bytes"):
+        if meta.get(key):
+            meta[key] = base64.b64decode(meta[key])
+    steps = [
+        {**step, "images": [base64.b64decode(img) for img in step.get("images", []) if img]}
+        for step in spec.get("steps") or []
+    ]
+    write_workbook_docx(meta, steps, args.out)
+    print(f"{args.out}: {os.path.getsize(args.out)} bytes")